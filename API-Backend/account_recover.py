@@ -5,7 +5,6 @@ Which allows a user to reset their password using a recovery token.
 
 # Standard Library
 from typing import Annotated
-from os import getenv
 
 # Third-Party Libraries
 from fastapi import HTTPException, APIRouter, Depends, Request
@@ -14,12 +13,12 @@ from pydantic import BaseModel, Field as field
 from aiosqlite import Connection, Error
 
 # Local Application Imports
-from imports import get_db, limiter, load_project_dotenv
-from password import hash_pwd
+from imports import get_db, write_connection, limiter
+from queries import queries
+from password import hash_pwd_async
 
 
 account_recover_router = APIRouter()
-load_project_dotenv()
 
 
 class Item(BaseModel):
@@ -45,9 +44,10 @@ async def recovery(
     recovery_code = item.recovery_token.lower()
     username = item.username.lower()
 
-    hashed_password = hash_pwd(item.new_password)
+    # Hashed before the write connection is taken, the hash is the slow part.
+    hashed_password = await hash_pwd_async(item.new_password)
 
-    find_code = getenv("FIND_CODE")
+    find_code = queries.FIND_CODE
 
     try:
         async with db.execute(find_code, (username,)) as cursor:
@@ -61,11 +61,12 @@ async def recovery(
         raise HTTPException(status_code=404, detail="error: username not found")
 
     if stored_token == recovery_code:
-        query = getenv("SET_CODE")
+        query = queries.SET_CODE
 
         try:
-            await db.execute(query, (hashed_password, username))
-            await db.commit()
+            async with write_connection() as write_db:
+                await write_db.execute(query, (hashed_password, username))
+                await write_db.commit()
         except Error as e:
             raise HTTPException(status_code=500, detail="error: failed to update password") from e
 
@@ -7,7 +7,6 @@ Maximum of 2 groups per user and max 2 users per group.
 # Standard Library
 from typing import Annotated
 from json import loads, dumps
-from os import getenv
 
 # Third-Party Libraries
 from pydantic import BaseModel, Field as field
@@ -16,11 +15,11 @@ from fastapi.responses import JSONResponse
 from aiosqlite import Connection, Error
 
 # Local Application Imports
-from imports import get_db, limiter, validate_token, load_project_dotenv
+from imports import get_write_db, limiter, validate_token
+from queries import queries
 
 
 add_to_group_router = APIRouter()
-load_project_dotenv()
 
 
 class Item(BaseModel):
@@ -46,7 +45,7 @@ class Item(BaseModel):
 async def add_to_group(
     request: Request, # pylint: disable=unused-argument
     item: Item,
-    db: Connection = Depends(get_db),
+    db: Connection = Depends(get_write_db),
     session_token: str = Cookie(None)
 ):
 
@@ -68,7 +67,7 @@ async def add_to_group(
     group_code = item.group_code.lower()
 
     # Query to check how many groups a user is in.
-    count_user = getenv("COUNT_USER_GROUPS")
+    count_user = queries.COUNT_USER_GROUPS
     try:
         async with db.execute(count_user, (user_id,)) as cursor:
             row = await cursor.fetchone()
@@ -77,7 +76,7 @@ async def add_to_group(
         raise HTTPException(status_code=500, detail="error: database error") from e
 
     # Query to check if the group exists.
-    check_group = getenv("CHECK_GROUP_EXISTS")
+    check_group = queries.CHECK_GROUP_EXISTS
 
     try:
         async with db.execute(check_group, (group_code,)) as cursor:
@@ -97,7 +96,7 @@ async def add_to_group(
 
     try:
         # Query to add the user to the given group.
-        query = getenv("ADD_TO_GROUP")
+        query = queries.ADD_TO_GROUP
 
         await db.execute(query, (user_id, group_code))
         await db.commit()
@@ -105,7 +104,7 @@ async def add_to_group(
         response = JSONResponse(status_code=200,
                         content={"success": f"user added to group {group_code}"})
 
-        groupcode_query = getenv("GROUPCODE_QUERY")
+        groupcode_query = queries.GROUPCODE_QUERY
 
         async with db.execute(groupcode_query, (user_id,)) as cursor:
             rows = await cursor.fetchall()
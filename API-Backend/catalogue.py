@@ -0,0 +1,396 @@
+"""
+In-memory, column oriented copy of the names catalogue.
+The names, countries, population and similar tables never change while the API runs,
+so they are loaded once and searched without touching SQLite. Nothing reloads the catalogue,
+changing those tables (with a migration or a new names.db) needs a restart.
+
+The population rows are stored in CSR form:
+the countries/populations of the name at position i are
+pop_countries[offsets[i]:offsets[i + 1]] and pop_values[offsets[i]:offsets[i + 1]].
+
+Starting letter searches use a prefix index, the lowercased names sorted alphabetically,
+so every prefix is one contiguous slice found with two binary searches.
+Searches for letters anywhere in the name (start=0) use a trigram index,
+the positions of all names containing each 3 letter sequence.
+
+The similar table is kept as an adjacency structure for /similar, the similar groups
+in CSR form (similar_members[similar_offsets[g]:similar_offsets[g + 1]] are the positions
+in group g) and the group of every position. Every name in a group also has its record
+encoded as JSON up front, so a /similar response is joined from those bytes.
+"""
+
+# Standard Library
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from hashlib import blake2b
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+# Third-Party Libraries
+from aiosqlite import Connection
+
+# Local Application Imports
+from serialiser import dumps
+
+
+CATALOGUE_NAMES_QUERY = "SELECT id, name, gender FROM names ORDER BY id;"
+CATALOGUE_COUNTRIES_QUERY = "SELECT id, country FROM countries;"
+CATALOGUE_POPULATION_QUERY = "SELECT name_id, country_id, pop FROM population ORDER BY name_id;"
+CATALOGUE_SIMILAR_QUERY = "SELECT group_id, name_id FROM similar ORDER BY group_id, name_id;"
+
+# Prefixes whose positions are kept in id order, so the next pages of a search don't sort them again.
+PREFIX_RANGE_CACHE = 1024
+# Filtered candidate lists kept for /deck, so the next calls of a deck don't filter the catalogue again.
+FILTERED_LIST_CACHE = 256
+
+
+def trigrams(text: str) -> set:
+    """All 3 character sequences in text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def contains_sorted(positions: array, position: int) -> bool:
+    """Binary search for position in a sorted posting list."""
+    i = bisect_left(positions, position)
+    return i < len(positions) and positions[i] == position
+
+
+def gender_filter(query_gender: Optional[str]) -> Optional[set]:
+    """The stored gender values matching a (formatted) gender search parameter."""
+    if not query_gender:
+        return None
+    if query_gender == '?':  # Neutral gender includes mostly female/male too.
+        return {'?', '?M', '?F'}
+    if '?' in query_gender:
+        return {query_gender}
+    return {query_gender, '?' + query_gender}
+
+
+class NameCatalogue:
+    """Read-only, array backed names catalogue."""
+
+    def __init__(self, ids: array, names: List[str], genders: array, gender_labels: List[str],
+                 country_names: List[str], offsets: array, pop_countries: array, pop_values: array,
+                 version: str = "", similar_rows: Optional[array] = None):
+        self.ids = ids
+        self.names = names
+        self.lower_names = [name.lower() for name in names]
+        self.genders = genders
+        self.gender_labels = gender_labels
+        self.country_names = country_names
+        self.country_index = {country: i for i, country in enumerate(country_names)}
+        self.offsets = offsets
+        self.pop_countries = pop_countries
+        self.pop_values = pop_values
+        # Changes whenever anything the anonymous endpoints return changes, for their ETags.
+        self.version = version
+
+        # Prefix index, sorted names with the array position they belong to.
+        order = sorted(range(len(self.lower_names)), key=self.lower_names.__getitem__)
+        self.prefix_keys = [self.lower_names[i] for i in order]
+        self.prefix_positions = array('q', order)
+        self._prefix_ranges = OrderedDict()   # lowercased prefix -> positions in id order
+        self._filtered_lists = OrderedDict()  # filters -> positions of filtered_list()
+
+        # Trigram index, the positions are appended in order so every posting list is sorted.
+        self.trigram_index = {}
+        for position, name in enumerate(self.lower_names):
+            for trigram in trigrams(name):
+                postings = self.trigram_index.get(trigram)
+                if postings is None:
+                    postings = self.trigram_index[trigram] = array('q')
+                postings.append(position)
+
+        self._build_similar(similar_rows if similar_rows is not None else array('q'))
+
+    def _build_similar(self, similar_rows: array):
+        """The similar groups from (group_id, name_id) pairs sorted by group_id and name_id.
+        Names that aren't in the catalogue or have no population rows are left out,
+        like the joins of FIND_SIMILAR_NAMES did."""
+        self.similar_offsets = array('q', [0])
+        self.similar_members = array('q')
+        # -1 for names without a group. A name in more than one group gets the lowest group_id.
+        self.similar_group = array('q', [-1] * len(self.ids))
+        self.similar_payloads = {}
+
+        current_group = None
+        for i in range(0, len(similar_rows), 2):
+            group_id, name_id = similar_rows[i], similar_rows[i + 1]
+            if group_id != current_group:
+                if current_group is not None:
+                    self.similar_offsets.append(len(self.similar_members))
+                current_group = group_id
+
+            position = self.position(name_id)
+            if position is None:
+                continue
+            group = len(self.similar_offsets) - 1
+            if self.similar_group[position] == -1:
+                self.similar_group[position] = group
+            record = self.record(position)
+            if record is not None:
+                self.similar_members.append(position)
+                if position not in self.similar_payloads:
+                    self.similar_payloads[position] = dumps(record)
+
+        if current_group is not None:
+            self.similar_offsets.append(len(self.similar_members))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    async def load(cls, db: Connection) -> "NameCatalogue":
+        """Reads the catalogue tables into arrays."""
+        ids = array('q')
+        names = []
+        genders = array('b')
+        gender_labels = []
+        gender_codes = {}
+
+        async with db.execute(CATALOGUE_NAMES_QUERY) as cursor:
+            async for name_id, name, gender in cursor:
+                if gender not in gender_codes:
+                    gender_codes[gender] = len(gender_labels)
+                    gender_labels.append(gender)
+                ids.append(name_id)
+                names.append(name)
+                genders.append(gender_codes[gender])
+
+        country_names = []
+        country_positions = {}
+        async with db.execute(CATALOGUE_COUNTRIES_QUERY) as cursor:
+            async for country_id, country in cursor:
+                country_positions[country_id] = len(country_names)
+                country_names.append(country)
+
+        # Population rows come sorted by name_id, so they can be appended per name in one pass.
+        offsets = array('q', [0] * (len(ids) + 1))
+        pop_countries = array('l')
+        pop_values = array('q')
+        position = 0
+
+        async with db.execute(CATALOGUE_POPULATION_QUERY) as cursor:
+            async for name_id, country_id, pop in cursor:
+                if country_id not in country_positions:
+                    continue
+                while position < len(ids) and ids[position] < name_id:
+                    position += 1
+                    offsets[position] = len(pop_values)
+                if position == len(ids) or ids[position] != name_id:
+                    continue
+                pop_countries.append(country_positions[country_id])
+                pop_values.append(pop)
+
+        while position < len(ids):
+            position += 1
+            offsets[position] = len(pop_values)
+
+        # The similar groups, turned into the adjacency structure for /similar, and part of the version.
+        similar_rows = array('q')
+        async with db.execute(CATALOGUE_SIMILAR_QUERY) as cursor:
+            async for group_id, name_id in cursor:
+                similar_rows.extend((group_id, name_id))
+
+        version = blake2b(digest_size=8)
+        for part in (ids, genders, offsets, pop_countries, pop_values, similar_rows):
+            version.update(part.tobytes())
+        for labels in (names, gender_labels, country_names):
+            version.update("\0".join(labels).encode())
+
+        return cls(ids, names, genders, gender_labels, country_names,
+                   offsets, pop_countries, pop_values, version.hexdigest(), similar_rows)
+
+    def position(self, name_id: int) -> Optional[int]:
+        """Array position of a name id, or None if the id is unknown."""
+        i = bisect_left(self.ids, name_id)
+        if i < len(self.ids) and self.ids[i] == name_id:
+            return i
+        return None
+
+    def record(self, position: int, countries: Optional[set] = None) -> Optional[dict]:
+        """Formats the name at the given position.
+        If countries is given only those population rows are included,
+        and None is returned when the name has none of them."""
+        country_list = []
+        population = []
+        for i in range(self.offsets[position], self.offsets[position + 1]):
+            country = self.pop_countries[i]
+            if countries is None or country in countries:
+                country_list.append(self.country_names[country])
+                population.append(self.pop_values[i])
+
+        if not country_list:
+            return None
+
+        return {"id": self.ids[position],
+                "name": self.names[position],
+                "gender": self.gender_labels[self.genders[position]],
+                "country": country_list,
+                "population": population}
+
+    def similar_positions(self, name_id: int) -> array:
+        """Positions of the names in the similar group of name_id, in id order, without name_id itself."""
+        position = self.position(name_id)
+        if position is None or self.similar_group[position] == -1:
+            return array('q')
+        group = self.similar_group[position]
+        members = self.similar_members[self.similar_offsets[group]:self.similar_offsets[group + 1]]
+        return array('q', (member for member in members if member != position))
+
+    def prefix_slice(self, prefix: str) -> array:
+        """Positions of the names starting with prefix, in alphabetical order."""
+        prefix = prefix.lower()
+        low = bisect_left(self.prefix_keys, prefix)
+        high = bisect_left(self.prefix_keys, prefix + "\U0010ffff", low)
+        return self.prefix_positions[low:high]
+
+    def prefix_range(self, prefix: str) -> array:
+        """Positions of the names starting with prefix, in id order.
+        The sorted positions of the most recently used prefixes are cached."""
+        prefix = prefix.lower()
+        positions = self._prefix_ranges.get(prefix)
+        if positions is not None:
+            self._prefix_ranges.move_to_end(prefix)
+            return positions
+
+        positions = array('q', sorted(self.prefix_slice(prefix)))
+        self._prefix_ranges[prefix] = positions
+        if len(self._prefix_ranges) > PREFIX_RANGE_CACHE:
+            self._prefix_ranges.popitem(last=False)
+        return positions
+
+    def substring_range(self, letters: str, first_position: int = 0) -> Iterable[int]:
+        """Positions (from first_position on) of the names containing letters anywhere, in id order."""
+        letters = letters.lower()
+
+        # 1 or 2 letters have no trigrams to look up, and match most of the catalogue anyway.
+        # The scan starts at first_position, so the next page doesn't go over the earlier ones again.
+        if len(letters) < 3:
+            lower_names = self.lower_names
+            return (i for i in range(first_position, len(lower_names)) if letters in lower_names[i])
+
+        postings = []
+        for trigram in trigrams(letters):
+            if trigram not in self.trigram_index:
+                return []
+            postings.append(self.trigram_index[trigram])
+
+        # Walk the shortest posting list and look the positions up in the others.
+        postings.sort(key=len)
+        shortest, others = postings[0], postings[1:]
+        if first_position:
+            shortest = shortest[bisect_left(shortest, first_position):]
+        # Having every trigram does not guarantee the trigrams are adjacent, so check the name too.
+        return [position for position in shortest
+                if all(contains_sorted(other, position) for other in others)
+                and letters in self.lower_names[position]]
+
+    def candidates(self, letter: Optional[str] = None, start: Optional[int] = None,
+                   first_position: int = 0) -> Iterable[int]:
+        """Positions (from first_position on) of the names matching the letter(s), in id order."""
+        if not letter:
+            return range(first_position, len(self.ids))
+
+        if start == 0:
+            return self.substring_range(letter, first_position)
+
+        positions = self.prefix_range(letter)
+        if not first_position:
+            return positions
+        return positions[bisect_left(positions, first_position):]
+
+    def candidate_list(self, letter: Optional[str] = None, start: Optional[int] = None) -> Sequence[int]:
+        """Positions of the names matching the letter(s) in a fixed order, not necessarily the id order.
+        Cheaper than candidates() when the order doesn't matter, and it can be indexed."""
+        if not letter:
+            return range(len(self.ids))
+        if start == 0:
+            positions = self.substring_range(letter)
+            return positions if isinstance(positions, list) else list(positions)
+        return self.prefix_slice(letter)
+
+    def filtered_list(self, letter: Optional[str] = None, start: Optional[int] = None,
+                      gender_codes: Optional[set] = None, country_filter: Optional[set] = None) -> Sequence[int]:
+        """candidate_list() without the names the gender and country filters leave out,
+        in the same order. The lists of the most recently used filters are cached."""
+        if not letter and gender_codes is None and country_filter is None:
+            return range(len(self.ids))
+
+        key = (letter.lower() if letter else None, start == 0,
+               frozenset(gender_codes) if gender_codes is not None else None,
+               frozenset(country_filter) if country_filter is not None else None)
+        positions = self._filtered_lists.get(key)
+        if positions is not None:
+            self._filtered_lists.move_to_end(key)
+            return positions
+
+        positions = array('q', (position for position in self.candidate_list(letter, start)
+                                if (gender_codes is None or self.genders[position] in gender_codes)
+                                and (country_filter is None or self.has_country(position, country_filter))))
+        self._filtered_lists[key] = positions
+        if len(self._filtered_lists) > FILTERED_LIST_CACHE:
+            self._filtered_lists.popitem(last=False)
+        return positions
+
+    def has_country(self, position: int, country_filter: set) -> bool:
+        """If the name at the position has a population row in one of the countries."""
+        return any(self.pop_countries[i] in country_filter
+                   for i in range(self.offsets[position], self.offsets[position + 1]))
+
+    def filter_codes(self, genders: Optional[set] = None, countries: Optional[List[str]] = None) -> tuple:
+        """The gender codes and country indexes to filter on, None for a filter that isn't used."""
+        gender_codes = None
+        if genders is not None:
+            gender_codes = {code for code, label in enumerate(self.gender_labels) if label in genders}
+
+        country_filter = None
+        if countries:
+            country_filter = {self.country_index[c] for c in countries if c in self.country_index}
+
+        return gender_codes, country_filter
+
+    def filtered_record(self, position: int, gender_codes: Optional[set] = None,
+                        country_filter: Optional[set] = None, exclude=None) -> Optional[dict]:
+        """The record of the name at the position, or None if one of the filters leaves it out."""
+        if gender_codes is not None and self.genders[position] not in gender_codes:
+            return None
+        if exclude and position in exclude:
+            return None
+        return self.record(position, country_filter)
+
+    def iter_search(self, letter: Optional[str] = None, start: Optional[int] = None,
+                    genders: Optional[set] = None, countries: Optional[List[str]] = None,
+                    exclude: Optional[set] = None, after_id: Optional[int] = None) -> Iterator[dict]:
+        """Filters the catalogue like the STARTING_QUERY join does, one name at a time.
+        Names whose position is in exclude (a SeenBitmap or a set of positions) are left out,
+        with after_id only names with a higher id are returned."""
+
+        gender_codes, country_filter = self.filter_codes(genders, countries)
+
+        # Positions follow the id order, so everything before first_position can be skipped.
+        first_position = bisect_right(self.ids, after_id) if after_id is not None else 0
+
+        for position in self.candidates(letter, start, first_position):
+            record = self.filtered_record(position, gender_codes, country_filter, exclude)
+            if record is not None:
+                yield record
+
+    def search(self, letter: Optional[str] = None, start: Optional[int] = None,
+               genders: Optional[set] = None, countries: Optional[List[str]] = None,
+               exclude: Optional[set] = None, after_id: Optional[int] = None,
+               limit: Optional[int] = None) -> List[dict]:
+        """iter_search() as a list of at most `limit` names."""
+        return list(islice(self.iter_search(letter, start, genders, countries, exclude, after_id), limit))
+
+
+_catalogue: Optional[NameCatalogue] = None
+
+
+async def get_catalogue(db: Connection) -> NameCatalogue:
+    """Returns the loaded catalogue, loading it with the given connection on first use."""
+    global _catalogue # pylint: disable=global-statement
+    if _catalogue is None:
+        _catalogue = await NameCatalogue.load(db)
+    return _catalogue
@@ -2,23 +2,47 @@
 Returns a list of names that your partner has liked, but you haven't seen yet.
 Based on the user_id stored in the cookie,
 And given group_code.
+
+The names come from bitmaps of the catalogue (see seen_cache.py), the partner's liked names
+AND NOT the user's liked and disliked names, and the details from the catalogue itself.
+So the time it takes depends on the size of the catalogue, not on how many names were (dis)liked.
 """
 
 # Standard Library Imports
 from json import loads
-from os import getenv
+from typing import Optional
 
 # Third-Party Libraries
 from fastapi import HTTPException, APIRouter, Depends, Cookie, Request, Query
-from fastapi.responses import JSONResponse
 from aiosqlite import Connection, Error
 
 # Local Application Imports
-from imports import get_db, SuccessResponse, ErrorResponse, limiter, validate_token, load_project_dotenv
+from catalogue import NameCatalogue, get_catalogue
+from imports import (get_db, SuccessResponse, ErrorResponse, limiter, validate_token,
+                     seen_names, liked_names)
+from queries import queries
+from serialiser import FastJSONResponse
+from streaming import wants_stream, ndjson_response
 
 
 compare_likes_router = APIRouter()
-load_project_dotenv()
+
+
+def format_match(catalogue: NameCatalogue, position: int) -> dict:
+    """Formats a name of the catalogue the way MATCHED_NAMES_QUERY did,
+    every country and population value once."""
+    start, end = catalogue.offsets[position], catalogue.offsets[position + 1]
+    countries = dict.fromkeys(catalogue.country_names[country]
+                              for country in catalogue.pop_countries[start:end])
+    populations = dict.fromkeys(catalogue.pop_values[start:end])
+    return {
+        "id": catalogue.ids[position],
+        "name": catalogue.names[position],
+        "gender": catalogue.gender_labels[catalogue.genders[position]],
+        "countries": list(countries),
+        "populations": list(populations)
+    }
+
 
 @compare_likes_router.get("/compare_likes",
     response_model=SuccessResponse,
@@ -33,11 +57,13 @@ async def compare_likes(
     request: Request, # pylint: disable=unused-argument
     db: Connection = Depends(get_db),
     session_token: str = Cookie(None),
-    group_code: str = Query(None, max_length=6, min_length=6, examples=["abc123"])
+    group_code: str = Query(None, max_length=6, min_length=6, examples=["abc123"]),
+    stream: Optional[int] = Query(None, description="1 to stream the names as NDJSON")
     ):
 
     """GET request which returns a list of names that your partner has liked,
-    but you haven't seen yet"""
+    but you haven't seen yet.
+    Use stream=1 (or Accept: application/x-ndjson) to get one name per line."""
 
     if not session_token:
         raise HTTPException(status_code=401, detail="not logged in")
@@ -49,32 +75,30 @@ async def compare_likes(
 
     await validate_token(token, user_id, db)
 
-    # Query to find the names your partner has liked, but you haven't seen yet.
-    query = getenv("MATCHED_NAMES_QUERY")
-
     # Check if the group code is valid.
     async with db.execute("SELECT 1 FROM groups WHERE group_code = ?;", (group_code,)) as cursor:
         if not await cursor.fetchone():
             raise HTTPException(status_code=400, detail="error: invalid group code")
 
     try:
-        async with db.execute(query, (user_id, group_code, user_id, user_id, user_id)) as cursor:
-            rows = await cursor.fetchall()
+        # The other members of the group, none when the user isn't in it.
+        async with db.execute(queries.GROUP_PARTNERS_QUERY, (user_id, user_id, group_code)) as cursor:
+            partner_ids = [row[0] for row in await cursor.fetchall()]
     except Error as e:
         raise HTTPException(status_code=400, detail=f"error: database error {e}") from e
 
-    # Formats the search results into a list of dictionaries / JSON.
-    grouped_data = {}
-
-    for row in rows:
-        name_id = row[0]
-        if name_id not in grouped_data:
-            grouped_data[name_id] = {
-                "name": row[1],
-                "gender": row[2],
-                "countries": row[3].split(",") if row[3] else [],
-                "populations": [int(pop) for pop in row[4].split(",")] if row[4] else []
-            }
-
-    results = [{"id": id, **data} for id, data in grouped_data.items()]
-    return JSONResponse(content=results, status_code=200)
+    catalogue = await get_catalogue(db)
+    results = []
+    if partner_ids:
+        # Both come from the caches, and include the swipes still in the write-behind buffer.
+        seen = await seen_names(user_id, db)
+        partner_likes = [await liked_names(partner_id, db) for partner_id in partner_ids]
+
+        unseen = partner_likes[0].union(*partner_likes[1:]).difference(seen)
+        # In id order, like the GROUP BY n.id of the query.
+        results = [format_match(catalogue, position) for position in unseen]
+
+    if wants_stream(request, stream):
+        return ndjson_response(results)
+
+    return FastJSONResponse(content=results, status_code=200)
@@ -0,0 +1,213 @@
+"""
+Pool of long-lived aiosqlite connections.
+Opening a connection starts a worker thread and parses the schema,
+so the connections are opened once and handed out per request instead.
+
+Every new connection gets the PRAGMA profile from pragma_profile(),
+WAL mode so readers and the writer don't block each other, a bigger page cache and mmap.
+"""
+
+# Standard Library
+from asyncio import get_running_loop, wait_for, TimeoutError as AsyncTimeoutError
+from collections import deque
+from contextlib import asynccontextmanager
+from os import getenv
+from time import monotonic
+from typing import Optional
+
+# Third-Party Libraries
+from aiosqlite import connect, Connection, Error
+
+
+# (pragma, environment variable, default), applied in this order.
+# busy_timeout comes first, so switching the journal mode waits for other connections' locks.
+PRAGMAS = [
+    ("busy_timeout", "DB_BUSY_TIMEOUT", "5000"),            # milliseconds
+    ("journal_mode", "DB_JOURNAL_MODE", "WAL"),
+    ("synchronous", "DB_SYNCHRONOUS", "NORMAL"),            # safe with WAL, only a power cut can lose a commit
+    ("mmap_size", "DB_MMAP_SIZE", str(256 * 1024 * 1024)),  # bytes
+    ("cache_size", "DB_CACHE_SIZE", str(-64 * 1024)),       # negative is KiB, so 64 MiB per connection
+    ("temp_store", "DB_TEMP_STORE", "MEMORY"),
+]
+
+
+def pragma_profile() -> dict:
+    """The PRAGMA values from the environment. An empty variable keeps SQLite's default."""
+    profile = {}
+    for pragma, variable, default in PRAGMAS:
+        value = getenv(variable, default)
+        if value:
+            profile[pragma] = value
+    return profile
+
+
+async def apply_pragmas(db: Connection, profile: dict):
+    """Applies a PRAGMA profile to a connection."""
+    for pragma, value in profile.items():
+        # PRAGMA values can't be bound as parameters, the profile only comes from the environment.
+        async with db.execute(f"PRAGMA {pragma} = {value};"):
+            pass
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """A fixed size pool of aiosqlite connections to one database."""
+
+    def __init__(self, database: str, name: str, size: int = 4,
+                 timeout: float = 5.0, health_check_after: float = 30.0,
+                 pragmas: Optional[dict] = None):
+        self.database = database
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        # Applied to every connection the pool opens.
+        self.pragmas = pragmas or {}
+        # Idle connections older than this (in seconds) get a "SELECT 1" before checkout.
+        self.health_check_after = health_check_after
+
+        self._idle: deque = deque()   # (connection, time it was returned)
+        self._waiters: deque = deque()
+        self._opened = 0
+        self._in_use = 0
+
+        self._metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "replaced": 0,
+            "peak_in_use": 0,
+            "max_wait_ms": 0.0,
+        }
+
+    async def _connect(self) -> Connection:
+        """Opens a new connection on a daemon thread, so idle connections never keep the process alive."""
+        db = connect(self.database)
+        db.daemon = True
+        await db
+        try:
+            await apply_pragmas(db, self.pragmas)
+        except Error:
+            await db.close()
+            raise
+        return db
+
+    async def _open(self) -> Connection:
+        """Opens a new connection for the pool."""
+        db = await self._connect()
+        self._opened += 1
+        return db
+
+    async def _discard(self, db: Connection):
+        """Closes a connection and frees its slot in the pool."""
+        self._opened -= 1
+        try:
+            await db.close()
+        except (Error, ValueError):
+            pass
+
+    async def _healthy(self, db: Connection) -> bool:
+        """Checks if a connection still answers."""
+        try:
+            async with db.execute("SELECT 1") as cursor:
+                await cursor.fetchone()
+            return True
+        except (Error, ValueError):
+            return False
+
+    async def acquire(self) -> Connection:
+        """Checks out a connection, waiting at most `timeout` seconds for a free one."""
+        started = monotonic()
+
+        if self._idle:
+            db, returned_at = self._idle.popleft()
+        elif self._opened < self.size:
+            # Claim the slot before awaiting, so concurrent requests can't open too many.
+            self._opened += 1
+            try:
+                db = await self._connect()
+            except BaseException:
+                self._opened -= 1
+                raise
+            returned_at = monotonic()
+        else:
+            # Pool exhausted, wait for another request to hand its connection back.
+            self._metrics["waits"] += 1
+            waiter = get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                db, returned_at = await wait_for(waiter, self.timeout)
+            except AsyncTimeoutError as e:
+                self._metrics["timeouts"] += 1
+                raise PoolTimeout(f"no {self.name} connection available") from e
+            except BaseException:
+                # Cancelled after a connection was already handed over, put it back.
+                if waiter.done() and not waiter.cancelled():
+                    self._idle.append(waiter.result())
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+        if monotonic() - returned_at > self.health_check_after and not await self._healthy(db):
+            self._metrics["replaced"] += 1
+            await self._discard(db)
+            db = await self._open()
+
+        self._in_use += 1
+        self._metrics["checkouts"] += 1
+        self._metrics["peak_in_use"] = max(self._metrics["peak_in_use"], self._in_use)
+        wait_ms = (monotonic() - started) * 1000
+        self._metrics["max_wait_ms"] = max(self._metrics["max_wait_ms"], round(wait_ms, 2))
+        return db
+
+    async def release(self, db: Connection):
+        """Returns a connection to the pool, rolling back anything left uncommitted."""
+        self._in_use -= 1
+
+        try:
+            if db.in_transaction:
+                await db.rollback()
+        except (Error, ValueError):
+            self._metrics["replaced"] += 1
+            await self._discard(db)
+            if not self._waiters:
+                return
+            db = await self._open()
+
+        # Hand the connection straight to the first request still waiting for one.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result((db, monotonic()))
+                return
+
+        self._idle.append((db, monotonic()))
+
+    @asynccontextmanager
+    async def connection(self):
+        """Async context manager around acquire() and release()."""
+        db = await self.acquire()
+        try:
+            yield db
+        finally:
+            await self.release(db)
+
+    async def close(self):
+        """Closes all idle connections."""
+        while self._idle:
+            db, _ = self._idle.popleft()
+            await self._discard(db)
+
+    def stats(self) -> dict:
+        """Current pool usage and counters."""
+        return {
+            "size": self.size,
+            "open": self._opened,
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "waiting": len(self._waiters),
+            **self._metrics,
+        }
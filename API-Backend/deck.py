@@ -0,0 +1,180 @@
+"""
+Swipe deck of the logged in user: the names of a search, in a random order of their own,
+a few at a time. Where the user is in the deck is saved, so the next call continues
+after the last name that was sent and no name comes twice.
+Liked and disliked names are left out.
+
+The order is a seeded permutation of the matching names, any step of it is computed
+without shuffling or sorting the whole list, so a deep deck costs the same as a new one.
+The matching names of a set of filters are listed once and cached by the catalogue.
+"""
+
+# Standard Library
+from datetime import datetime
+from json import loads
+from random import Random, getrandbits
+from typing import List, Optional, Sequence
+
+# Third-Party Libraries
+from fastapi import HTTPException, APIRouter, Depends, Cookie, Query, Request
+from aiosqlite import Connection, Error
+
+# Local Application Imports
+from imports import (get_db, write_connection, limiter, validate_token, search_filters, seen_names,
+                     SuccessResponse, ErrorResponse)
+from queries import queries
+from serialiser import FastJSONResponse
+from catalogue import NameCatalogue, get_catalogue, gender_filter
+
+
+deck_router = APIRouter()
+
+# Names per call when the size parameter isn't given, and the most a client can ask for.
+DECK_SIZE = 10
+MAX_DECK_SIZE = 100
+# Times a call walks the deck again when another call of the user saved the cursor first.
+DECK_ATTEMPTS = 3
+# Part of the saved filter key, the deck is no longer the same when the way it's built changes.
+DECK_VERSION = "2"
+
+
+class SeededPermutation:
+    """A random looking permutation of range(size), fixed by the seed.
+    A 4 round Feistel network over the smallest even number of bits that fits size,
+    values outside range(size) are put through again (cycle walking) until they fit."""
+
+    def __init__(self, size: int, seed: int):
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        self.half = (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
+        rng = Random(seed)
+        self.keys = [rng.getrandbits(32) for _ in range(4)]
+
+    def _round(self, value: int, key: int) -> int:
+        value = (value ^ key) * 0x9E3779B1 & 0xFFFFFFFF
+        value ^= value >> 15
+        value = value * 0x85EBCA6B & 0xFFFFFFFF
+        return (value ^ (value >> 13)) & self.mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half, value & self.mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self.half) | right
+
+    def __getitem__(self, step: int) -> int:
+        """The index at the given step, every index in range(size) comes exactly once."""
+        value = self._encrypt(step)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+
+def deal(catalogue: NameCatalogue, positions: Sequence[int], order: SeededPermutation, step: int,
+         size: int, country_filter: Optional[set] = None, seen=None) -> tuple:
+    """Walks the deck from step on, names the user has seen are skipped.
+    Returns at most size records and the step to continue from."""
+    names = []
+    while step < len(positions) and len(names) < size:
+        record = catalogue.filtered_record(positions[order[step]], None, country_filter, seen)
+        step += 1
+        if record is not None:
+            names.append(record)
+    return names, step
+
+
+def deck_key(letter: Optional[str], start: Optional[int], gender: Optional[str], countries: List[str]) -> str:
+    """The filters of a deck as text, every set of filters is a deck of its own."""
+    return "|".join([DECK_VERSION, letter or "", "anywhere" if start == 0 else "start",
+                     gender or "", ",".join(sorted(countries))])
+
+
+@deck_router.get("/deck",
+    response_model=SuccessResponse,
+    responses={
+        400:
+            {"description": "bad request - unsuccessful response",
+            "model": ErrorResponse},
+        401:
+            {"description": "not logged in",
+            "content": {
+                "application/json": {
+                    "example": {"error: not logged in"}
+}}}})
+@limiter.limit("30/minute")
+async def deck(
+    # Request might seem unused, but it is used by the limiter
+    request: Request, # pylint: disable=unused-argument
+    letter: Optional[str] = Query(None, max_length=10, examples=["ab"]),
+    gender: Optional[str] = Query(None, max_length=2, examples=["f"]),
+    country: Optional[List[str]] = Query(None, examples=["Netherlands"]),
+    start: Optional[int] = Query(None,
+                                examples=["1 (default) for starting letter, 0 for anywhere"]),
+    size: int = Query(DECK_SIZE, ge=1, le=MAX_DECK_SIZE, description="number of names to return"),
+    reset: Optional[int] = Query(None, description="1 to shuffle the deck again and start over"),
+    db: Connection = Depends(get_db),
+    session_token: str = Cookie(None)
+):
+
+    """GET request for the next names of the user's swipe deck.
+    Takes the same filters as /search, all optional, without filters the deck has every name.
+    Returns at most size names the user hasn't been sent from this deck yet,
+    an empty list when the deck is finished."""
+
+    if not session_token:
+        raise HTTPException(status_code=401, detail="error: not logged in")
+
+    # Reads the cookie.
+    user_info = loads(session_token)
+    user_id = user_info["id"]
+    token = user_info["session_token"]
+    await validate_token(token, user_id, db)
+
+    query_letter, query_gender, query_country = search_filters(letter, gender, country)
+    key = deck_key(query_letter, start, query_gender, query_country)
+
+    catalogue = await get_catalogue(db)
+    seen = await seen_names(user_id, db)
+
+    # The deck is only the names that pass the gender and country filters,
+    # so a rare filter doesn't make a call walk over the whole catalogue.
+    gender_codes, country_filter = catalogue.filter_codes(gender_filter(query_gender), query_country)
+    positions = catalogue.filtered_list(query_letter, start, gender_codes, country_filter)
+
+    # Everything is read through the read pool, the write connection is only taken to save the cursor.
+    # The cursor is only saved if it didn't change since it was read, otherwise another call
+    # sent names from the deck meanwhile and the deck is walked again from the new cursor.
+    for _ in range(DECK_ATTEMPTS):
+        try:
+            async with db.execute(queries.FIND_DECK, (user_id, key)) as cursor:
+                row = await cursor.fetchone()
+        except Error as e:
+            raise HTTPException(status_code=400, detail="error: database error") from e
+
+        # A new deck (or a reset one) gets a new order.
+        if row is None or reset:
+            seed, step = getrandbits(62), 0
+        else:
+            seed, step = row
+        saved_seed, saved_step = row if row is not None else (None, None)
+
+        names, step = deal(catalogue, positions, SeededPermutation(len(positions), seed),
+                           step, size, country_filter, seen)
+
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            async with write_connection() as write_db:
+                cursor = await write_db.execute(queries.SAVE_DECK,
+                                                (user_id, key, seed, step, now, saved_seed, saved_step))
+                saved = cursor.rowcount > 0
+                await write_db.commit()
+        except Error as e:
+            raise HTTPException(status_code=400, detail="error: database error") from e
+
+        if saved:
+            return FastJSONResponse(content=names, status_code=200)
+        # A reset only has to happen once.
+        reset = None
+
+    raise HTTPException(status_code=409, detail="error: the deck changed, try again")
@@ -6,7 +6,6 @@ The user must be logged in (have a valid cookie) to delete a group.
 
 # Standard Library
 from json import loads, dumps
-from os import getenv
 
 # Third-Party Libraries
 from fastapi import HTTPException, Depends, Cookie, APIRouter, Query, Request
@@ -14,11 +13,11 @@ from fastapi.responses import JSONResponse
 from aiosqlite import Connection, Error
 
 # Local Application Imports
-from imports import get_db, limiter, validate_token, load_project_dotenv
+from imports import get_write_db, limiter, validate_token
+from queries import queries
 
 
 delete_group_router = APIRouter()
-load_project_dotenv()
 
 
 @delete_group_router.delete("/delete_group",
@@ -41,7 +40,7 @@ async def delete_group(
     # Request might seem unused, but it is used by the limiter
     request: Request, # pylint: disable=unused-argument
     group_code: str = Query(..., max_length=6, min_length=6, examples=["ab1234"]),
-    db: Connection = Depends(get_db),
+    db: Connection = Depends(get_write_db),
     session_token: str = Cookie(None)
 ):
 
@@ -59,7 +58,7 @@ async def delete_group(
 
     try:
         # Query to check if user is indeed in the given group.
-        code_query = getenv("CHECK_IF_IN_GROUP")
+        code_query = queries.CHECK_IF_IN_GROUP
 
         async with db.execute(code_query, (group_code,)) as cursor:
             rows = [row[0] for row in await cursor.fetchall()]
@@ -77,16 +76,16 @@ async def delete_group(
         raise HTTPException(status_code=400, detail="error: database error") from e
 
     # check if the group has 1 or 2 users
-    count_query = getenv("COUNT_USERS_IN_GROUP")
+    count_query = queries.COUNT_USERS_IN_GROUP
 
     # delete dependent rows first
-    delete_link_query = getenv("DELETE_LINK_GROUPS")
+    delete_link_query = queries.DELETE_LINK_GROUPS
 
     # then delete parent rows
-    delete_group_query = getenv("DELETE_GROUP")
+    delete_group_query = queries.DELETE_GROUP
 
     # delete only the link to the user, if there are 2 users in the group.
-    only_link_query = getenv("DELETE_2LINKS_GROUPS")
+    only_link_query = queries.DELETE_2LINKS_GROUPS
 
     try:
         async with db.execute(count_query, (group_code,)) as cursor:
@@ -6,7 +6,6 @@ The user must be the only member of a group to automatically delete the group.
 
 # Standard Library
 from json import loads
-from os import getenv
 
 # Third-Party Libraries
 from fastapi import Depends, HTTPException, Request, Cookie, APIRouter
@@ -14,11 +13,14 @@ from fastapi.responses import JSONResponse
 from aiosqlite import Connection, Error
 
 # Local Application Imports
-from imports import get_db, limiter, validate_token, load_project_dotenv
+from imports import get_write_db, limiter, validate_token
+from queries import queries
+from session_cache import session_cache
+from seen_cache import seen_cache, liked_cache
+from swipe_buffer import swipe_buffer
 
 
 delete_user_router = APIRouter()
-load_project_dotenv()
 
 @delete_user_router.delete("/delete_user",
     responses={
@@ -39,7 +41,7 @@ load_project_dotenv()
 async def delete_user(
     # Request might seem unused, but it is used by the limiter
     request: Request, # pylint: disable=unused-argument
-    db: Connection = Depends(get_db),
+    db: Connection = Depends(get_write_db),
     session_token: str = Cookie(None)
 ):
 
@@ -55,34 +57,40 @@ async def delete_user(
     token = user_info["session_token"]
     user_name = user_info["username"]
     await validate_token(token, user_id, db)
+    # Swipes still in the write-behind buffer would otherwise be written after the delete.
+    await swipe_buffer.sync(user_id)
 
 
     # Query to see which groups the user might be in.
-    async with db.execute(getenv("SELECT_GROUPS"),
+    async with db.execute(queries.SELECT_GROUPS,
         (user_id,)) as cursor:
 
         rows = await cursor.fetchall()
 
     try:
         for (group_id,) in rows:
-            await db.execute(getenv("DELETE_LINK_USER"), (group_id, user_id))
+            await db.execute(queries.DELETE_LINK_USER, (group_id, user_id))
 
-        await db.execute(getenv("DELETE_USER_LIKED"), (user_id,))
-        await db.execute(getenv("DELETE_USER_DISLIKED"), (user_id,))
-        await db.execute(getenv("DELETE_USER"), (user_id,))
+        await db.execute(queries.DELETE_USER_LIKED, (user_id,))
+        await db.execute(queries.DELETE_USER_DISLIKED, (user_id,))
+        await db.execute(queries.DELETE_USER_DECKS, (user_id,))
+        await db.execute(queries.DELETE_USER, (user_id,))
         await db.commit()
+        session_cache.invalidate(user_id)
+        seen_cache.invalidate(user_id)
+        liked_cache.invalidate(user_id)
 
     except Error as e:
         raise HTTPException(status_code=500, detail="error: database error") from e
 
     # Check for groups with no users
-    async with db.execute(getenv("CHECK_GROUPS_WITHOUT_USERS")) as cursor:
+    async with db.execute(queries.CHECK_GROUPS_WITHOUT_USERS) as cursor:
         empty_groups = await cursor.fetchall()
 
     if empty_groups:
         # Delete groups that have no users linked
         for (group_id,) in empty_groups:
-            await db.execute(getenv("DELETE_GROUP"), (group_id,))
+            await db.execute(queries.DELETE_GROUP, (group_id,))
         await db.commit()
 
     return JSONResponse(status_code=200, content={"success": f"{user_name} has successfully been deleted"})
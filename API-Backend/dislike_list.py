@@ -4,19 +4,21 @@ Returns a list of all the names the user has DISliked.
 
 # Standard Library
 from json import loads
-from os import getenv
+from typing import Optional
 
 # Third-Party Libraries
-from fastapi import HTTPException, APIRouter, Depends, Cookie, Request
-from fastapi.responses import JSONResponse
+from fastapi import HTTPException, APIRouter, Depends, Cookie, Request, Query
 from aiosqlite import Connection, Error
 
 # Local Application Imports
-from imports import get_db, SuccessResponse, ErrorResponse, limiter, load_project_dotenv
+from imports import get_db, stream_pool, SuccessResponse, ErrorResponse, limiter
+from queries import queries
+from serialiser import FastJSONResponse
+from streaming import wants_stream, ndjson_response, stream_grouped_records
+from swipe_buffer import swipe_buffer
 
 
 dislike_list_router = APIRouter()
-load_project_dotenv()
 
 @dislike_list_router.get("/dislike_list",
     response_model=SuccessResponse,
@@ -30,21 +32,29 @@ async def like_list(
     # Request might seem unused, but it is used by the limiter
     request: Request, # pylint: disable=unused-argument
     db: Connection = Depends(get_db),
-    session_token: str = Cookie(None)
+    session_token: str = Cookie(None),
+    stream: Optional[int] = Query(None, description="1 to stream the names as NDJSON")
     ):
 
-    """GET request which returns a list of all the names the user has disliked"""
+    """GET request which returns a list of all the names the user has disliked.
+    Use stream=1 (or Accept: application/x-ndjson) to get one name per line."""
 
     if not session_token:
         raise HTTPException(status_code=401, detail="not logged in")
 
     # Query to find ALL the names the given user has disliked.
-    query = getenv("DISLIKE_LIST")
+    query = queries.DISLIKE_LIST
 
     # Reads the cookie.
     data = loads(session_token)
     user_id = data["id"]
 
+    # The user's swipes that are still in the write-behind buffer.
+    await swipe_buffer.sync(user_id)
+
+    if wants_stream(request, stream):
+        return ndjson_response(await stream_grouped_records(stream_pool, query, (user_id,)))
+
     try:
         async with db.execute(query, (user_id,)) as cursor:
             rows = await cursor.fetchall()
@@ -65,7 +75,7 @@ async def like_list(
 
         results = [{"id": id, **data} for id, data in grouped_data.items()]
 
-        return JSONResponse(content=results, status_code=200)
+        return FastJSONResponse(content=results, status_code=200)
     except Error as e:
         raise HTTPException(status_code=400, detail="error: database error") from e
     
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+Generates a names.db with random data, for benchmarks and tests at any size.
+Every table of the real database is created and filled, the sizes are set per table,
+and the likes can be skewed so a few names and a few users account for most of them.
+
+    python generate_db.py --out static/names.db --names 1000000 --countries 200 \\
+        --users 100000 --likes 5000 --name-skew 1.1 --user-skew 1.0
+
+The same arguments and --seed always give the same database.
+All users get the same password (--password) and a valid session token.
+"""
+
+# Standard Library
+import argparse
+import random
+import sqlite3
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from itertools import accumulate
+from math import log
+from os import path, remove
+from typing import List, NamedTuple, Optional
+
+# Local Application Imports
+from password import hash_pwd
+
+
+SCHEMA = """
+CREATE TABLE names (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, gender TEXT);
+CREATE TABLE countries (id INTEGER PRIMARY KEY AUTOINCREMENT, country TEXT NOT NULL UNIQUE);
+CREATE TABLE population (name_id INT NOT NULL, country_id INT NOT NULL, pop INT NOT NULL,
+                         PRIMARY KEY (name_id, country_id));
+CREATE TABLE similar (group_id INT NOT NULL, name_id INT NOT NULL, PRIMARY KEY (group_id, name_id));
+CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT NOT NULL UNIQUE, password TEXT NOT NULL,
+                    session_token TEXT UNIQUE, session_expiration TIMESTAMP,
+                    recovery_token TEXT NOT NULL UNIQUE, last_login TIMESTAMP NOT NULL);
+CREATE TABLE user_liked (name_id INT NOT NULL, user_id INTEGER NOT NULL, PRIMARY KEY (name_id, user_id));
+CREATE TABLE user_disliked (user_id INTEGER NOT NULL, name_id INT NOT NULL, PRIMARY KEY (user_id, name_id));
+CREATE TABLE groups (group_id INTEGER PRIMARY KEY, group_code TEXT NOT NULL UNIQUE);
+CREATE TABLE link_users (user_id INTEGER NOT NULL, group_id INTEGER NOT NULL, PRIMARY KEY (user_id, group_id));
+CREATE TABLE failed_logins (ip TEXT PRIMARY KEY NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,
+                            last_attempt TIMESTAMP NOT NULL);
+"""
+
+COUNTRIES = ["Netherlands", "USA", "Germany", "France", "Belgium", "Spain", "Italy", "Sweden",
+             "Norway", "Denmark", "Poland", "Portugal", "Austria", "Ireland", "Finland", "Greece"]
+
+# The gender values of the names table, with roughly how often they occur.
+GENDERS = ["F", "?F", "M", "?M", "?"]
+GENDER_WEIGHTS = [40, 5, 40, 5, 10]
+
+SYLLABLES = ["a", "an", "ba", "be", "bo", "da", "de", "el", "em", "fa", "fi", "ga", "ha", "he", "i",
+             "ja", "jo", "ka", "ke", "la", "le", "li", "lo", "lu", "ma", "me", "mi", "mo", "na", "ne",
+             "ni", "no", "o", "pa", "pe", "ra", "re", "ri", "ro", "sa", "se", "si", "so", "ta", "te",
+             "ti", "to", "u", "va", "ve", "wi", "ya", "yo", "za", "ze", "th", "ch", "sh", "ck", "nn"]
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Rows per executemany call, so the big tables never have to be in memory at once.
+BATCH_SIZE = 50000
+
+
+class Account(NamedTuple):
+    """A generated user, with what is needed to log in or to build its cookie."""
+    user_id: int
+    username: str
+    session_token: str
+    group_code: Optional[str]
+
+
+def zipf_cum_weights(count: int, skew: float) -> List[float]:
+    """Cumulative weights where item i gets 1 / (i + 1) ** skew, skew 0 gives every item the same weight."""
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+def weighted_sample(rng: random.Random, items: list, cum_weights: List[float], k: int) -> list:
+    """k distinct items, picked with the given cumulative weights.
+    With a strong skew there might not be k items that are likely enough, then fewer are returned."""
+    k = min(k, len(items))
+    picked = set()
+    total = cum_weights[-1]
+    for _ in range(8):
+        for _ in range(k - len(picked)):
+            picked.add(items[bisect_left(cum_weights, rng.random() * total)])
+        if len(picked) == k:
+            break
+    return list(picked)
+
+
+def activity(rng: random.Random, mean: int, skew: float) -> int:
+    """How many rows one user gets. Skew 0 gives everyone the mean,
+    higher values spread it out (lognormal with the same mean), so a few users have most of them."""
+    if skew <= 0 or mean <= 0:
+        return mean
+    return int(rng.lognormvariate(log(mean) - skew ** 2 / 2, skew))
+
+
+def random_word(rng: random.Random, syllables: int) -> str:
+    """A pronounceable made up word."""
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables)).title()
+
+
+def random_hex(rng: random.Random, length: int) -> str:
+    """Hex string from the seeded generator, so tokens are reproducible too."""
+    return f"{rng.getrandbits(length * 4):0{length}x}"
+
+
+def batched_insert(db: sqlite3.Connection, query: str, rows):
+    """Inserts the rows from a generator in batches of BATCH_SIZE."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.executemany(query, batch)
+            batch = []
+    if batch:
+        db.executemany(query, batch)
+
+
+def generate_database(db_file: str, names: int = 45000, countries: int = 16, countries_per_name: int = 4,
+                      similar_size: int = 5, users: int = 100, groups: Optional[int] = None,
+                      likes: int = 50, dislikes: Optional[int] = None, name_skew: float = 0.0,
+                      user_skew: float = 0.0, failed_logins: int = 10, password: str = "password123",
+                      seed: int = 1) -> List[Account]:
+    """Creates and fills every table of names.db in a new database file.
+    groups defaults to pairing up all users, dislikes defaults to the number of likes.
+    Returns the generated users."""
+    rng = random.Random(seed)
+    groups = users // 2 if groups is None else min(groups, users // 2)
+    dislikes = likes if dislikes is None else dislikes
+
+    db = sqlite3.connect(db_file)
+    # Nothing to lose if the generation fails halfway, so skip the journal.
+    db.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;")
+    db.executescript(SCHEMA)
+
+    # Countries, the known ones first and made up ones after that.
+    country_names = COUNTRIES[:countries]
+    while len(country_names) < countries:
+        country = random_word(rng, rng.randint(2, 4))
+        if country not in country_names:
+            country_names.append(country)
+    db.executemany("INSERT INTO countries (country) VALUES (?)", [(c,) for c in country_names])
+    # A few countries have most of the names.
+    country_ids = list(range(1, countries + 1))
+    country_weights = zipf_cum_weights(countries, 1.0)
+
+    # Names, unique and in alphabetical order like the real table.
+    generated = set()
+    while len(generated) < names:
+        generated.add(random_word(rng, rng.randint(1, 4 if names < 500000 else 5)))
+    batched_insert(db, "INSERT INTO names (name, gender) VALUES (?, ?)",
+                   ((name, rng.choices(GENDERS, GENDER_WEIGHTS)[0]) for name in sorted(generated)))
+    del generated
+
+    name_ids = list(range(1, names + 1))
+    batched_insert(db, "INSERT INTO population VALUES (?, ?, ?)",
+                   ((name_id, country_id, rng.randint(-10, 10))
+                    for name_id in name_ids
+                    for country_id in sorted(weighted_sample(rng, country_ids, country_weights,
+                                                             rng.randint(1, countries_per_name)))))
+
+    # Similar names come in groups of about similar_size.
+    shuffled = name_ids[:]
+    rng.shuffle(shuffled)
+    batched_insert(db, "INSERT INTO similar VALUES (?, ?)",
+                   ((position // similar_size + 1, name_id) for position, name_id in enumerate(shuffled)))
+
+    # Users, all with the same password hash (argon2 is too slow to hash each one).
+    password_hash = hash_pwd(password)
+    now = datetime.now()
+    expiration = (now + timedelta(hours=24)).strftime(TIME_FORMAT)
+    accounts = []
+    for user_id in range(1, users + 1):
+        username = f"user{user_id:07d}"
+        session_token = random_hex(rng, 40)
+        last_login = (now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))).strftime(TIME_FORMAT)
+        db.execute("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?)",
+                   (user_id, username, password_hash, session_token, expiration,
+                    random_hex(rng, 16), last_login))
+        accounts.append(Account(user_id, username, session_token, None))
+
+    # Groups of two users, like the API allows.
+    members = list(range(1, users + 1))
+    rng.shuffle(members)
+    for group_id in range(1, groups + 1):
+        group_code = random_hex(rng, 6)
+        while db.execute("SELECT 1 FROM groups WHERE group_code = ?", (group_code,)).fetchone():
+            group_code = random_hex(rng, 6)
+        db.execute("INSERT INTO groups VALUES (?, ?)", (group_id, group_code))
+        for user_id in members[group_id * 2 - 2:group_id * 2]:
+            db.execute("INSERT INTO link_users VALUES (?, ?)", (user_id, group_id))
+            accounts[user_id - 1] = accounts[user_id - 1]._replace(group_code=group_code)
+
+    # Likes and dislikes, popular names (in random order of id) are picked more often.
+    popularity = name_ids[:]
+    rng.shuffle(popularity)
+    name_weights = zipf_cum_weights(names, name_skew)
+    for user_id in range(1, users + 1):
+        liked_count = activity(rng, likes, user_skew)
+        disliked_count = activity(rng, dislikes, user_skew)
+        seen = weighted_sample(rng, popularity, name_weights, liked_count + disliked_count)
+        rng.shuffle(seen)
+        batched_insert(db, "INSERT INTO user_liked VALUES (?, ?)",
+                       ((name_id, user_id) for name_id in seen[:liked_count]))
+        batched_insert(db, "INSERT INTO user_disliked VALUES (?, ?)",
+                       ((user_id, name_id) for name_id in seen[liked_count:]))
+
+    batched_insert(db, "INSERT INTO failed_logins VALUES (?, ?, ?)",
+                   ((f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", rng.randint(1, 5),
+                     (now - timedelta(minutes=rng.randint(0, 14 * 24 * 60))).strftime(TIME_FORMAT))
+                    for i in range(failed_logins)))
+
+    db.commit()
+    db.close()
+    return accounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="database file to create")
+    parser.add_argument("--force", action="store_true", help="overwrite the file if it exists")
+    parser.add_argument("--names", type=int, default=45000)
+    parser.add_argument("--countries", type=int, default=16)
+    parser.add_argument("--countries-per-name", type=int, default=4, help="maximum population rows per name")
+    parser.add_argument("--similar-size", type=int, default=5, help="names per similar group")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--groups", type=int, help="groups of two users, all users are paired by default")
+    parser.add_argument("--likes", type=int, default=50, help="average likes per user")
+    parser.add_argument("--dislikes", type=int, help="average dislikes per user, defaults to --likes")
+    parser.add_argument("--name-skew", type=float, default=0.0,
+                        help="zipf exponent of the name popularity, 0 is uniform, 1 is strongly skewed")
+    parser.add_argument("--user-skew", type=float, default=0.0,
+                        help="spread of the likes per user, 0 gives every user the same number")
+    parser.add_argument("--failed-logins", type=int, default=10)
+    parser.add_argument("--password", default="password123", help="password of every user")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if path.exists(args.out):
+        if not args.force:
+            parser.error(f"{args.out} already exists, use --force to overwrite it")
+        remove(args.out)
+
+    start = time.perf_counter()
+    generate_database(args.out, names=args.names, countries=args.countries,
+                      countries_per_name=args.countries_per_name, similar_size=args.similar_size,
+                      users=args.users, groups=args.groups, likes=args.likes, dislikes=args.dislikes,
+                      name_skew=args.name_skew, user_skew=args.user_skew,
+                      failed_logins=args.failed_logins, password=args.password, seed=args.seed)
+    print(f"✅ {args.out} generated in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,19 +6,19 @@ That user has to be logged in.
 
 # Standard Library
 from json import loads
-from os import getenv
 
 # Third-Party Libraries
 from fastapi import HTTPException, APIRouter, Depends, Cookie, Request
-from fastapi.responses import JSONResponse
 from aiosqlite import Connection, Error
 
 # Local Application Imports
-from imports import get_db, limiter, validate_token, load_project_dotenv
+from imports import get_db, limiter, validate_token
+from queries import queries
+from serialiser import FastJSONResponse
+from swipe_buffer import swipe_buffer
 
 
 group_liked_router = APIRouter()
-load_project_dotenv()
 
 @group_liked_router.get("/group_liked",
     responses={
@@ -60,15 +60,18 @@ async def group_liked(
     token = data["session_token"]
 
     await validate_token(token, user_id, db)
+    # The swipes still in the write-behind buffer, the other members' ones too.
+    await swipe_buffer.sync_all()
 
     # Query to find the names BOTH users in the group(s) have liked.
-    query = getenv("GROUP_LIKED_NAMES")
+    # group_matches is kept up to date by triggers (see migrations.py), so this only reads an index.
+    query = queries.GROUP_MATCHES_QUERY
 
     try:
         async with db.execute(query, (user_id,)) as cursor:
             results = await cursor.fetchall()
         if not results:
-            return JSONResponse(
+            return FastJSONResponse(
                 content={"message": "no common likes found for this user in their groups."},
                 status_code=200
             )
@@ -80,6 +83,6 @@ async def group_liked(
         {"group code": row[0], "name id": row[1], "name": row[2]}
         for row in results]
 
-    return JSONResponse(
+    return FastJSONResponse(
         content=response_data,
         status_code=200)
@@ -0,0 +1,60 @@
+"""
+HTTP caching of the anonymous catalogue endpoints (/search and /similar without a session cookie).
+Their responses only depend on the parameters and the catalogue, which doesn't change
+while the API runs. So the ETag is a hash of the catalogue version and the (formatted) parameters,
+a client or CDN that sends it back in If-None-Match gets a 304 without the search being run.
+
+Logged in responses leave out the user's liked and disliked names,
+they are marked private and never stored.
+"""
+
+# Standard Library
+from hashlib import blake2b
+from os import getenv
+from typing import Optional
+
+# Third-Party Libraries
+from fastapi import Request, Response
+
+
+# How long browsers and CDNs may reuse an anonymous response without asking again, in seconds.
+HTTP_CACHE_MAX_AGE = int(getenv("HTTP_CACHE_MAX_AGE", "3600"))
+
+PUBLIC_CACHE_CONTROL = f"public, max-age={HTTP_CACHE_MAX_AGE}"
+PRIVATE_CACHE_CONTROL = "private, no-store"
+
+# The session cookie and the Accept header (NDJSON streaming) change the response too.
+VARY = "Cookie, Accept"
+
+
+def make_etag(version: str, *parts) -> str:
+    """A strong ETag for the catalogue version and the parameters of a request."""
+    key = blake2b(repr((version,) + parts).encode(), digest_size=16)
+    return f'"{key.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Checks the If-None-Match header of the request against the ETag (weak comparison, RFC 9110)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def public_headers(etag: str) -> dict:
+    """The headers of a cacheable anonymous response."""
+    return {"ETag": etag, "Cache-Control": PUBLIC_CACHE_CONTROL, "Vary": VARY}
+
+
+def private_headers() -> dict:
+    """The headers of a logged in response, which no cache may store."""
+    return {"Cache-Control": PRIVATE_CACHE_CONTROL, "Vary": VARY}
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """A 304 response when the client already has the response with this ETag, otherwise None."""
+    if etag is None or not etag_matches(request, etag):
+        return None
+    return Response(status_code=304, headers=public_headers(etag))
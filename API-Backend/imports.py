@@ -7,8 +7,10 @@ To prevent circular imports.
 from threading import local
 from os import path, getenv
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Optional
 from secrets import token_hex
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from binascii import Error as DecodeError
 from contextlib import asynccontextmanager
 
 # Third-Party Libraries
@@ -18,20 +20,29 @@ from pydantic import BaseModel, Field, RootModel
 from slowapi import Limiter, _rate_limit_exceeded_handler as rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from aiosqlite import connect, Connection, IntegrityError
+from aiosqlite import Connection, Error, IntegrityError
 from dotenv import load_dotenv
 
 # Local Application Imports
 from scheduler import start_scheduler
+from db_pool import ConnectionPool, PoolTimeout, pragma_profile
+from catalogue import get_catalogue
+from migrations import migrate, ensure_fts
+from session_cache import session_cache, CachedSession
+from seen_cache import seen_cache, liked_cache, SeenBitmap, SeenCache
+from swipe_buffer import swipe_buffer
+from queries import queries
+from serialiser import FastJSONResponse
 
 
 # Get the base directory of the current file (your app's directory)
 basedir = path.abspath(path.dirname(__file__))
-# Construct the full database path
-db_path = path.join(basedir, 'static', 'names.db')
+# Construct the full database path, NAMES_DB points the API at another database (e.g. a generated one).
+db_path = getenv("NAMES_DB", path.join(basedir, 'static', 'names.db'))
 static_path = path.join(basedir, 'static')
 
-# Load environment variables from the .env file
+# Load environment variables from the .env file.
+# The SQL in it is read by queries.py, this is for settings like the pool sizes.
 def load_project_dotenv():
     """Load environment variables secrets."""
     dotenv_path = path.join(path.dirname(__file__), '..', 'secrets.env')
@@ -46,17 +57,69 @@ def load_main_dotenv():
     load_dotenv(dotenv_path=dotenv_path)
 
 
+# Long-lived connections, shared by all requests.
+# Reads and writes get their own pool so writers queue up behind each other, not behind readers.
+read_pool = ConnectionPool(db_path, name="read",
+                           size=int(getenv("DB_READ_POOL_SIZE", "4")),
+                           timeout=float(getenv("DB_POOL_TIMEOUT", "5")),
+                           pragmas=pragma_profile())
+write_pool = ConnectionPool(db_path, name="write",
+                            size=int(getenv("DB_WRITE_POOL_SIZE", "1")),
+                            timeout=float(getenv("DB_POOL_TIMEOUT", "5")),
+                            pragmas=pragma_profile())
+# The write-behind swipe buffer (SWIPE_BUFFER=1) writes through its own connection,
+# so requests that hold a write connection can wait for it without a deadlock.
+swipe_pool = ConnectionPool(db_path, name="swipes", size=1,
+                            timeout=float(getenv("DB_POOL_TIMEOUT", "5")),
+                            pragmas=pragma_profile())
+# NDJSON streams hold a connection while the client reads, a separate small pool
+# keeps slow clients from taking the read connections of the other requests.
+stream_pool = ConnectionPool(db_path, name="stream",
+                             size=int(getenv("DB_STREAM_POOL_SIZE", "2")),
+                             timeout=float(getenv("DB_POOL_TIMEOUT", "5")),
+                             pragmas=pragma_profile())
+
+
+# If /search can use the names_fts index, set in the lifespan.
+_fts_ready = False
+
+
+def fts_ready() -> bool:
+    """If names_fts exists, SEARCH_ENGINE=fts5 falls back to the plain sql search without it."""
+    return _fts_ready
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan event handler to start the scheduler when the app starts."""
+    global _fts_ready # pylint: disable=global-statement
     start_scheduler(db_path)  # Start scheduler when app starts
+    async with write_pool.connection() as db:
+        await migrate(db)
+        # names_fts is only built for the fts5 engine, it needs SQLite's FTS5 with the trigram tokenizer.
+        if getenv("SEARCH_ENGINE", "catalogue") == "fts5":
+            _fts_ready = await ensure_fts(db)
+            if not _fts_ready:
+                print("❌ SEARCH_ENGINE=fts5 without names_fts, searching with sql instead")
+    # Only runs with SWIPE_BUFFER=1.
+    swipe_buffer.start(swipe_pool)
+    # Load the names catalogue up front instead of on the first search.
+    async with read_pool.connection() as db:
+        await get_catalogue(db)
     yield
+    # Writes the swipes that are still waiting before the connections close.
+    await swipe_buffer.stop()
+    await read_pool.close()
+    await write_pool.close()
+    await swipe_pool.close()
+    await stream_pool.close()
 
 
 # Slowapi rate limiter
 limiter = Limiter(key_func=get_remote_address)
 app = FastAPI(lifespan=lifespan, title="Pick-A-Name API",
-                description="API for the Pick-A-Name application")
+                description="API for the Pick-A-Name application",
+                default_response_class=FastJSONResponse)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler) # type: ignore
 
@@ -75,6 +138,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Link"],
     max_age=maxage)
 
 thread_local_storage = local()
@@ -96,14 +160,43 @@ class ErrorResponse(BaseModel):
     detail: str = Field(..., examples=["error: database error"])
 
 
-# @asynccontextmanager
 async def get_db():
-    """Asynchronous context manager to get a database connection."""
-    db = await connect(db_path)
+    """Dependency that lends a connection from the read pool for the duration of a request."""
+    try:
+        db = await read_pool.acquire()
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail="error: database busy") from e
     try:
         yield db
     finally:
-        await db.close()
+        await read_pool.release(db)
+
+
+async def get_write_db():
+    """Dependency that lends a connection from the write pool, for endpoints that change data."""
+    try:
+        db = await write_pool.acquire()
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail="error: database busy") from e
+    try:
+        yield db
+    finally:
+        await write_pool.release(db)
+
+
+@asynccontextmanager
+async def write_connection():
+    """A write pool connection for a few statements.
+    Endpoints that do slow work first (like hashing a password) read through get_db
+    and only take the write connection for their writes, instead of holding it all request."""
+    try:
+        db = await write_pool.acquire()
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail="error: database busy") from e
+    try:
+        yield db
+    finally:
+        await write_pool.release(db)
 
 
 def check_letter(check):
@@ -130,6 +223,66 @@ def check_letter(check):
                         please enter only letters""")
 
 
+def search_filters(letter: Optional[str], gender: Optional[str], country: Optional[List[str]]):
+    """Formats and checks the letter, gender and country parameters of a search.
+    Returns (letter, gender, countries), the ones not given are None or []."""
+
+    # Changes the letter param to the correct format.
+    query_letter = letter.title() if letter else None
+
+    # Empty list to allow multiple countries to be given.
+    query_country = []
+
+    if country:  # Check if country is provided.
+        for c in country:
+            if c.lower() in ['usa', 'us']:
+                query_country.append('USA')
+            else:
+                query_country.append(c.title())
+
+    # Changes gender param to the correct format.
+    query_gender = gender[:-1] + gender[-1].upper() if gender else None
+
+    checklist = {}
+
+    if query_letter:
+        checklist.update({"letter": query_letter})
+    if query_gender:
+        checklist.update({"gender": query_gender.strip('?')})
+    if query_country:
+        checklist.update({"country": query_country})
+
+    # Check for letter and character validity
+    check_letter(checklist)
+
+    return query_letter, query_gender, query_country
+
+
+def encode_cursor(name_id: int) -> str:
+    """Opaque pagination cursor pointing after the given name id."""
+    return urlsafe_b64encode(f"n{name_id}".encode()).decode().rstrip("=")
+
+
+# Name ids are SQLite integers, a cursor past this can't be bound as a parameter.
+MAX_CURSOR_ID = 2 ** 63 - 1
+
+
+def decode_cursor(cursor: str) -> int:
+    """Reads the name id back out of a pagination cursor."""
+    try:
+        value = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        # Only what encode_cursor makes: "n" and the digits of an id, no sign, spaces or underscores.
+        digits = value[1:]
+        if not value.startswith("n") or not (digits.isascii() and digits.isdigit()):
+            raise ValueError(value)
+        name_id = int(digits)
+        if name_id > MAX_CURSOR_ID:
+            raise ValueError(value)
+        return name_id
+    except (DecodeError, UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail="error: invalid cursor") from e
+
+
 def timelater():
     """24 hours later, for automatic session expiration."""
 
@@ -138,11 +291,11 @@ def timelater():
     return time_later
 
 
-async def save_session_token(user_id: int, db: Connection = Depends(get_db)):
+async def save_session_token(user_id: int, db: Connection = Depends(get_write_db)):
     """Save new session token in the DB"""
 
     # Check if the cookie is older than 1 hour, if so generate a new one.
-    find_token_query = getenv("FIND_SESSION_TOKEN")
+    find_token_query = queries.FIND_SESSION_TOKEN
     try:
         async with db.execute(find_token_query, (user_id,)) as cursor:
             token_row = await cursor.fetchone()
@@ -159,7 +312,7 @@ async def save_session_token(user_id: int, db: Connection = Depends(get_db)):
             return token_row[2]
 
     # Otherwise, create a new token
-    query = getenv("SAVE_SESSION_TOKEN")
+    query = queries.SAVE_SESSION_TOKEN
 
     session_token = token_hex(20)
     session_expiration = timelater()
@@ -167,33 +320,83 @@ async def save_session_token(user_id: int, db: Connection = Depends(get_db)):
     try:
         async with db.execute(query, (session_token, session_expiration, now, user_id)):
             await db.commit()
+        session_cache.invalidate(user_id)
         return session_token
     except IntegrityError as e:
         raise HTTPException(status_code=500, detail="error: database error") from e
 
 
+async def cached_bitmap(cache: SeenCache, query: str, params: tuple, user_id, db: Connection) -> SeenBitmap:
+    """The bitmap of the name ids the query returns for the user, read from the cache when possible."""
+
+    bitmap = cache.get(user_id)
+    if bitmap is not None:
+        return bitmap
+
+    catalogue = await get_catalogue(db)
+    version = cache.version(user_id)
+    # Swipes still in the write-behind buffer have to be in the database first.
+    await swipe_buffer.sync(user_id)
+
+    try:
+        async with db.execute(query, params) as cursor:
+            bitmap = SeenBitmap(catalogue, (row[0] for row in await cursor.fetchall()))
+    except Error as e:
+        raise HTTPException(status_code=400, detail="error: database error") from e
+
+    cache.put(user_id, bitmap, version)
+    return bitmap
+
+
+async def seen_names(user_id, db: Connection) -> SeenBitmap:
+    """The catalogue positions of all names the user has liked or disliked.
+    Read from the seen cache when possible."""
+    return await cached_bitmap(seen_cache, queries.SEEN_NAMES_QUERY, (user_id, user_id), user_id, db)
+
+
+async def liked_names(user_id, db: Connection) -> SeenBitmap:
+    """The catalogue positions of the names the user has liked.
+    Read from the liked cache when possible."""
+    return await cached_bitmap(liked_cache, queries.LIKED_NAMES_QUERY, (user_id,), user_id, db)
+
+
 async def set_recovery_token():
     """Generates an 8 character recovery token."""
     recovery_token = token_hex(8)
     return recovery_token
 
 async def validate_token(session_token, user_id, db: Connection):
-    """Checks the session token in the cookie against the token in the database"""
-
-    # Query to find the user's current session token.
-    query = getenv("FIND_SESSION_TOKEN")
+    """Checks the session token in the cookie against the token in the database.
+    The token is read from the session cache when possible."""
 
+    # The cache is keyed by int, whatever type the id has in the cookie.
     try:
-        async with db.execute(query, (user_id,)) as cursor:
-            row =  await cursor.fetchone()
-            if row is None:
-                raise HTTPException(status_code=401, detail="error: invalid session")
+        cache_id = int(user_id)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=401, detail="error: invalid session") from e
 
-            expiration_date = datetime.strptime(str(row[0]), "%Y-%m-%d %H:%M:%S")
+    session = session_cache.get(cache_id)
 
-            if expiration_date > datetime.now() and row[2] == session_token:
-                return {"username": row[1], "user_id": user_id}
+    if session is None:
+        # Query to find the user's current session token.
+        query = queries.FIND_SESSION_TOKEN
+        # A logout or a new token while the row is read makes the row stale, it isn't cached then.
+        version = session_cache.version(cache_id)
 
-            raise HTTPException(status_code=401, detail="error: expired session")
-    except IntegrityError as e:
-        raise HTTPException(status_code=401, detail="error: invalid session") from e
+        try:
+            async with db.execute(query, (user_id,)) as cursor:
+                row =  await cursor.fetchone()
+        except IntegrityError as e:
+            raise HTTPException(status_code=401, detail="error: invalid session") from e
+
+        # No row, or no token at all after a logout.
+        if row is None or row[0] is None:
+            raise HTTPException(status_code=401, detail="error: invalid session")
+
+        session = CachedSession(datetime.strptime(str(row[0]), "%Y-%m-%d %H:%M:%S"), row[1], row[2])
+        session_cache.put(cache_id, session, version)
+
+    if session.expiration > datetime.now() and session.session_token == session_token:
+        return {"username": session.username, "user_id": user_id}
+
+    raise HTTPException(status_code=401, detail="error: expired session")
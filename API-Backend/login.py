@@ -15,7 +15,6 @@ With a maximum of 5 attempts, user will be locked out after the fifth failed att
 from typing import Annotated
 from json import dumps
 from datetime import timedelta, datetime
-from os import getenv
 
 # Third-Party Libraries
 from fastapi import HTTPException, APIRouter, Depends, Request
@@ -24,18 +23,33 @@ from pydantic import BaseModel, Field as field
 from aiosqlite import Connection, Error
 
 # Local Application Imports
-from imports import get_db, save_session_token, limiter, load_project_dotenv
-from password import pwd_context
+from imports import get_db, write_connection, save_session_token, limiter
+from queries import queries
+from password import verify_pwd_async
 
 
 login_router = APIRouter()
 
-load_project_dotenv()
 
 MAX_ATTEMPTS = 5  # Maximum allowed login attempts
 LOCKOUT_DURATION = timedelta(minutes=10)  # Lockout duration after max attempts
 
 
+async def record_failed_login(db: Connection, ip_address: str):
+    """Counts a failed login attempt of the ip address."""
+    last_attempt = datetime.now().replace(microsecond=0)
+    # Try to update first
+    result = await db.execute(queries.UPDATE_FAILED_LOGINS,
+        (last_attempt, ip_address))
+    await db.commit()
+
+    if result.rowcount == 0:
+        # No existing record was updated → insert new
+        await db.execute(queries.FIRST_FAILED_LOGIN,
+            (ip_address, 1, last_attempt))
+        await db.commit()
+
+
 class Item(BaseModel):
     """Model for the login request body."""
     # Annotated is used to add metadata to the fields, such as description and constraints.
@@ -82,9 +96,11 @@ async def login(
     With a maximum of 5 attempts, user will be locked out after the fifth failed attempt.
     """
 
-    query = getenv("LOGIN_QUERY")
+    # Reads go through the read pool, the password is verified without holding the
+    # write connection, which is only taken for the short writes.
+    query = queries.LOGIN_QUERY
 
-    groupcode_query = getenv("GROUPCODE_QUERY")
+    groupcode_query = queries.GROUPCODE_QUERY
 
     username = item.username.lower()
 
@@ -103,21 +119,12 @@ async def login(
 
         if not row:
             # if the user does not exist, increment the failed login attempts
-            last_attempt = datetime.now().replace(microsecond=0)
-            # Try to update first
-            result = await db.execute(getenv("UPDATE_FAILED_LOGINS"),
-                (last_attempt, ip_address))
-            await db.commit()
-
-            if result.rowcount == 0:
-                # No existing record was updated → insert new
-                await db.execute(getenv("FIRST_FAILED_LOGIN"),
-                    (ip_address, 1, last_attempt))
-                await db.commit()
-
-            async with db.execute(getenv("CHECK_FAILED_LOGINS"),
-                (ip_address,)) as cursor:
-                attempts_row = await cursor.fetchone()
+            async with write_connection() as write_db:
+                await record_failed_login(write_db, ip_address)
+
+                async with write_db.execute(queries.CHECK_FAILED_LOGINS,
+                    (ip_address,)) as cursor:
+                    attempts_row = await cursor.fetchone()
 
             if attempts_row:
                 attempts, last_attempt = attempts_row
@@ -138,7 +145,7 @@ async def login(
         hashed_pwd = row[1]
         user_id = row[2]
 
-        async with db.execute(getenv("CHECK_FAILED_LOGINS"),
+        async with db.execute(queries.CHECK_FAILED_LOGINS,
             (ip_address,)) as cursor:
             attempts_row = await cursor.fetchone()
 
@@ -157,24 +164,18 @@ async def login(
                     )
 
         # Now verify the password
-        if not pwd_context.verify(item.password, hashed_pwd):
-            last_attempt = datetime.now().replace(microsecond=0)
-            # Try to update first
-            result = await db.execute(getenv("UPDATE_FAILED_LOGINS"),
-                (last_attempt, ip_address))
-            await db.commit()
-
-            if result.rowcount == 0:
-                # No existing record was updated → insert new
-                await db.execute(getenv("FIRST_FAILED_LOGIN"),
-                    (ip_address, 1, last_attempt))
-                await db.commit()
+        if not await verify_pwd_async(item.password, hashed_pwd):
+            async with write_connection() as write_db:
+                await record_failed_login(write_db, ip_address)
 
             raise HTTPException(status_code=401, detail="error: incorrect username or password")
 
 
-        # Saves the session token to the DB.
-        session_token = await save_session_token(user_id=user_id, db=db)
+        # Saves the session token to the DB, and clears the failed attempts of the ip.
+        async with write_connection() as write_db:
+            session_token = await save_session_token(user_id=user_id, db=write_db)
+            await write_db.execute("DELETE FROM failed_logins WHERE ip = ?", (ip_address,))
+            await write_db.commit()
 
         async with db.execute(groupcode_query, (user_id,)) as cursor:
             rows = await cursor.fetchall()
@@ -241,7 +242,4 @@ async def login(
     except Error as e:
         raise HTTPException(status_code=401, detail="error: incorrect username or password") from e
 
-    await db.execute("DELETE FROM failed_logins WHERE ip = ?", (ip_address,))
-    await db.commit()
-
     return response
@@ -5,7 +5,6 @@ Requires a valid session token to be passed in the cookie.
 
 # Standard library imports
 from json import loads
-from os import getenv
 
 # Third-party library imports
 from fastapi import HTTPException, Depends, Cookie, APIRouter, Request
@@ -13,10 +12,11 @@ from fastapi.responses import JSONResponse
 from aiosqlite import Connection
 
 # Local application imports
-from imports import get_db, limiter, validate_token, load_project_dotenv
+from imports import get_write_db, limiter, validate_token
+from queries import queries
+from session_cache import session_cache
 
 logout_router = APIRouter()
-load_project_dotenv()
 
 @logout_router.get("/logout",
     responses={
@@ -38,7 +38,7 @@ load_project_dotenv()
 async def logout(
     request: Request,  # pylint: disable=unused-argument
     session_token: str = Cookie(None),
-    db: Connection = Depends(get_db)
+    db: Connection = Depends(get_write_db)
 ):
     """GET request to logout by clearing the session token cookie."""
 
@@ -53,9 +53,10 @@ async def logout(
 
     # Invalidate the session token in the database
     try:
-        query = getenv("RESET_SESSIONTOKEN")
+        query = queries.RESET_SESSIONTOKEN
         async with db.execute(query, (user_id,)):
             await db.commit()
+        session_cache.invalidate(user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail="error: invalidating session token") from e
 
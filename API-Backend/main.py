@@ -12,6 +12,10 @@ The Search Function takes the following optional parameters but at least 1 must
     If not given it defaults to the starting letter.
 
 If a user is logged in, the search will filter out names already liked/disliked by the user.
+
+By default the search runs against the in-memory names catalogue (see catalogue.py),
+set SEARCH_ENGINE=sql to run it as a join in SQLite instead,
+or SEARCH_ENGINE=fts5 to look the letters up in the names_fts trigram index (see migrations.py).
 """
 
 # Standard Library
@@ -22,15 +26,21 @@ from os import getenv
 # Third-Party Libraries
 from fastapi import Depends, Query, HTTPException, Request, Cookie
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import FileResponse
 from uvicorn import run
 from aiosqlite import Connection, Error # pylint: disable=unused-argument
 
 # Local Application Imports
 from imports import (
     app, static_path, limiter,
-    get_db, check_letter,  validate_token,
-    SuccessResponse, ErrorResponse, load_main_dotenv)
+    get_db, stream_pool, search_filters, validate_token, seen_names, encode_cursor, decode_cursor,
+    SuccessResponse, ErrorResponse, load_main_dotenv, fts_ready)
+from catalogue import get_catalogue, gender_filter
+from search_plans import SearchShape, search_plans, padded_length
+from streaming import wants_stream, ndjson_response, stream_grouped_records
+from http_cache import make_etag, not_modified, public_headers, private_headers
+from response_cache import response_cache
+from serialiser import FastJSONResponse
 from login import login_router
 from new_user import new_user_router
 from protected_route import cookie_router
@@ -48,10 +58,20 @@ from delete_user import delete_user_router
 from compare_likes import compare_likes_router
 from user_preferences import user_preferences_router
 from logout import logout_router
+from metrics import metrics_router
+from deck import deck_router
 
 
 load_main_dotenv()
 
+# "catalogue" searches the in-memory names catalogue, "sql" joins the tables in SQLite,
+# "fts5" joins them too but finds the letters with a MATCH on names_fts
+# (created at startup, without FTS5 trigram support it searches like "sql").
+SEARCH_ENGINE = getenv("SEARCH_ENGINE", "catalogue")
+
+# Largest page a client can ask for with the limit parameter.
+MAX_PAGE_SIZE = 1000
+
 # Router to add the API methods to /docs.
 app.include_router(cookie_router)
 app.include_router(like_list_router)
@@ -70,6 +90,8 @@ app.include_router(delete_group_router)
 app.include_router(unlike_router)
 app.include_router(undislike_router)
 app.include_router(delete_user_router)
+app.include_router(metrics_router)
+app.include_router(deck_router)
 
 # Displays my own HTML file.
 app.mount("/static", StaticFiles(directory=static_path), name='static')
@@ -81,6 +103,79 @@ async def read_index():
     return FileResponse(f"{static_path}/index.html")
 
 
+def build_search_query(query_letter, start, query_gender, query_country, user_id,
+                       use_fts: bool = False, after_id: Optional[int] = None, ordered: bool = False):
+    """Builds the search as a join of the population, names and countries tables.
+    With use_fts the letters are matched through the names_fts trigram index.
+    Ordered (by name id) is needed for pagination and streaming.
+    The statement comes from the search plan cache, only the parameters are built per search."""
+
+    # The parameter values, the plan picks the ones its statement uses.
+    values = {"user_id": user_id, "after_id": after_id}
+    letter_mode = None
+
+    # The trigram tokenizer needs at least 3 letters, shorter searches use LIKE.
+    if use_fts and query_letter and len(query_letter) >= 3:
+        values["match"] = '"' + query_letter + '"'
+        # MATCH already finds the letters somewhere in the name, a starting letter also needs LIKE.
+        letter_mode = "fts" if start == 0 else "fts+like"
+    elif query_letter:
+        letter_mode = "like"
+
+    if query_letter:
+        if start == 0: # Optional param to search for names with given letter(s) SOMEWHERE in the name.
+            values["like"] = '%' + query_letter + '%'
+        else: # Starting letter only.
+            values["like"] = query_letter + '%'
+
+    gender_mode = None
+    if query_gender:
+        if '?' in query_gender:
+            if query_gender == '?': # If asked for neutral gender it adds mostly female/male too.
+                gender_mode = "neutral"
+            else:
+                gender_mode = "mixed"
+                values["gender"] = query_gender
+        else:
+            gender_mode = "pair"
+            values["gender"] = (query_gender, '?' + query_gender)
+
+    # Allows multiple countries, padded with NULLs so similar lengths share a statement.
+    countries = padded_length(len(query_country)) if query_country else 0
+    if query_country:
+        values["countries"] = tuple(query_country) + (None,) * (countries - len(query_country))
+
+    shape = SearchShape(letter=letter_mode, gender=gender_mode, countries=countries,
+                        logged_in=user_id is not None, after_id=after_id is not None, ordered=ordered)
+    plan = search_plans.get(shape)
+    return plan.sql, plan.params(values)
+
+
+async def sql_search(db: Connection, query: str, params: tuple, limit: Optional[int] = None):
+    """Runs a query from build_search_query, with a limit only the first `limit` names are read."""
+
+    grouped_data = {}
+
+    try:
+        async with db.execute(query, params) as cursor:
+            # Rows come ordered by name id when paginating, so stop at the first name past the page.
+            async for row in cursor:
+                name_id = row[0]
+                if name_id not in grouped_data:
+                    if limit is not None and len(grouped_data) == limit:
+                        break
+                    grouped_data[name_id] = {
+                        "name": row[1], "gender": row[2], "country": [], "population": []}
+
+                grouped_data[name_id]["country"].append(row[3])
+                grouped_data[name_id]["population"].append(row[4])
+
+    except Error as exc:
+        raise HTTPException(status_code=400, detail="error: database error") from exc
+
+    return [{"id": id, **data} for id, data in grouped_data.items()]
+
+
 @app.get("/search",
     response_model=SuccessResponse,
     responses={
@@ -102,6 +197,11 @@ async def search_first_letter(
     country: Optional[List[str]] = Query(None, examples=["Netherlands"]),
     start: Optional[int] = Query(None,
                                 examples=["1 (default) for starting letter, 0 for anywhere"]),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE,
+                                 description="maximum number of names per page, all names if not given"),
+    cursor: Optional[str] = Query(None, max_length=32,
+                                  description="the cursor from the previous page's next link"),
+    stream: Optional[int] = Query(None, description="1 to stream the names as NDJSON"),
     db: Connection = Depends(get_db),
     session_token: str = Cookie(None)
 ):
@@ -110,76 +210,22 @@ async def search_first_letter(
     and/or given countries.
     All parameters are optional but at least 1 MUST be given.
     Use start=0 if you want the given letter to be anywhere in the name.
-    If not given it defaults to the starting letter."""
-
-    # Changes the letter param to the correct format.
-    query_letter = letter.title() if letter else None
-
-    # Empty list to allow multiple countries to be given.
-    query_country = []
-
-    if country:  # Check if country is provided.
-        for c in country:
-            if c.lower() in ['usa', 'us']:
-                query_country.append('USA')
-            else:
-                query_country.append(c.title())
+    If not given it defaults to the starting letter.
+    Give a limit to get the names one page at a time, the link to the next page
+    is in the Link header of the response (rel="next").
+    Use stream=1 (or Accept: application/x-ndjson) to get one name per line as they are found."""
 
-    # Changes gender param to the correct format.
-    query_gender = gender[:-1] + gender[-1].upper() if gender else None
+    query_letter, query_gender, query_country = search_filters(letter, gender, country)
 
     # Prevents users from giving no parameters.
     if not (query_letter or query_gender or query_country):
         raise HTTPException(status_code=400,
                             detail="error: at least one search parameter must be provided.")
 
-    checklist = {}
-
-    # Starting query to which more params are given.
-    query = str(getenv("STARTING_QUERY"))
-
-    # Empty parameters Tuple to add more params to.
-    params = ()
-
-    if start == 0: # Optional param to search for names with given letter(s) SOMEWHERE in the name.
-        if query_letter:
-            query += str(getenv("LETTER_QUERY"))
-            params += ('%' + query_letter + '%',)
-            checklist.update({"letter": query_letter})
-    else: # Starting letter only.
-        if query_letter:
-            query += str(getenv("LETTER_QUERY"))
-            params += (query_letter + '%',)
-            checklist.update({"letter": query_letter})
-
-    if query_gender:
-        if '?' in query_gender:
-            if query_gender == '?': # If asked for neutral gender it adds mostly female/male too.
-                query += str(getenv("NEUTRAL_GENDER_QUERY"))
-            else:
-                query += str(getenv("MIXED_GENDER_QUERY"))
-                params += (query_gender,)
-        else:
-            query += str(getenv("GENDER_QUERY"))
-            params += (query_gender, '?' + query_gender)
-        checklist.update({"gender": query_gender.strip('?')})
-
-    if query_country:  # Check if the list is not empty
-        if len(query_country) == 1:
-            query += str(getenv("SINGLE_COUNTRY_QUERY"))
-            params += (query_country[0],)  # Use the first element
-            checklist.update({"country": query_country})
-        else: # Allows multiple countries
-            placeholders = ",".join("?" for _ in query_country)
-            MULTI_COUNTRIES_QUERY = str(getenv("MULTI_COUNTRIES_QUERY"))
-            query += f"{MULTI_COUNTRIES_QUERY.format(placeholders=placeholders)}"
-            params += tuple(query_country)
-            checklist.update({"country": query_country})
-
-    # Check for letter and character validity
-    check_letter(checklist)
+    after_id = decode_cursor(cursor) if cursor else None
 
     # Filter out names already liked/disliked by the user.
+    user_id = None
     if session_token:
         user_info = loads(session_token)
         user_id = user_info["id"]
@@ -187,30 +233,53 @@ async def search_first_letter(
 
         await validate_token(token, user_id, db)
 
-        query += str(getenv("FILTER_ALREADY_LIKED_QUERY"))
-        params += (user_id, user_id)
-
-    try:
-        async with db.execute(query, params) as cursor:
-            rows = await cursor.fetchall()
-
-    except Error as exc:
-        raise HTTPException(status_code=400, detail="error: database error") from exc
-
-    grouped_data = {}
-
-    for row in rows:
-        name_id = row[0]
-        if name_id not in grouped_data:
-            grouped_data[name_id] = {
-                "name": row[1], "gender": row[2], "country": [], "population": []}
-
-        grouped_data[name_id]["country"].append(row[3])
-        grouped_data[name_id]["population"].append(row[4])
-
-    results = [{"id": id, **data} for id, data in grouped_data.items()]
-
-    return JSONResponse(content=results, status_code=200)
+    streamed = wants_stream(request, stream)
+
+    # Anonymous searches can be reused by browsers and CDNs, see http_cache.py.
+    # The Link header has the request's own URL in it, so with a limit the URL is part of the ETag.
+    if user_id is None:
+        version = (await get_catalogue(db)).version
+        etag = make_etag(version, "/search", SEARCH_ENGINE,
+                         query_letter, start == 0, query_gender, tuple(query_country),
+                         limit, after_id, streamed, str(request.url) if limit else None)
+        cached = not_modified(request, etag)
+        # Popular searches are sent from the response cache, streams are never cached.
+        if cached is None and not streamed:
+            cached = response_cache.get(etag)
+        if cached is not None:
+            return cached
+        headers = public_headers(etag)
+    else:
+        headers = private_headers()
+
+    # One name more than the page is read, to know if there is a next page.
+    page_limit = limit + 1 if limit else None
+
+    if SEARCH_ENGINE in ("sql", "fts5"):
+        query, params = build_search_query(query_letter, start, query_gender, query_country, user_id,
+                                           use_fts=SEARCH_ENGINE == "fts5" and fts_ready(), after_id=after_id,
+                                           ordered=bool(limit) or streamed)
+        if streamed and not limit:
+            return ndjson_response(await stream_grouped_records(stream_pool, query, params), headers=headers)
+        results = await sql_search(db, query, params, limit=page_limit)
+    else:
+        catalogue = await get_catalogue(db)
+        seen = await seen_names(user_id, db) if user_id is not None else None
+        search_args = (query_letter, start, gender_filter(query_gender), query_country, seen, after_id)
+        if streamed and not limit:
+            return ndjson_response(catalogue.iter_search(*search_args), headers=headers)
+        results = catalogue.search(*search_args, limit=page_limit)
+
+    if limit and len(results) > limit:
+        next_url = request.url.include_query_params(cursor=encode_cursor(results[limit - 1]["id"]))
+        headers["Link"] = f'<{next_url}>; rel="next"'
+
+    if streamed:
+        return ndjson_response(results[:limit], headers=headers)
+    response = FastJSONResponse(content=results[:limit], status_code=200, headers=headers)
+    if user_id is None:
+        response_cache.put(etag, response)
+    return response
 
 if __name__ == "__main__":
     run("main:app", host="127.0.0.1", port=5000, reload=True)
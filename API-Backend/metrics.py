@@ -0,0 +1,54 @@
+"""
+Returns internal counters of the API,
+such as how busy the database connection pools are,
+how often the session, seen, liked and response caches are hit,
+how many swipes wait in the write-behind buffer,
+how many password hashes are waiting
+and which /search filter shapes are used.
+"""
+
+# Third-Party Libraries
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+# Local Application Imports
+from imports import limiter, read_pool, write_pool, stream_pool
+from session_cache import session_cache
+from password import hash_stats
+from search_plans import search_plans
+from seen_cache import seen_cache, liked_cache
+from response_cache import response_cache
+from swipe_buffer import swipe_buffer
+
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/metrics",
+    responses={
+        200:
+            {"description": "successful response",
+            "content": {
+                "application/json": {
+                    "example":
+                        {"read_pool": {"size": 4, "in_use": 1, "timeouts": 0}}
+}}}})
+@limiter.limit("20/minute")
+async def metrics(
+    # Request might seem unused, but it is used by the limiter
+    request: Request, # pylint: disable=unused-argument
+):
+
+    """GET request which returns the current usage counters of the API."""
+
+    return JSONResponse(
+        content={"read_pool": read_pool.stats(),
+                 "write_pool": write_pool.stats(),
+                 "stream_pool": stream_pool.stats(),
+                 "session_cache": session_cache.stats(),
+                 "seen_cache": seen_cache.stats(),
+                 "liked_cache": liked_cache.stats(),
+                 "response_cache": response_cache.stats(),
+                 "swipe_buffer": swipe_buffer.stats(),
+                 "password_hashing": hash_stats(),
+                 "search_plans": search_plans.stats()},
+        status_code=200)
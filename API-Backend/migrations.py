@@ -0,0 +1,310 @@
+"""
+Versioned schema changes for names.db.
+The version of the database is kept in PRAGMA user_version,
+every migration with a higher number than that is applied in order at startup.
+
+The names_fts table isn't a numbered migration, it needs SQLite's FTS5 with the trigram tokenizer
+and only SEARCH_ENGINE=fts5 uses it. ensure_fts() creates it when the API starts with that engine.
+
+Running this file applies the pending migrations by hand:
+    python migrations.py
+    python migrations.py --fts    (create and fill the names_fts table if it isn't there)
+    python migrations.py --rebuild-fts    (refill the names_fts table from names)
+    python migrations.py --rebuild-matches    (refill the group_matches table)
+    python migrations.py --check-plans    (fail if a query in the .env files scans a whole table)
+
+The plan check needs a database of production size, SQLite scans small tables
+even when there is an index. generate_db.py can make one.
+"""
+
+# Standard Library
+import argparse
+import re
+import sys
+from asyncio import run
+from os import path
+
+# Third-Party Libraries
+from aiosqlite import connect, Connection, OperationalError
+
+# Local Application Imports
+from queries import env_values
+
+
+# Full text index over names.name, with the trigram tokenizer so MATCH finds
+# letters anywhere in the name. It's an external content table, the triggers keep it in sync.
+NAMES_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS names_fts USING fts5(
+    name, content='names', content_rowid='id', tokenize='trigram');
+
+CREATE TRIGGER IF NOT EXISTS names_fts_insert AFTER INSERT ON names BEGIN
+    INSERT INTO names_fts(rowid, name) VALUES (new.id, new.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS names_fts_delete AFTER DELETE ON names BEGIN
+    INSERT INTO names_fts(names_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS names_fts_update AFTER UPDATE OF name ON names BEGIN
+    INSERT INTO names_fts(names_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO names_fts(rowid, name) VALUES (new.id, new.name);
+END;
+
+INSERT INTO names_fts(names_fts) VALUES ('rebuild');
+"""
+
+REBUILD_FTS = "INSERT INTO names_fts(names_fts) VALUES ('rebuild');"
+
+# Indexes for the lookups the primary keys don't cover, with every column the queries need,
+# so SQLite never has to read the table itself.
+# user_disliked already has (user_id, name_id) as its primary key,
+# groups.group_code and users.username have the index of their UNIQUE constraint.
+COVERING_INDEXES = """
+CREATE INDEX IF NOT EXISTS user_liked_user_name ON user_liked (user_id, name_id);
+CREATE INDEX IF NOT EXISTS population_name_country_pop ON population (name_id, country_id, pop);
+CREATE INDEX IF NOT EXISTS similar_name_group ON similar (name_id, group_id);
+CREATE INDEX IF NOT EXISTS link_users_group_user ON link_users (group_id, user_id);
+"""
+
+# Where every user is in each of their /deck swipe decks, one row per user and set of filters.
+# The seed fixes the (random) order of the deck, step is how far the user got.
+DECK_CURSORS = """
+CREATE TABLE IF NOT EXISTS deck_cursors (
+    user_id INTEGER NOT NULL,
+    filter_key TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    step INTEGER NOT NULL,
+    updated TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, filter_key)) WITHOUT ROWID;
+"""
+
+# The names every member of a group (of 2 or more users) has liked, for /group_liked.
+# A group's row for a name is there as long as all members like it,
+# the triggers keep the table up to date on every (un)like and when a member joins or leaves.
+GROUP_MATCHES_OF = """
+    SELECT {group_id}, ul.name_id FROM user_liked ul
+    WHERE ul.user_id = (SELECT MIN(user_id) FROM link_users WHERE group_id = {group_id})
+      AND EXISTS (SELECT 1 FROM link_users m WHERE m.group_id = {group_id} AND m.user_id <> ul.user_id)
+      AND NOT EXISTS (SELECT 1 FROM link_users m WHERE m.group_id = {group_id}
+                      AND NOT EXISTS (SELECT 1 FROM user_liked l2
+                                      WHERE l2.user_id = m.user_id AND l2.name_id = ul.name_id))"""
+
+GROUP_MATCHES = f"""
+CREATE TABLE IF NOT EXISTS group_matches (
+    group_id INTEGER NOT NULL,
+    name_id INTEGER NOT NULL,
+    PRIMARY KEY (group_id, name_id)) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS group_matches_like AFTER INSERT ON user_liked BEGIN
+    INSERT OR IGNORE INTO group_matches (group_id, name_id)
+    SELECT lu.group_id, new.name_id FROM link_users lu
+    WHERE lu.user_id = new.user_id
+      AND EXISTS (SELECT 1 FROM link_users m WHERE m.group_id = lu.group_id AND m.user_id <> new.user_id)
+      AND NOT EXISTS (SELECT 1 FROM link_users m WHERE m.group_id = lu.group_id
+                      AND NOT EXISTS (SELECT 1 FROM user_liked l2
+                                      WHERE l2.user_id = m.user_id AND l2.name_id = new.name_id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS group_matches_unlike AFTER DELETE ON user_liked BEGIN
+    DELETE FROM group_matches WHERE name_id = old.name_id
+        AND group_id IN (SELECT group_id FROM link_users WHERE user_id = old.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS group_matches_join AFTER INSERT ON link_users BEGIN
+    DELETE FROM group_matches WHERE group_id = new.group_id;
+    INSERT OR IGNORE INTO group_matches (group_id, name_id) {GROUP_MATCHES_OF.format(group_id="new.group_id")};
+END;
+
+CREATE TRIGGER IF NOT EXISTS group_matches_leave AFTER DELETE ON link_users BEGIN
+    DELETE FROM group_matches WHERE group_id = old.group_id;
+    INSERT OR IGNORE INTO group_matches (group_id, name_id) {GROUP_MATCHES_OF.format(group_id="old.group_id")};
+END;
+
+CREATE TRIGGER IF NOT EXISTS group_matches_group_delete AFTER DELETE ON groups BEGIN
+    DELETE FROM group_matches WHERE group_id = old.group_id;
+END;
+"""
+
+# The same for every group at once, starting from the likes of each group's first member.
+REBUILD_GROUP_MATCHES = """
+DELETE FROM group_matches;
+INSERT OR IGNORE INTO group_matches (group_id, name_id)
+    SELECT lu.group_id, ul.name_id FROM link_users lu
+    JOIN user_liked ul ON ul.user_id = lu.user_id
+    WHERE lu.user_id = (SELECT MIN(user_id) FROM link_users WHERE group_id = lu.group_id)
+      AND EXISTS (SELECT 1 FROM link_users m WHERE m.group_id = lu.group_id AND m.user_id <> lu.user_id)
+      AND NOT EXISTS (SELECT 1 FROM link_users m WHERE m.group_id = lu.group_id
+                      AND NOT EXISTS (SELECT 1 FROM user_liked l2
+                                      WHERE l2.user_id = m.user_id AND l2.name_id = ul.name_id));
+"""
+
+# (version, description, sql), in the order they have to be applied.
+MIGRATIONS = [
+    # names_fts used to be created here, it's optional now, see ensure_fts().
+    (1, "names_fts trigram index (moved to ensure_fts)", ""),
+    (2, "covering indexes", COVERING_INDEXES),
+    (3, "deck cursors", DECK_CURSORS),
+    (4, "group matches", GROUP_MATCHES + REBUILD_GROUP_MATCHES),
+]
+
+# Queries that have to read a whole table by design.
+ALLOWED_SCANS = {
+    # A search without letters lists every name.
+    "STARTING_QUERY": {"names", "population"},
+    # Groups without any link, an anti join.
+    "CHECK_GROUPS_WITHOUT_USERS": {"groups"},
+    # The weekly cleanup of the scheduler looks at every row once.
+    "TOKEN_QUERY": {"users"},
+    "FAILED_LOGIN_QUERY": {"failed_logins"},
+    "GROUP_LINKS_QUERY": {"link_users"},
+    "LIKES_QUERY": {"user_liked"},
+    "DISLIKES_QUERY": {"user_disliked"},
+    "DECKS_QUERY": {"deck_cursors"},
+    "UNUSED_LINKED_USER_QUERY": {"users"},
+    "UNUSED_USER_QUERY": {"users"},
+}
+
+STATEMENT = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+SQL_KEYWORDS = {"where", "join", "left", "inner", "cross", "on", "group", "order", "limit", "set",
+                "values", "using", "natural", "returning", "union", "as"}
+
+
+async def schema_version(db: Connection) -> int:
+    """The migration version the database is at."""
+    async with db.execute("PRAGMA user_version;") as cursor:
+        row = await cursor.fetchone()
+    return row[0] if row else 0
+
+
+async def migrate(db: Connection) -> int:
+    """Applies all pending migrations, each in its own transaction. Returns the new version."""
+    version = await schema_version(db)
+
+    for number, description, sql in MIGRATIONS:
+        if number <= version:
+            continue
+        print(f"applying migration {number}: {description}")
+        await db.executescript(f"BEGIN;\n{sql}\nPRAGMA user_version = {number};\nCOMMIT;")
+        version = number
+
+    return version
+
+
+async def has_table(db: Connection, name: str) -> bool:
+    async with db.execute("SELECT 1 FROM sqlite_master WHERE name = ?;", (name,)) as cursor:
+        return await cursor.fetchone() is not None
+
+
+async def ensure_fts(db: Connection) -> bool:
+    """Creates and fills names_fts if it isn't there yet.
+    Returns False when this SQLite has no FTS5 or no trigram tokenizer."""
+    if await has_table(db, "names_fts"):
+        return True
+    try:
+        await db.executescript(f"BEGIN;\n{NAMES_FTS}\nCOMMIT;")
+    except OperationalError as e:
+        if db.in_transaction:
+            await db.rollback()
+        print(f"❌ names_fts can't be created: {e}")
+        return False
+    return True
+
+
+async def rebuild_fts(db: Connection):
+    """Refills names_fts from the names table, for when the triggers were bypassed."""
+    await db.execute(REBUILD_FTS)
+    await db.commit()
+
+
+async def rebuild_group_matches(db: Connection):
+    """Refills group_matches from the likes and groups, for when the triggers were bypassed."""
+    await db.executescript(f"BEGIN;\n{REBUILD_GROUP_MATCHES}\nCOMMIT;")
+
+
+def named_queries() -> dict:
+    """Every complete statement in the .env files, by name. Fragments like LETTER_QUERY are left out."""
+    return {name: query for name, query in env_values().items() if query and STATEMENT.match(query)}
+
+
+def table_aliases(query: str) -> dict:
+    """Maps every name used in the query (an alias or the name itself) to the tables or CTEs it refers to.
+    An alias can be used twice in one query, for different tables."""
+    aliases = {}
+    for table, alias in TABLE_REFERENCE.findall(query):
+        aliases.setdefault(table, set()).add(table)
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases.setdefault(alias, set()).add(table)
+    return aliases
+
+
+async def full_scans(db: Connection, query: str, tables: set) -> set:
+    """The tables (not CTEs or subqueries) that EXPLAIN QUERY PLAN reads from start to end."""
+    query = query.replace("{placeholders}", "?")
+    # The parameters only have to be there, '?' inside string literals is not one.
+    params = (None,) * re.sub(r"'[^']*'", "", query).count("?")
+    aliases = table_aliases(query)
+
+    scanned = set()
+    async with db.execute("EXPLAIN QUERY PLAN " + query, params) as cursor:
+        async for row in cursor:
+            detail = row[3]
+            if not detail.startswith("SCAN "):
+                continue
+            name = detail.split()[1]
+            sources = aliases.get(name, {name})
+            # Only a scan when the name can't be a CTE or subquery.
+            if sources <= tables:
+                scanned.update(sources)
+    return scanned
+
+
+async def check_query_plans(db: Connection) -> list:
+    """Runs EXPLAIN QUERY PLAN on every named query, returns the ones that scan a table they shouldn't."""
+    async with db.execute("SELECT name FROM sqlite_master WHERE type = 'table'") as cursor:
+        tables = {row[0] for row in await cursor.fetchall()}
+
+    problems = []
+    for name, query in named_queries().items():
+        unexpected = await full_scans(db, query, tables) - ALLOWED_SCANS.get(name, set())
+        if unexpected:
+            problems.append(f"{name} scans {', '.join(sorted(unexpected))}")
+    return problems
+
+
+async def main(database: str, fts: bool, rebuild: bool, rebuild_matches: bool, check_plans: bool) -> int:
+    async with connect(database) as db:
+        version = await migrate(db)
+        print(f"✅ database at version {version}")
+        if fts or rebuild:
+            if not await ensure_fts(db):
+                return 1
+            print("✅ names_fts ready")
+        if rebuild:
+            await rebuild_fts(db)
+            print("✅ names_fts rebuilt")
+        if rebuild_matches:
+            await rebuild_group_matches(db)
+            print("✅ group_matches rebuilt")
+        if check_plans:
+            problems = await check_query_plans(db)
+            for problem in problems:
+                print(f"❌ {problem}")
+            if problems:
+                return 1
+            print("✅ no query scans a whole table")
+    return 0
+
+
+if __name__ == "__main__":
+    db_path = path.join(path.abspath(path.dirname(__file__)), 'static', 'names.db')
+
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations to names.db")
+    parser.add_argument("--db", default=db_path, help="database file, defaults to static/names.db")
+    parser.add_argument("--fts", action="store_true", help="create the names_fts index (for SEARCH_ENGINE=fts5)")
+    parser.add_argument("--rebuild-fts", action="store_true", help="rebuild the names_fts index")
+    parser.add_argument("--rebuild-matches", action="store_true", help="rebuild the group_matches table")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="check the query plans of the .env queries for full table scans")
+    args = parser.parse_args()
+    sys.exit(run(main(args.db, args.fts, args.rebuild_fts, args.rebuild_matches, args.check_plans)))
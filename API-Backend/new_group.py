@@ -11,7 +11,6 @@ The group code is unique and is used to identify the group.
 # Standard Library
 from json import loads, dumps
 from secrets import token_hex
-from os import getenv
 
 # Third-Party Libraries
 from fastapi import HTTPException, APIRouter, Depends, Cookie, Request
@@ -19,11 +18,11 @@ from fastapi.responses import JSONResponse
 from aiosqlite import Connection, Error
 
 # Local Application Imports
-from imports import get_db, limiter, load_project_dotenv
+from imports import get_write_db, limiter
+from queries import queries
 
 
 new_group_router = APIRouter()
-load_project_dotenv()
 
 
 async def check_group_code(db):
@@ -31,7 +30,7 @@ async def check_group_code(db):
 
     while True:
         group_code = str(token_hex(3))
-        query = getenv("CHECK_GROUPCODE_EXISTS")
+        query = queries.CHECK_GROUPCODE_EXISTS
         params: tuple[str] = (group_code,)
         async with db.execute(query, params) as cursor:
             # If no result is found, it means the code is unique
@@ -60,7 +59,7 @@ async def check_group_code(db):
 async def new_group(
     # Request might seem unused, but it is used by the limiter
     request: Request, # pylint: disable=unused-argument
-    db: Connection = Depends(get_db),
+    db: Connection = Depends(get_write_db),
     session_token: str = Cookie(None)
 ):
 
@@ -79,7 +78,7 @@ async def new_group(
 
     try:
         # Query to see how many groups the user might be in.
-        existing_group = getenv("COUNT_USER_GROUPS")
+        existing_group = queries.COUNT_USER_GROUPS
 
         params: tuple[int] = (user_id,) # type: ignore
         async with db.execute(existing_group, params) as cursor:
@@ -91,7 +90,7 @@ async def new_group(
             raise HTTPException(status_code=400, detail=f"error: user {user_name} already has 2 groups")
 
         # Query to save the group code.
-        insert_code = getenv("INSERT_GROUPCODE")
+        insert_code = queries.INSERT_GROUPCODE
 
         params: tuple[str] = (group_code,) # type: ignore
         async with db.execute(insert_code, params) as cursor:
@@ -102,7 +101,7 @@ async def new_group(
             await db.commit()
 
         # Query to save the link between users.
-        insert_link = getenv("INSERT_GROUP_LINK")
+        insert_link = queries.INSERT_GROUP_LINK
 
         params: tuple[int, int] = (user_id, group_id,)
         await db.execute(insert_link, params)
@@ -13,21 +13,20 @@ from typing import Annotated
 from secrets import token_hex
 from datetime import timedelta, datetime
 from json import dumps
-from os import getenv
 
 # Third-Party Libraries
 from pydantic import BaseModel, Field as field
-from fastapi import Depends, HTTPException, APIRouter, Request
+from fastapi import HTTPException, APIRouter, Request
 from fastapi.responses import JSONResponse
-from aiosqlite import Connection, Error
+from aiosqlite import Error
 
 # Local Application Imports
-from imports import get_db, timelater, set_recovery_token, limiter, load_project_dotenv
-from password import hash_pwd
+from imports import write_connection, timelater, set_recovery_token, limiter
+from queries import queries
+from password import hash_pwd_async
 
 
 new_user_router = APIRouter()
-load_project_dotenv()
 
 
 class Item(BaseModel):
@@ -58,7 +57,6 @@ class Item(BaseModel):
 async def create_new_user(
     item: Item,
     request: Request, # pylint: disable=unused-argument
-    db: Connection = Depends(get_db)
 ):
 
     """POST request to add a new user to the database and return a recovery token.\n
@@ -67,7 +65,8 @@ async def create_new_user(
     Password MUST be between 8 and 32 characters long.\n
     The user will be logged in automatically by creating a session token cookie.\n"""
 
-    hashed_password = hash_pwd(item.password)
+    # Hashed before the write connection is taken, the hash is the slow part.
+    hashed_password = await hash_pwd_async(item.password)
     session_token = token_hex(20)
     session_expiration = timelater()
     recovery_token = await set_recovery_token()
@@ -75,13 +74,14 @@ async def create_new_user(
     username = item.username.lower()
 
     # Query to save the user login information.
-    query = getenv("INSERT_NEW_USER")
+    query = queries.INSERT_NEW_USER
 
     try:
         now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        async with db.execute(query, (username, hashed_password, session_token, session_expiration, recovery_token, now)) as cursor:
-            await db.commit()
-            user_id = cursor.lastrowid
+        async with write_connection() as db:
+            async with db.execute(query, (username, hashed_password, session_token, session_expiration, recovery_token, now)) as cursor:
+                await db.commit()
+                user_id = cursor.lastrowid
     except Error as e:
         raise HTTPException(status_code=400, detail=f"error: {username} is already taken.") from e
 
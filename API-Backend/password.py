@@ -1,7 +1,59 @@
+"""
+Password hashing with argon2.
+Hashing and verifying take tens of milliseconds of CPU, so the async functions
+run them in a small thread pool (argon2 releases the GIL) instead of on the event loop.
+HASH_WORKERS limits how many run at the same time, the rest wait in the pool's queue.
+"""
+
+# Standard Library
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv
+
+# Third-Party Libraries
 from passlib.context import CryptContext
 
+
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+
+HASH_WORKERS = int(getenv("HASH_WORKERS", "2"))
+
+hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="argon2")
+
+_metrics = {
+    "queued": 0,        # submitted but not finished yet, running ones included
+    "peak_queued": 0,
+    "completed": 0,
+}
+
+
 def hash_pwd(password: str) -> str:
     """Hash the password"""
 
     return pwd_context.hash(password)
+
+
+async def _run_in_pool(function, *args):
+    """Runs function(*args) on the hashing pool and keeps the queue depth up to date."""
+    _metrics["queued"] += 1
+    _metrics["peak_queued"] = max(_metrics["peak_queued"], _metrics["queued"])
+    try:
+        return await get_running_loop().run_in_executor(hash_executor, function, *args)
+    finally:
+        _metrics["queued"] -= 1
+        _metrics["completed"] += 1
+
+
+async def hash_pwd_async(password: str) -> str:
+    """Hash the password without blocking the event loop."""
+    return await _run_in_pool(hash_pwd, password)
+
+
+async def verify_pwd_async(password: str, hashed_password: str) -> bool:
+    """Checks the password against its hash without blocking the event loop."""
+    return await _run_in_pool(pwd_context.verify, password, hashed_password)
+
+
+def hash_stats() -> dict:
+    """Queue depth of the hashing pool, for the /metrics endpoint."""
+    return {"workers": HASH_WORKERS, **_metrics}
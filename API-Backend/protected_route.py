@@ -9,7 +9,6 @@ The session token is validated and a new session token is generated and returned
 # Standard library imports
 from json import dumps, loads
 from datetime import timedelta
-from os import getenv
 
 # Third-party library imports
 from fastapi import HTTPException, Depends, Cookie, APIRouter, Request
@@ -17,11 +16,11 @@ from fastapi.responses import JSONResponse
 from aiosqlite import Connection
 
 # Local application imports
-from imports import get_db, save_session_token, limiter, validate_token, load_project_dotenv
+from imports import get_write_db, save_session_token, limiter, validate_token
+from queries import queries
 
 
 cookie_router = APIRouter()
-load_project_dotenv()
 
 
 @cookie_router.get("/cookie",
@@ -45,7 +44,7 @@ load_project_dotenv()
 async def protected_route(
     request: Request, # pylint: disable=unused-argument
     session_token: str = Cookie(None),
-    db: Connection = Depends(get_db)
+    db: Connection = Depends(get_write_db)
 ):
 
     """GET request to login with an authorization token in the cookie."""
@@ -66,7 +65,7 @@ async def protected_route(
     maxage = int(timedelta(hours=12).total_seconds())
 
     # Query to find a user's group code
-    groupcode_query = getenv("GROUPCODE_QUERY")
+    groupcode_query = queries.GROUPCODE_QUERY
 
     async with db.execute(groupcode_query, (user_id,)) as cursor:
         rows = await cursor.fetchall()
@@ -0,0 +1,134 @@
+"""
+Every SQL statement of the API, read from the .env files once when the API starts.
+A missing key stops the API right away instead of failing on the first request that needs it.
+Variables set in the real environment still win over the files, like they did with getenv().
+
+Queries with an IN ({placeholders}) list are PlaceholderQuery objects,
+queries.UNLIKE_QUERY(3) gives the statement for a list of 3 ids.
+"""
+
+# Standard Library
+from os import environ, path
+
+# Third-Party Libraries
+from dotenv import dotenv_values
+
+
+ENV_FILES = ["secrets.env", "main_secrets.env", "scheduler_secrets.env"]
+
+# Lists up to this length are formatted once at import, longer ones when they are needed.
+PREBUILT_PLACEHOLDERS = 64
+
+
+def env_values() -> dict:
+    """All keys of the .env files, overridden by the real environment."""
+    values = {}
+    for env_file in ENV_FILES:
+        values.update(dotenv_values(path.join(path.dirname(__file__), '..', env_file)))
+    values.update({key: environ[key] for key in values if key in environ})
+    return values
+
+
+class PlaceholderQuery:
+    """A statement with a {placeholders} list, pre-built for the common list lengths."""
+
+    def __init__(self, template: str):
+        self.template = template
+        self._built = {count: self._build(count) for count in range(1, PREBUILT_PLACEHOLDERS + 1)}
+
+    def _build(self, count: int) -> str:
+        return self.template.format(placeholders=",".join("?" * count))
+
+    def __call__(self, count: int) -> str:
+        """The statement with `count` placeholders."""
+        query = self._built.get(count)
+        return query if query is not None else self._build(count)
+
+
+class Queries:
+    """The named statements, one attribute per key of the .env files."""
+
+    # secrets.env
+    LOGIN_QUERY: str
+    GROUPCODE_QUERY: str
+    UPDATE_FAILED_LOGINS: str
+    FIRST_FAILED_LOGIN: str
+    CHECK_FAILED_LOGINS: str
+    SAVE_SESSION_TOKEN: str
+    FIND_SESSION_TOKEN: str
+    FIND_CODE: str
+    SET_CODE: str
+    COUNT_USER_GROUPS: str
+    CHECK_GROUP_EXISTS: str
+    ADD_TO_GROUP: str
+    MATCHED_NAMES_QUERY: str
+    GROUP_PARTNERS_QUERY: str
+    LIKED_NAMES_QUERY: str
+    CHECK_IF_IN_GROUP: str
+    COUNT_USERS_IN_GROUP: str
+    DELETE_LINK_GROUPS: str
+    DELETE_GROUP: str
+    DELETE_2LINKS_GROUPS: str
+    SELECT_GROUPS: str
+    CHECK_GROUPS_WITHOUT_USERS: str
+    DISLIKE_LIST: str
+    LIKE_LIST: str
+    GROUP_LIKED_NAMES: str
+    GROUP_MATCHES_QUERY: str
+    RESET_SESSIONTOKEN: str
+    CHECK_GROUPCODE_EXISTS: str
+    INSERT_GROUPCODE: str
+    INSERT_GROUP_LINK: str
+    INSERT_NEW_USER: str
+    FIND_SIMILAR_NAMES: str
+    LOGIN_FIND_SIMILAR_NAMES: str
+    SEEN_NAMES_QUERY: str
+    UNDISLIKE_QUERY: PlaceholderQuery
+    UNLIKE_QUERY: PlaceholderQuery
+    FIND_DISLIKED: PlaceholderQuery
+    INSERT_LIKED_NAMES: str
+    FIND_LIKED: PlaceholderQuery
+    INSERT_DISLIKED_NAMES: str
+    INSERT_LIKED_SET: str
+    INSERT_DISLIKED_SET: str
+    DELETE_LINK_USER: str
+    DELETE_USER_LIKED: str
+    DELETE_USER_DISLIKED: str
+    DELETE_USER: str
+    FIND_DECK: str
+    SAVE_DECK: str
+    DELETE_USER_DECKS: str
+
+    # main_secrets.env, the /search query is put together from these.
+    STARTING_QUERY: str
+    LETTER_QUERY: str
+    FTS_LETTER_QUERY: str
+    NEUTRAL_GENDER_QUERY: str
+    MIXED_GENDER_QUERY: str
+    GENDER_QUERY: str
+    SINGLE_COUNTRY_QUERY: str
+    MULTI_COUNTRIES_QUERY: PlaceholderQuery
+    FILTER_ALREADY_LIKED_QUERY: str
+    AFTER_ID_QUERY: str
+    ORDER_BY_ID_QUERY: str
+
+    # scheduler_secrets.env
+    TOKEN_QUERY: str
+    FAILED_LOGIN_QUERY: str
+    GROUP_LINKS_QUERY: str
+    LIKES_QUERY: str
+    DISLIKES_QUERY: str
+    DECKS_QUERY: str
+    UNUSED_LINKED_USER_QUERY: str
+    UNUSED_USER_QUERY: str
+
+    def __init__(self, values: dict):
+        missing = [name for name in self.__annotations__ if not values.get(name)]
+        if missing:
+            raise RuntimeError(f"missing SQL in the .env files: {', '.join(missing)}")
+
+        for name, kind in self.__annotations__.items():
+            setattr(self, name, kind(values[name]))
+
+
+queries = Queries(env_values())
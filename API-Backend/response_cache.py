@@ -0,0 +1,99 @@
+"""
+In-process cache of the encoded responses of anonymous /search and /similar calls.
+Many visitors search for the same few filters, with this cache a repeated search
+is sent from memory instead of running the search and encoding the JSON again.
+
+Entries are keyed by the ETag of the response (see http_cache.py), which already covers
+the catalogue version and the formatted parameters. The cache holds at most max_bytes
+of response bodies, the least recently used ones are dropped first, and every entry after ttl seconds.
+The names catalogue is loaded once and doesn't change while the API runs (see catalogue.py),
+changes to the names, countries, population or similar tables only show after a restart,
+which starts with an empty cache and a new catalogue version in the ETags.
+Streamed (NDJSON) responses aren't cached.
+"""
+
+# Standard Library
+from collections import OrderedDict
+from os import getenv
+from time import monotonic
+from typing import NamedTuple, Optional
+
+# Third-Party Libraries
+from fastapi import Response
+
+
+class CachedResponse(NamedTuple):
+    """The parts of a response needed to send it again."""
+    body: bytes
+    media_type: str
+    headers: dict
+    cached_at: float
+
+    def response(self) -> Response:
+        """A new response with the cached body and headers."""
+        return Response(content=self.body, media_type=self.media_type, headers=self.headers)
+
+
+class ResponseCache:
+    """ETag -> CachedResponse, bounded by the total size of the bodies."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 600.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # A single response can't take more than this share of the budget.
+        self.max_entry_bytes = max_bytes // 4
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._metrics = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "too_large": 0}
+
+    def get(self, key: str) -> Optional[Response]:
+        """The cached response for the key, or None."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if monotonic() - entry.cached_at < self.ttl:
+                self._entries.move_to_end(key)
+                self._metrics["hits"] += 1
+                return entry.response()
+            self._remove(key)
+            self._metrics["expired"] += 1
+
+        self._metrics["misses"] += 1
+        return None
+
+    def put(self, key: str, response: Response):
+        """Caches the body and headers of a (not streamed) response."""
+        if self.ttl <= 0:
+            return
+        body = bytes(response.body)
+        if len(body) > self.max_entry_bytes:
+            self._metrics["too_large"] += 1
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        headers = {name: value for name, value in response.headers.items()
+                   if name not in ("content-length", "content-type")}
+        self._entries[key] = CachedResponse(body, response.media_type, headers, monotonic())
+        self._bytes += len(body)
+
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._metrics["evictions"] += 1
+
+    def _remove(self, key: str):
+        self._bytes -= len(self._entries.pop(key).body)
+
+    def clear(self):
+        """Forgets all responses."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters and the memory in use, for the /metrics endpoint."""
+        return {"ttl": self.ttl, "size": len(self._entries), "bytes": self._bytes,
+                "max_bytes": self.max_bytes, **self._metrics}
+
+
+response_cache = ResponseCache(max_bytes=int(getenv("RESPONSE_CACHE_BYTES", str(32 * 1024 * 1024))),
+                               ttl=float(getenv("RESPONSE_CACHE_TTL", "600")))
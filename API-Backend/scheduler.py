@@ -4,32 +4,21 @@ Scheduler for periodic database cleanup tasks.
 
 # Standard Library
 from datetime import datetime
-from os import path, getenv
 
 # Third-Party Libraries
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from aiosqlite import connect
 from pytz import timezone
-from dotenv import load_dotenv
 
+# Local Application Imports
+from session_cache import session_cache
+from seen_cache import seen_cache, liked_cache
+from db_pool import apply_pragmas, pragma_profile
+from queries import queries
 
-scheduler = AsyncIOScheduler()
-load_dotenv(dotenv_path=path.join(path.dirname(__file__), '..', 'scheduler_secrets.env'))
-
-TOKEN_QUERY = getenv("TOKEN_QUERY")
-
-FAILED_LOGIN_QUERY = getenv("FAILED_LOGIN_QUERY")
-
-GROUP_LINKS_QUERY = getenv("GROUP_LINKS_QUERY")
-
-LIKES_QUERY = getenv("LIKES_QUERY")
-
-DISLIKES_QUERY = getenv("DISLIKES_QUERY")
 
-UNUSED_LINKED_USER_QUERY = getenv("UNUSED_LINKED_USER_QUERY")
-
-UNUSED_USER_QUERY = getenv("UNUSED_USER_QUERY")
+scheduler = AsyncIOScheduler()
 
 
 def start_scheduler(db_path: str):
@@ -38,32 +27,43 @@ def start_scheduler(db_path: str):
         print(f"[{datetime.now()}] running cleanup...")
 
         async with connect(db_path) as db:
-            async with db.execute(TOKEN_QUERY):
+            await apply_pragmas(db, pragma_profile())
+
+            async with db.execute(queries.TOKEN_QUERY):
                 await db.commit()
+                session_cache.clear()
                 print("✅ session tokens cleaned up.")
 
-            async with db.execute(FAILED_LOGIN_QUERY):
+            async with db.execute(queries.FAILED_LOGIN_QUERY):
                 await db.commit()
                 print("✅ failed login attempts cleaned up.")
 
-            async with db.execute(GROUP_LINKS_QUERY):
+            async with db.execute(queries.GROUP_LINKS_QUERY):
                 await db.commit()
                 print("✅ group links cleaned up.")
 
-            async with db.execute(LIKES_QUERY):
+            async with db.execute(queries.LIKES_QUERY):
                 await db.commit()
+                seen_cache.clear()
+                liked_cache.clear()
                 print("✅ user likes cleaned up.")
 
-            async with db.execute(DISLIKES_QUERY):
+            async with db.execute(queries.DISLIKES_QUERY):
                 await db.commit()
+                seen_cache.clear()
                 print("✅ user dislikes cleaned up.")
 
-            async with db.execute(UNUSED_LINKED_USER_QUERY):
+            async with db.execute(queries.DECKS_QUERY):
+                await db.commit()
+                print("✅ swipe decks cleaned up.")
+
+            async with db.execute(queries.UNUSED_LINKED_USER_QUERY):
                 await db.commit()
                 print("✅ unused linked users cleaned up.")
 
-            async with db.execute(UNUSED_USER_QUERY):
+            async with db.execute(queries.UNUSED_USER_QUERY):
                 await db.commit()
+                session_cache.clear()
                 print("✅ unused users cleaned up.")
 
         print("✅ cleanup complete.")
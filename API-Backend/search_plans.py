@@ -0,0 +1,130 @@
+"""
+Cache of the SQL statements of /search (with SEARCH_ENGINE sql or fts5), one per filter shape.
+
+A shape is which filters a search uses, not their values: letters (and how they are matched),
+the kind of gender filter, how many countries, logged in, after a cursor and ordered.
+Every shape always gets the exact same statement text, so SQLite's statement cache of a
+pool connection reuses the prepared statement instead of compiling the search again.
+
+The country list is padded with NULLs up to the next power of two (country IN ('USA', NULL)
+never matches the NULL), so 3 and 4 countries are the same statement.
+Passing the genders and countries as one JSON list (json_each) would give even fewer statements,
+but SQLite can't estimate how long that list is and picks slower plans for it.
+"""
+
+# Standard Library
+from typing import NamedTuple, Optional, Tuple
+
+# Local Application Imports
+from queries import queries
+
+
+class SearchShape(NamedTuple):
+    """Which filters a search uses."""
+    letter: Optional[str]   # None, "like", "fts" or "fts+like"
+    gender: Optional[str]   # None, "neutral", "mixed" or "pair"
+    countries: int          # 0 or the padded length of the country list
+    logged_in: bool
+    after_id: bool
+    ordered: bool
+
+    def label(self) -> str:
+        """Short name of the shape, for /metrics."""
+        parts = [part for part in (self.letter, self.gender) if part]
+        if self.countries:
+            parts.append(f"countries:{self.countries}")
+        parts += [field for field in ("logged_in", "after_id", "ordered") if getattr(self, field)]
+        return "+".join(parts)
+
+
+class SearchPlan(NamedTuple):
+    """The statement of a shape and the names of its parameters, in order."""
+    sql: str
+    slots: Tuple[str, ...]
+
+    def params(self, values: dict) -> tuple:
+        """The parameters of the statement, taken from values by slot name.
+        A tuple value fills as many parameters as it is long."""
+        params = ()
+        for slot in self.slots:
+            value = values[slot]
+            params += value if isinstance(value, tuple) else (value,)
+        return params
+
+
+def padded_length(count: int) -> int:
+    """The next power of two, the number of placeholders for a list of count countries."""
+    length = 1
+    while length < count:
+        length *= 2
+    return length
+
+
+def compile_plan(shape: SearchShape) -> SearchPlan:
+    """Puts the statement of a shape together from the main_secrets.env fragments."""
+
+    query = queries.STARTING_QUERY
+    slots = ()
+
+    if shape.letter in ("fts", "fts+like"):
+        query += queries.FTS_LETTER_QUERY
+        slots += ("match",)
+    if shape.letter in ("like", "fts+like"):
+        query += queries.LETTER_QUERY
+        slots += ("like",)
+
+    if shape.gender == "neutral":  # The mostly female/male values are in the statement itself.
+        query += queries.NEUTRAL_GENDER_QUERY
+    elif shape.gender == "mixed":
+        query += queries.MIXED_GENDER_QUERY
+        slots += ("gender",)
+    elif shape.gender == "pair":
+        query += queries.GENDER_QUERY
+        slots += ("gender",)
+
+    if shape.countries == 1:
+        query += queries.SINGLE_COUNTRY_QUERY
+        slots += ("countries",)
+    elif shape.countries:
+        query += queries.MULTI_COUNTRIES_QUERY(shape.countries)
+        slots += ("countries",)
+
+    if shape.logged_in:
+        query += queries.FILTER_ALREADY_LIKED_QUERY
+        slots += ("user_id", "user_id")
+    if shape.after_id:
+        query += queries.AFTER_ID_QUERY
+        slots += ("after_id",)
+    if shape.ordered:
+        query += queries.ORDER_BY_ID_QUERY
+
+    return SearchPlan(query, slots)
+
+
+class SearchPlanCache:
+    """SearchShape -> SearchPlan, compiled the first time a shape is searched."""
+
+    def __init__(self):
+        self._plans = {}
+        self._uses = {}   # SearchShape -> number of searches
+        self._metrics = {"hits": 0, "misses": 0}
+
+    def get(self, shape: SearchShape) -> SearchPlan:
+        """The plan of the shape, compiled if it's the first search with it."""
+        plan = self._plans.get(shape)
+        if plan is None:
+            plan = self._plans[shape] = compile_plan(shape)
+            self._metrics["misses"] += 1
+        else:
+            self._metrics["hits"] += 1
+        self._uses[shape] = self._uses.get(shape, 0) + 1
+        return plan
+
+    def stats(self) -> dict:
+        """Hit/miss counters and the searches per shape (most used first), for the /metrics endpoint."""
+        by_shape = sorted(self._uses.items(), key=lambda item: item[1], reverse=True)
+        return {"shapes": len(self._plans), **self._metrics,
+                "by_shape": {shape.label(): uses for shape, uses in by_shape}}
+
+
+search_plans = SearchPlanCache()
@@ -0,0 +1,204 @@
+"""
+In-process cache of the names every user has liked or disliked, as a bitmap.
+Logged in searches leave these names out, with this cache that's one bit test per name
+instead of reading both tables for every search.
+
+The bitmap has a bit per position of the names catalogue (names are in id order),
+so it's the catalogue size / 8 bytes per user, about 6 KB for 45.000 names.
+/preferences, /unlike and /undislike update the cached bitmap after their commit,
+removing users or their likes in bulk has to call invalidate() or clear().
+
+liked_cache holds bitmaps of only the liked names, for /compare_likes,
+the names a partner liked minus the ones the user has seen is one AND NOT over two bitmaps.
+"""
+
+# Standard Library
+from collections import OrderedDict
+from os import getenv
+from time import monotonic
+from typing import Iterable, Iterator, List, Optional
+
+
+# The positions of the set bits of every byte value, to list the positions in a bitmap.
+BYTE_POSITIONS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+class SeenBitmap:
+    """Set of catalogue positions, stored as one bit per name."""
+
+    __slots__ = ("catalogue", "bits", "count")
+
+    def __init__(self, catalogue, name_ids: Iterable[int] = ()):
+        self.catalogue = catalogue
+        # Whole 64 bit words, so the set operations and listing the positions can go a word at a time.
+        self.bits = bytearray((len(catalogue) + 63) // 64 * 8)
+        self.count = 0
+        self.add_ids(name_ids)
+
+    @classmethod
+    def from_int(cls, catalogue, value: int) -> "SeenBitmap":
+        """A bitmap with the bits of an int (bit i is position i)."""
+        bitmap = cls(catalogue)
+        bitmap.bits[:] = value.to_bytes(len(bitmap.bits), "little")
+        bitmap.count = bin(value).count("1")
+        return bitmap
+
+    def to_int(self) -> int:
+        """The bitmap as one (big) int, bit i is position i."""
+        return int.from_bytes(self.bits, "little")
+
+    def union(self, *others: "SeenBitmap") -> "SeenBitmap":
+        """The positions in this bitmap or any of the others."""
+        value = self.to_int()
+        for other in others:
+            value |= other.to_int()
+        return SeenBitmap.from_int(self.catalogue, value)
+
+    def difference(self, *others: "SeenBitmap") -> "SeenBitmap":
+        """The positions in this bitmap and in none of the others.
+        The ints work on the whole bitmap at once, in C, however many bits are set."""
+        value = self.to_int()
+        for other in others:
+            value &= ~other.to_int()
+        return SeenBitmap.from_int(self.catalogue, value)
+
+    def __iter__(self) -> Iterator[int]:
+        """The positions in the bitmap, in order. Words without set bits are skipped at once."""
+        bits = self.bits
+        for word_index, word in enumerate(memoryview(bits).cast("Q")):
+            if word:
+                for byte_index in range(word_index * 8, word_index * 8 + 8):
+                    for bit in BYTE_POSITIONS[bits[byte_index]]:
+                        yield byte_index * 8 + bit
+
+    def positions(self) -> List[int]:
+        """All positions in the bitmap, in order."""
+        return list(self)
+
+    def __contains__(self, position: int) -> bool:
+        return bool(self.bits[position >> 3] & (1 << (position & 7)))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def has_id(self, name_id: int) -> bool:
+        """If the name id is in the set, for callers with ids instead of positions."""
+        position = self.catalogue.position(name_id)
+        return position is not None and position in self
+
+    def add_ids(self, name_ids: Iterable[int]):
+        """Sets the bits of the name ids, unknown ids are ignored."""
+        for name_id in name_ids:
+            position = self.catalogue.position(name_id)
+            if position is not None and position not in self:
+                self.bits[position >> 3] |= 1 << (position & 7)
+                self.count += 1
+
+    def discard_ids(self, name_ids: Iterable[int]):
+        """Clears the bits of the name ids."""
+        for name_id in name_ids:
+            position = self.catalogue.position(name_id)
+            if position is not None and position in self:
+                self.bits[position >> 3] &= ~(1 << (position & 7))
+                self.count -= 1
+
+
+class SeenCache:
+    """user_id -> SeenBitmap, the least recently used users are dropped after max_users,
+    every entry after ttl seconds (in case another process changed the likes)."""
+
+    def __init__(self, ttl: float = 600.0, max_users: int = 5000):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._entries = OrderedDict()   # user_id -> (SeenBitmap, time it was cached)
+        # Changes per user and clear() calls, a bitmap read from the database before a change isn't cached.
+        self._versions = {}
+        self._generation = 0
+        self._metrics = {"hits": 0, "misses": 0, "updates": 0, "invalidations": 0, "evictions": 0}
+
+    def get(self, user_id) -> Optional[SeenBitmap]:
+        """The cached bitmap of the user, or None if it's not cached (anymore)."""
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            seen, cached_at = entry
+            if monotonic() - cached_at < self.ttl:
+                self._entries.move_to_end(user_id)
+                self._metrics["hits"] += 1
+                return seen
+            del self._entries[user_id]
+
+        self._metrics["misses"] += 1
+        return None
+
+    def version(self, user_id) -> tuple:
+        """Take this before reading the likes from the database, and give it to put()."""
+        return (self._generation, self._versions.get(user_id, 0))
+
+    def put(self, user_id, seen: SeenBitmap, version: tuple):
+        """Caches the bitmap, unless the user's likes changed since version was taken."""
+        if self.ttl <= 0 or self.max_users <= 0 or version != self.version(user_id):
+            return
+        self._entries[user_id] = (seen, monotonic())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+            self._metrics["evictions"] += 1
+
+    def _changed(self, user_id) -> Optional[SeenBitmap]:
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        self._metrics["updates"] += 1
+        return entry[0]
+
+    def add(self, user_id, name_ids: Iterable[int]):
+        """The user liked or disliked these names."""
+        seen = self._changed(user_id)
+        if seen is not None:
+            seen.add_ids(name_ids)
+
+    def discard(self, user_id, name_ids: Iterable[int]):
+        """The user unliked or undisliked these names."""
+        seen = self._changed(user_id)
+        if seen is not None:
+            seen.discard_ids(name_ids)
+
+    def invalidate(self, user_id):
+        """Forgets the bitmap of one user, after the user was removed."""
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        if self._entries.pop(user_id, None) is not None:
+            self._metrics["invalidations"] += 1
+
+    def clear(self):
+        """Forgets all bitmaps, after likes were removed in bulk."""
+        self._metrics["invalidations"] += len(self._entries)
+        self._entries.clear()
+        # Loads that started before the clear mustn't be cached either.
+        self._versions.clear()
+        self._generation += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters, for the /metrics endpoint."""
+        return {"ttl": self.ttl, "size": len(self._entries), "max_users": self.max_users,
+                "bytes": sum(len(seen.bits) for seen, _ in self._entries.values()),
+                **self._metrics}
+
+
+seen_cache = SeenCache(ttl=float(getenv("SEEN_CACHE_TTL", "600")),
+                       max_users=int(getenv("SEEN_CACHE_USERS", "5000")))
+liked_cache = SeenCache(ttl=float(getenv("SEEN_CACHE_TTL", "600")),
+                        max_users=int(getenv("SEEN_CACHE_USERS", "5000")))
+
+
+def record_swipes(user_id, liked: Optional[List[int]], disliked: Optional[List[int]]):
+    """Updates the seen and liked bitmaps of the user for a /preferences call."""
+    if liked:
+        seen = seen_cache.get(user_id)
+        if seen is None:
+            # Without it there's no telling which of the names were disliked before.
+            liked_cache.invalidate(user_id)
+        else:
+            # A name seen before was already liked, or disliked and then /preferences leaves it out.
+            liked_cache.add(user_id, [name_id for name_id in liked if not seen.has_id(name_id)])
+    seen_cache.add(user_id, (liked or []) + (disliked or []))
@@ -0,0 +1,56 @@
+"""
+JSON encoding of the responses.
+orjson is used when it's installed, it encodes the lists of names several times faster
+than the standard library. Without it (or with JSON_ENCODER=json) the standard library
+is used with the same settings as FastAPI's JSONResponse, both give the same bytes.
+
+FastJSONResponse is a JSONResponse that encodes with the chosen encoder,
+it's also the app's default response class.
+"""
+
+# Standard Library
+from json import dumps as json_dumps
+from os import getenv
+from typing import Any, Callable, Dict, Iterable
+
+# Third-Party Libraries
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+def stdlib_dumps(content: Any) -> bytes:
+    """The encoding of FastAPI's JSONResponse."""
+    return json_dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {"json": stdlib_dumps}
+if orjson is not None:
+    ENCODERS["orjson"] = orjson.dumps
+
+JSON_ENCODER = getenv("JSON_ENCODER", "orjson" if orjson is not None else "json")
+if JSON_ENCODER not in ENCODERS:
+    raise RuntimeError(f"JSON_ENCODER must be one of {', '.join(ENCODERS)}, not {JSON_ENCODER}")
+
+dumps: Callable[[Any], bytes] = ENCODERS[JSON_ENCODER]
+
+
+def dumps_line(record: Any) -> bytes:
+    """One record as a line of NDJSON."""
+    return dumps(record) + b"\n"
+
+
+def join_array(items: Iterable[bytes]) -> bytes:
+    """A JSON array of records that are already encoded."""
+    return b"[" + b",".join(items) + b"]"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with the chosen encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
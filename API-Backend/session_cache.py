@@ -0,0 +1,96 @@
+"""
+In-process cache of the users' session tokens.
+validate_token runs on every authenticated request, with this cache it only reads
+the users table once per user per SESSION_CACHE_TTL seconds instead of every time.
+
+Every place that changes or removes a session token has to call invalidate() or clear(),
+otherwise a logged out user stays logged in until the entry times out.
+"""
+
+# Standard Library
+from collections import OrderedDict
+from datetime import datetime
+from os import getenv
+from time import monotonic
+from typing import NamedTuple, Optional
+
+
+class CachedSession(NamedTuple):
+    """The FIND_SESSION_TOKEN row of a user, with the expiration already parsed."""
+    expiration: datetime
+    username: str
+    session_token: str
+
+
+class SessionCache:
+    """user_id -> CachedSession, the least recently used users are dropped after max_users,
+    every entry after ttl seconds. User ids are stored as ints, the cookie may hold a string."""
+
+    def __init__(self, ttl: float = 60.0, max_users: int = 10000):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._entries = OrderedDict()   # user_id -> (CachedSession, time it was cached)
+        # Changes per user and clear() calls, a session read from the database before
+        # a logout or a new token isn't cached, like in SeenCache.
+        self._versions = {}
+        self._generation = 0
+        self._metrics = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def get(self, user_id) -> Optional[CachedSession]:
+        """The cached session of the user, or None if it's not cached (anymore)."""
+        user_id = int(user_id)
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            session, cached_at = entry
+            if monotonic() - cached_at < self.ttl:
+                self._entries.move_to_end(user_id)
+                self._metrics["hits"] += 1
+                return session
+            del self._entries[user_id]
+
+        self._metrics["misses"] += 1
+        return None
+
+    def version(self, user_id) -> tuple:
+        """Take this before reading the session from the database, and give it to put()."""
+        return (self._generation, self._versions.get(int(user_id), 0))
+
+    def put(self, user_id, session: CachedSession, version: tuple):
+        """Caches the session of the user, unless it was invalidated since version was taken."""
+        if self.ttl <= 0 or self.max_users <= 0 or version != self.version(user_id):
+            return
+        user_id = int(user_id)
+        now = monotonic()
+        self._entries[user_id] = (session, now)
+        self._entries.move_to_end(user_id)
+
+        # Expired sessions of users that don't come back, oldest first.
+        while self._entries:
+            oldest_id, (_, cached_at) = next(iter(self._entries.items()))
+            if now - cached_at < self.ttl and len(self._entries) <= self.max_users:
+                break
+            del self._entries[oldest_id]
+            self._metrics["evictions"] += 1
+
+    def invalidate(self, user_id):
+        """Forgets the session of one user, after their token changed or was removed."""
+        user_id = int(user_id)
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        if self._entries.pop(user_id, None) is not None:
+            self._metrics["invalidations"] += 1
+
+    def clear(self):
+        """Forgets all sessions, after tokens or users were removed in bulk."""
+        self._metrics["invalidations"] += len(self._entries)
+        self._entries.clear()
+        # Loads that started before the clear mustn't be cached either.
+        self._versions.clear()
+        self._generation += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters, for the /metrics endpoint."""
+        return {"ttl": self.ttl, "size": len(self._entries), "max_users": self.max_users, **self._metrics}
+
+
+session_cache = SessionCache(ttl=float(getenv("SESSION_CACHE_TTL", "60")),
+                             max_users=int(getenv("SESSION_CACHE_USERS", "10000")))
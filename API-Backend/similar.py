@@ -1,21 +1,24 @@
 """
 Returns a list of similar names based on the given name_id.
+No SQL is needed, the similar groups and the JSON of their names are kept in the catalogue.
 """
 
 # Standard Library
 from json import loads
-from os import getenv
 
 # Third-Party Libraries
-from fastapi import HTTPException, APIRouter, Depends, Query, Request, Cookie
+from fastapi import HTTPException, APIRouter, Depends, Query, Request, Cookie, Response
 from aiosqlite import Connection, Error
 
 # Local Application Imports
-from imports import get_db, SuccessResponse, ErrorResponse, limiter, load_project_dotenv
+from imports import get_db, SuccessResponse, ErrorResponse, limiter, seen_names
+from serialiser import join_array
+from catalogue import get_catalogue
+from http_cache import make_etag, not_modified, public_headers, private_headers
+from response_cache import response_cache
 
 
 similar_router = APIRouter()
-load_project_dotenv()
 
 @similar_router.get("/similar",
     response_model=SuccessResponse,
@@ -43,46 +46,45 @@ async def similar(
 
 
     if name_id is not None:
+        # Only loading the catalogue (on the first call) reads the database,
+        # the seen names raise their own HTTPException.
         try:
-            # Query to find similar names of the given name id.
-            # Returns all similar names excluding the given name.
-            if not session_token:
-                query = getenv("FIND_SIMILAR_NAMES")
-
-                async with db.execute(query, (name_id, name_id,)) as cursor:
-                    rows = await cursor.fetchall()
-
-            # If the user is logged in, exclude names that the user has liked or disliked.
-            else:
-                query = getenv("LOGIN_FIND_SIMILAR_NAMES")
-
-                # Reads the cookie.
-                data = loads(session_token)
-                user_id = data["id"]
-
-                async with db.execute(query, (name_id, name_id, user_id, user_id,)) as cursor:
-                    rows = await cursor.fetchall()
-
-
-            # Formats the search result into a List of Dictionaries / JSON
-            grouped_data = {}
-
-            for row in rows:
-                name_id = row[0]
-                if name_id not in grouped_data:
-                    grouped_data[name_id] = {"name": row[1],
-                                             "gender": row[2],
-                                             "country": [],
-                                             "population": []}
-
-                grouped_data[name_id]["country"] = row[3].split(', ')
-                grouped_data[name_id]["population"] = [int(pop) for pop in row[4].split(', ')]
-
-
-            results = [{"id": id, **data} for id, data in grouped_data.items()]
-
-            return results
+            catalogue = await get_catalogue(db)
         except Error as e:
             raise HTTPException(status_code=400, detail="error: database error") from e
+
+        # The similar names come from the adjacency structure of the catalogue,
+        # every name's JSON was encoded when the catalogue was loaded.
+        # Returns all similar names excluding the given name.
+        if not session_token:
+            # Anonymous responses can be reused by browsers and CDNs, see http_cache.py.
+            etag = make_etag(catalogue.version, "/similar", name_id)
+            cached = not_modified(request, etag) or response_cache.get(etag)
+            if cached is not None:
+                return cached
+            headers = public_headers(etag)
+
+            positions = catalogue.similar_positions(name_id)
+
+        # If the user is logged in, exclude names that the user has liked or disliked.
+        # They are left out with the user's seen bitmap instead of NOT IN subqueries.
+        else:
+            # Reads the cookie.
+            data = loads(session_token)
+            user_id = data["id"]
+
+            seen = await seen_names(user_id, db)
+            headers = private_headers()
+
+            positions = [position for position in catalogue.similar_positions(name_id)
+                         if position not in seen]
+
+        content = join_array(catalogue.similar_payloads[position] for position in positions)
+
+        response = Response(content=content, status_code=200, media_type="application/json",
+                            headers=headers)
+        if not session_token:
+            response_cache.put(etag, response)
+        return response
     else:
         raise HTTPException(status_code=400, detail="error: not a valid name_id")
@@ -0,0 +1,92 @@
+"""
+Streaming responses for the endpoints that return long lists of names.
+A client asks for one with ?stream=1 or the header "Accept: application/x-ndjson",
+and gets one JSON object per line (NDJSON) as soon as each name is complete,
+instead of one JSON array that is built in memory first.
+Names read from the database are read from the cursor a chunk at a time while the client reads,
+on a connection from the small stream pool (see imports.py) that the stream holds until it ends.
+"""
+
+# Standard Library
+from typing import AsyncIterator, Iterable, Optional, Union
+
+# Third-Party Libraries
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from aiosqlite import Error
+
+# Local Application Imports
+from db_pool import ConnectionPool, PoolTimeout
+from serialiser import dumps_line
+
+
+NDJSON = "application/x-ndjson"
+
+# Rows fetched from the cursor at a time.
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_stream(request: Request, stream: Optional[int]) -> bool:
+    """Checks if the client asked for a streamed (NDJSON) response."""
+    return bool(stream) or NDJSON in request.headers.get("accept", "")
+
+
+async def _grouped_lines(pool: ConnectionPool, query: str, params: tuple) -> AsyncIterator[bytes]:
+    """Reads (id, name, gender, country, pop) rows and yields one NDJSON line per name.
+    The first (empty) item is yielded once the query runs, see stream_grouped_records."""
+    db = await pool.acquire()
+    try:
+        async with db.execute(query, params) as cursor:
+            yield b""
+            current = None
+            try:
+                while rows := await cursor.fetchmany(STREAM_CHUNK_SIZE):
+                    for row in rows:
+                        # A name is complete when the rows of the next one start.
+                        if current is not None and current["id"] != row[0]:
+                            yield dumps_line(current)
+                            current = None
+                        if current is None:
+                            current = {"id": row[0], "name": row[1], "gender": row[2],
+                                       "country": [], "population": []}
+
+                        current["country"].append(row[3])
+                        current["population"].append(row[4])
+            except Error as e:
+                # The status code is already sent, the stream just ends early.
+                print(f"❌ Stream stopped by a database error: {e}")
+                return
+            if current is not None:
+                yield dumps_line(current)
+    finally:
+        await pool.release(db)
+
+
+async def stream_grouped_records(pool: ConnectionPool, query: str, params: tuple) -> AsyncIterator[bytes]:
+    """Streams the rows of a query as one record per name.
+    The query has to be ordered by the name id, so all rows of a name come after each other.
+
+    The connection is taken and the query started before the response is returned,
+    so a busy pool (503) or a bad query (400) still gets a proper status code."""
+    lines = _grouped_lines(pool, query, params)
+    try:
+        await anext(lines)
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail="error: database busy") from e
+    except Error as e:
+        raise HTTPException(status_code=400, detail="error: database error") from e
+    return lines
+
+
+async def encode_records(records: Iterable[dict]) -> AsyncIterator[bytes]:
+    """Encodes records that are already in memory (or computed on the fly) as NDJSON lines."""
+    for record in records:
+        yield dumps_line(record)
+
+
+def ndjson_response(records: Union[AsyncIterator[bytes], Iterable[dict]],
+                    headers: Optional[dict] = None) -> StreamingResponse:
+    """Wraps already encoded lines, or records that still need encoding, in a streaming response."""
+    if not hasattr(records, "__aiter__"):
+        records = encode_records(records)
+    return StreamingResponse(records, media_type=NDJSON, headers=headers)
@@ -0,0 +1,213 @@
+"""
+Optional write-behind buffer for /preferences (SWIPE_BUFFER=1).
+Swipes come in as many small /preferences calls, and every commit waits for the disk.
+With the buffer on, a call only puts its liked and disliked names in memory and returns,
+a background task writes everything that came in to the database in one transaction,
+SWIPE_BUFFER_MS milliseconds after the first swipe or as soon as SWIPE_BUFFER_EVENTS names are waiting.
+
+The buffer gives the same result as writing every call on its own: a (user, name) that's
+already liked or disliked doesn't change, otherwise the first swipe on it wins
+(liked before disliked within one call). So a flush merges the calls into one liked and one
+disliked list per user, and writes all of them with two executemany's and a single commit.
+
+Reads of a user's own lists (and /unlike, /undislike, /delete_user) call sync() first,
+which writes the user's waiting swipes, so users always see their own swipes.
+The buffer is started and drained in the app's lifespan, a clean shutdown loses nothing,
+a crash loses at most the swipes of the last SWIPE_BUFFER_MS.
+"""
+
+# Standard Library
+from asyncio import Event, Lock, create_task, wait_for, TimeoutError as AsyncTimeoutError
+from collections import Counter
+from datetime import datetime
+from json import dumps
+from os import getenv
+from typing import List, Optional
+
+# Third-Party Libraries
+from fastapi import HTTPException
+from aiosqlite import Connection, Error
+
+# Local Application Imports
+from db_pool import PoolTimeout
+from queries import queries
+
+
+def merge_swipes(batches: list) -> dict:
+    """user_id -> (liked, disliked) for a list of (user_id, liked, disliked) calls.
+    The first swipe on a name wins, so the two lists of a user don't overlap."""
+    first = {}
+    for user_id, liked, disliked in batches:
+        for name_id in liked:
+            first.setdefault((user_id, name_id), True)
+        for name_id in disliked:
+            first.setdefault((user_id, name_id), False)
+
+    merged = {}
+    for (user_id, name_id), is_liked in first.items():
+        lists = merged.setdefault(user_id, ([], []))
+        lists[0 if is_liked else 1].append(name_id)
+    return merged
+
+
+class SwipeBuffer:
+    """Swipes waiting to be written, and the task that writes them."""
+
+    def __init__(self, enabled: bool = False, interval: float = 0.05, max_events: int = 500):
+        self.enabled = enabled
+        self.interval = interval
+        self.max_events = max_events
+        self._pool = None
+        self._task = None
+        self._stopping = False
+        self._batches = []
+        self._events = 0
+        # Calls per user that are waiting or being written, for sync().
+        self._users = Counter()
+        self._lock = Lock()
+        self._has_pending = Event()
+        self._full = Event()
+        self._metrics = {"events": 0, "calls": 0, "flushes": 0, "largest_flush": 0,
+                         "syncs": 0, "errors": 0, "dropped": 0}
+
+    @property
+    def active(self) -> bool:
+        """If /preferences should use the buffer, only while the flush task runs."""
+        return self._task is not None and not self._stopping
+
+    def start(self, pool):
+        """Starts the flush task, writing through the given connection pool (of its own)."""
+        if not self.enabled or self._task is not None:
+            return
+        self._pool = pool
+        self._stopping = False
+        self._task = create_task(self._run())
+
+    async def stop(self):
+        """Stops the flush task after writing everything that's waiting."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._has_pending.set()
+        self._full.set()
+        await self._task
+        self._task = None
+        # Calls that came in while the last flush ran.
+        await self.flush()
+
+    def add(self, user_id, liked: Optional[List[int]], disliked: Optional[List[int]]):
+        """Queues the names of one /preferences call."""
+        liked, disliked = liked or [], disliked or []
+        self._batches.append((user_id, liked, disliked))
+        self._users[user_id] += 1
+        self._events += len(liked) + len(disliked)
+        self._metrics["calls"] += 1
+        self._metrics["events"] += len(liked) + len(disliked)
+        self._has_pending.set()
+        if self._events >= self.max_events:
+            self._full.set()
+
+    def pending(self, user_id) -> bool:
+        """If the user has swipes that aren't in the database yet."""
+        return user_id in self._users
+
+    async def sync(self, user_id):
+        """Writes the waiting swipes, if the user has any, before the user's lists are read or changed."""
+        if user_id in self._users:
+            await self._sync()
+
+    async def sync_all(self):
+        """Writes the waiting swipes of every user, before reading the likes of other users too."""
+        if self._users:
+            await self._sync()
+
+    async def _sync(self):
+        self._metrics["syncs"] += 1
+        try:
+            await self.flush()
+        except (PoolTimeout, Error) as e:
+            raise HTTPException(status_code=503, detail="error: database busy") from e
+
+    async def _run(self):
+        while not self._stopping:
+            await self._has_pending.wait()
+            if not self._stopping:
+                # The first swipe waits at most interval seconds, less when the buffer fills up.
+                try:
+                    await wait_for(self._full.wait(), self.interval)
+                except AsyncTimeoutError:
+                    pass
+            try:
+                await self.flush()
+            except Exception as e:  # pylint: disable=broad-except
+                # The task must keep running, the swipes stay queued for the next flush.
+                self._metrics["errors"] += 1
+                print(f"[{datetime.now()}] ❌ swipe buffer flush failed: {e!r}")
+
+    async def flush(self):
+        """Writes all waiting swipes in one transaction."""
+        async with self._lock:
+            if not self._batches:
+                return
+            batches, self._batches = self._batches, []
+            events, self._events = self._events, 0
+            self._has_pending.clear()
+            self._full.clear()
+
+            try:
+                async with self._pool.connection() as db:
+                    await self._write(db, merge_swipes(batches))
+            except (PoolTimeout, Error):
+                # Back in front of the queue, in the same order.
+                self._batches = batches + self._batches
+                self._events += events
+                self._has_pending.set()
+                raise
+
+            for user_id, _, _ in batches:
+                self._users[user_id] -= 1
+                if not self._users[user_id]:
+                    del self._users[user_id]
+            self._metrics["flushes"] += 1
+            self._metrics["largest_flush"] = max(self._metrics["largest_flush"], events)
+
+    async def _write(self, db: Connection, merged: dict):
+        # The lists of a user don't overlap, so writing all liked names first
+        # gives the same result as writing the calls one by one.
+        liked = [(user_id, dumps(names[0]), user_id) for user_id, names in merged.items() if names[0]]
+        disliked = [(user_id, dumps(names[1]), user_id) for user_id, names in merged.items() if names[1]]
+        try:
+            if liked:
+                await db.executemany(queries.INSERT_LIKED_SET, liked)
+            if disliked:
+                await db.executemany(queries.INSERT_DISLIKED_SET, disliked)
+            await db.commit()
+            return
+        except Error as e:
+            await db.rollback()
+            self._metrics["errors"] += 1
+            print(f"[{datetime.now()}] ❌ swipe buffer flush failed, writing per user: {e!r}")
+
+        # One user's bad swipes (a user that was removed meanwhile) mustn't lose everyone else's.
+        for user_id, (user_liked, user_disliked) in merged.items():
+            try:
+                if user_liked:
+                    await db.execute(queries.INSERT_LIKED_SET, (user_id, dumps(user_liked), user_id))
+                if user_disliked:
+                    await db.execute(queries.INSERT_DISLIKED_SET, (user_id, dumps(user_disliked), user_id))
+                await db.commit()
+            except Error:
+                await db.rollback()
+                self._metrics["dropped"] += len(user_liked) + len(user_disliked)
+
+    def stats(self) -> dict:
+        """Queue length and flush counters, for the /metrics endpoint."""
+        return {"enabled": self.enabled, "active": self.active, "interval": self.interval,
+                "max_events": self.max_events, "pending_events": self._events,
+                "pending_calls": len(self._batches), **self._metrics,
+                "pool": self._pool.stats() if self._pool is not None else None}
+
+
+swipe_buffer = SwipeBuffer(enabled=getenv("SWIPE_BUFFER", "0") == "1",
+                           interval=float(getenv("SWIPE_BUFFER_MS", "50")) / 1000,
+                           max_events=int(getenv("SWIPE_BUFFER_EVENTS", "500")))
@@ -7,7 +7,6 @@ The user must provide a list of name ID(s) to remove from the disliked list.
 # Standard library imports
 from typing import List
 from json import loads
-from os import getenv
 
 # Third-party library imports
 from fastapi import HTTPException, APIRouter, Depends, Cookie, Query, Request
@@ -15,11 +14,13 @@ from fastapi.responses import JSONResponse
 from aiosqlite import Connection, Error
 
 # Local application imports
-from imports import get_db, limiter, validate_token, load_project_dotenv
+from imports import get_write_db, limiter, validate_token
+from queries import queries
+from seen_cache import seen_cache
+from swipe_buffer import swipe_buffer
 
 
 undislike_router = APIRouter()
-load_project_dotenv()
 
 
 @undislike_router.delete("/undislike",
@@ -43,7 +44,7 @@ async def undislike(
     # Request might seem unused, but it is used by the limiter
     request: Request, # pylint: disable=unused-argument
     name_ids: List[int] = Query(..., examples={"name_ids": {"value": [1001, 1002]}}), # type: ignore
-    db: Connection = Depends(get_db),
+    db: Connection = Depends(get_write_db),
     session_token: str = Cookie(None)
 ):
 
@@ -57,16 +58,18 @@ async def undislike(
     user_id = user_info["id"]
     token = user_info["session_token"]
     await validate_token(token, user_id, db)
+    # Swipes still in the write-behind buffer would otherwise be written after the delete.
+    await swipe_buffer.sync(user_id)
 
     try:
-        placeholders = ', '.join(['?'] * len(name_ids))
         params = [user_id] + name_ids
+        query = queries.UNDISLIKE_QUERY(len(name_ids))
 
-        UNDISLIKE_QUERY = str(getenv("UNDISLIKE_QUERY"))
-        query = f"{UNDISLIKE_QUERY.format(placeholders=placeholders)}"
-
-        await db.execute(query, params)
+        # Only the names that were disliked leave the cache, a requested id that was liked stays seen.
+        async with db.execute(query, params) as cursor:
+            removed = [row[0] for row in await cursor.fetchall()]
         await db.commit()
+        seen_cache.discard(user_id, removed)
 
         return JSONResponse(status_code=200, content={"success": f"deleted {len(name_ids)} items"})
 
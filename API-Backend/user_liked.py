@@ -15,7 +15,7 @@ from fastapi.responses import JSONResponse
 from aiosqlite import Connection, Error
 
 # Local application imports
-from imports import get_db, limiter, validate_token
+from imports import get_write_db, limiter, validate_token
 
 
 liked_router = APIRouter()
@@ -47,7 +47,7 @@ async def user_liked(
     item: Item,
     # Request might seem unused, but it is used by the limiter
     request: Request, # pylint: disable=unused-argument
-    db: Connection = Depends(get_db),
+    db: Connection = Depends(get_write_db),
     session_token: str = Cookie(None)
 ):
 
@@ -5,9 +5,8 @@ Takes a list of name_id(s) to be liked or disliked.
 """
 
 # Standard library imports
-from json import loads
+from json import loads, dumps
 from typing import List, Optional
-from os import getenv
 
 # Third-party library imports
 from fastapi import HTTPException, APIRouter, Depends, Cookie, Request
@@ -16,11 +15,13 @@ from aiosqlite import Connection, Error
 from pydantic import BaseModel, Field as field
 
 # Local application imports
-from imports import get_db, limiter, validate_token, load_project_dotenv
+from imports import get_db, write_connection, limiter, validate_token
+from queries import queries
+from seen_cache import record_swipes
+from swipe_buffer import swipe_buffer
 
 
 user_preferences_router = APIRouter()
-load_project_dotenv()
 
 
 class Item(BaseModel):
@@ -60,7 +61,8 @@ async def user_preferences(
 ):
 
     """POST request to store the names a user has liked or disliked.
-    Can handle batches of names."""
+    Can handle batches of names, all of them are stored in one transaction.
+    With SWIPE_BUFFER=1 they are queued and written together with other calls."""
 
     liked = item.liked
     disliked = item.disliked
@@ -75,57 +77,28 @@ async def user_preferences(
     user_info = loads(session_token)
     user_id = user_info["id"]
     token = user_info["session_token"]
+    # Checked on a read connection, with the buffer this request never needs the write connection.
     await validate_token(token, user_id, db)
 
-    disliked_names_to_insert = []
-    liked_names_to_insert = []
-
-    if liked:
-        # First, get the list of name_ids the user has already disliked
-        placeholders = ",".join("?" for _ in liked)
-        FIND_DISLIKED = str(getenv("FIND_DISLIKED"))
-        async with db.execute(
-            f"{FIND_DISLIKED.format(placeholders=placeholders)}",
-            (user_id, *liked)
-        ) as cursor:
-            disliked_ids = {row[0] for row in await cursor.fetchall()}
-
-        # Filter out liked name_ids from the ones the user is trying to dislike
-        names_disliked = [name_id for name_id in liked if name_id not in disliked_ids]
-
-        liked_names_to_insert = [(name_id, user_id) for name_id in names_disliked]
-
-        liked_query = getenv("INSERT_LIKED_NAMES")
-
-        try:
-            await db.executemany(liked_query, liked_names_to_insert)
-            await db.commit()
-        except Error as e:
-            raise HTTPException(status_code=400, detail="error: database error") from e
-
-
-    if disliked:
-        # First, get the list of name_ids the user has already liked
-        placeholders = ",".join("?" for _ in disliked)
-        FIND_LIKED = str(getenv("FIND_LIKED"))
-        async with db.execute(
-            f"{FIND_LIKED.format(placeholders=placeholders)}",
-            (user_id, *disliked)
-        ) as cursor:
-            liked_ids = {row[0] for row in await cursor.fetchall()}
-
-        # Filter out liked name_ids from the ones the user is trying to dislike
-        names_liked = [name_id for name_id in disliked if name_id not in liked_ids]
-
-        disliked_names_to_insert = [(name_id, user_id) for name_id in names_liked]
-
-        disliked_query = getenv("INSERT_DISLIKED_NAMES")
-
-        try:
-            await db.executemany(disliked_query, disliked_names_to_insert)
-            await db.commit()
-        except Error as e:
-            raise HTTPException(status_code=400, detail="error: database error") from e
-
+    if swipe_buffer.active:
+        # Written by the buffer's task within SWIPE_BUFFER_MS, with the same result.
+        swipe_buffer.add(user_id, liked, disliked)
+    else:
+        # Both lists in one transaction, one statement per list however many names it has.
+        # The names are passed as a JSON list, the statements leave out the names that are
+        # already in the other list. Liked goes first, so a name in both lists ends up liked.
+        async with write_connection() as write_db:
+            try:
+                if liked:
+                    await write_db.execute(queries.INSERT_LIKED_SET, (user_id, dumps(liked), user_id))
+                if disliked:
+                    await write_db.execute(queries.INSERT_DISLIKED_SET, (user_id, dumps(disliked), user_id))
+                await write_db.commit()
+            except Error as e:
+                await write_db.rollback()
+                raise HTTPException(status_code=400, detail="error: database error") from e
+
+    # The names that were skipped were already liked or disliked, so all of them are seen now.
+    record_swipes(user_id, liked, disliked)
 
     return JSONResponse(content={"success": "all (dis)liked names added"}, status_code=200)
@@ -0,0 +1,117 @@
+"""
+Benchmark of /compare_likes, the names a partner liked that the user hasn't seen yet.
+Compares MATCHED_NAMES_QUERY (which rebuilds both like lists and the anti join on every call)
+with the bitmaps of seen_cache.py (partner's liked names AND NOT the user's seen names)
+and the catalogue, on generate_db.py databases with more and more likes per user.
+Also checks that both give every user exactly the same names, countries and populations.
+With cached bitmaps the AND NOT takes the same time however many names were liked,
+listing and formatting the names grows with the size of the response.
+
+how_to_run = "python bench_compare_likes.py --likes 100 1000 5000 --users 200"
+"""
+
+import argparse
+import asyncio
+import logging
+import sqlite3
+import sys
+import tempfile
+import time
+from os import path
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from aiosqlite import connect  # noqa: E402 pylint: disable=wrong-import-position
+from catalogue import NameCatalogue  # noqa: E402 pylint: disable=wrong-import-position
+from compare_likes import format_match  # noqa: E402 pylint: disable=wrong-import-position
+from generate_db import generate_database  # noqa: E402 pylint: disable=wrong-import-position
+from migrations import migrate  # noqa: E402 pylint: disable=wrong-import-position
+from queries import queries  # noqa: E402 pylint: disable=wrong-import-position
+from seen_cache import SeenBitmap  # noqa: E402 pylint: disable=wrong-import-position
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+
+async def load_catalogue(db_file: str) -> NameCatalogue:
+    async with connect(db_file) as db:
+        await migrate(db)
+        return await NameCatalogue.load(db)
+
+
+def sql_matches(db: sqlite3.Connection, user_id: int, group_code: str) -> list:
+    """What /compare_likes did before, MATCHED_NAMES_QUERY and splitting the concatenated columns."""
+    rows = db.execute(queries.MATCHED_NAMES_QUERY, (user_id, group_code, user_id, user_id, user_id))
+    return [{"id": row[0], "name": row[1], "gender": row[2],
+             "countries": row[3].split(",") if row[3] else [],
+             "populations": [int(pop) for pop in row[4].split(",")] if row[4] else []}
+            for row in rows]
+
+
+def bitmap(db: sqlite3.Connection, catalogue: NameCatalogue, query: str, params: tuple) -> SeenBitmap:
+    return SeenBitmap(catalogue, (row[0] for row in db.execute(query, params)))
+
+
+def bitmap_matches(catalogue: NameCatalogue, partner_likes: list, seen: SeenBitmap) -> list:
+    """What /compare_likes does now with the bitmaps from the caches."""
+    unseen = partner_likes[0].union(*partner_likes[1:]).difference(seen)
+    return [format_match(catalogue, position) for position in unseen]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=45000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--likes", type=int, nargs="*", default=[100, 1000, 5000], help="average likes per user")
+    parser.add_argument("--name-skew", type=float, default=0.8)
+    args = parser.parse_args()
+
+    for likes in args.likes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_file = path.join(tmp, "names.db")
+            accounts = generate_database(db_file, names=args.names, users=args.users, likes=likes,
+                                         name_skew=args.name_skew)
+            catalogue = asyncio.run(load_catalogue(db_file))
+            db = sqlite3.connect(db_file)
+
+            sql_ms, cold_ms, cached_ms, set_ms, names = 0.0, 0.0, 0.0, 0.0, 0
+            grouped = [account for account in accounts if account.group_code]
+            for account in grouped:
+                start = time.perf_counter()
+                expected = sql_matches(db, account.user_id, account.group_code)
+                sql_ms += time.perf_counter() - start
+
+                # Cold: the bitmaps are read from the database first, like on a cache miss.
+                start = time.perf_counter()
+                partner_ids = [row[0] for row in db.execute(
+                    queries.GROUP_PARTNERS_QUERY, (account.user_id, account.user_id, account.group_code))]
+                partner_likes = [bitmap(db, catalogue, queries.LIKED_NAMES_QUERY, (partner_id,))
+                                 for partner_id in partner_ids]
+                seen = bitmap(db, catalogue, queries.SEEN_NAMES_QUERY, (account.user_id, account.user_id))
+                results = bitmap_matches(catalogue, partner_likes, seen) if partner_likes else []
+                cold_ms += time.perf_counter() - start
+
+                start = time.perf_counter()
+                results = bitmap_matches(catalogue, partner_likes, seen) if partner_likes else []
+                cached_ms += time.perf_counter() - start
+
+                # Only the set operation, without listing and formatting the names.
+                if partner_likes:
+                    start = time.perf_counter()
+                    partner_likes[0].union(*partner_likes[1:]).difference(seen)
+                    set_ms += time.perf_counter() - start
+
+                assert results == expected, f"user {account.user_id} gets different names"
+                names += len(results)
+            db.close()
+
+            calls = len(grouped)
+            logger.info("%5d likes per user | %6.1f names per call | sql %8.3f ms | "
+                        "bitmaps from the database %8.3f ms | cached bitmaps %8.3f ms | of which AND NOT %6.3f ms",
+                        likes, names / calls, sql_ms / calls * 1000, cold_ms / calls * 1000,
+                        cached_ms / calls * 1000, set_ms / calls * 1000)
+
+
+if __name__ == "__main__":
+    main()
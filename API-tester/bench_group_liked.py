@@ -0,0 +1,171 @@
+"""
+Benchmark of /group_liked, before and after the group_matches table.
+Compares GROUP_LIKED_NAMES (which finds the common likes of every group of the user on each call)
+with GROUP_MATCHES_QUERY (a read of group_matches, kept up to date by the triggers of migrations.py)
+on a database from generate_db.py, and times what the triggers add to a /preferences write.
+
+Before timing it likes, unlikes, joins, leaves and deletes groups at random through the queries
+of the endpoints, and checks that both queries still give every user the same names.
+
+how_to_run = "python bench_group_liked.py --users 2000 --likes 300 --changes 2000"
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from os import path
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from aiosqlite import connect  # noqa: E402 pylint: disable=wrong-import-position
+from generate_db import generate_database  # noqa: E402 pylint: disable=wrong-import-position
+from migrations import migrate  # noqa: E402 pylint: disable=wrong-import-position
+from queries import queries  # noqa: E402 pylint: disable=wrong-import-position
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+TRIGGERS = ["group_matches_like", "group_matches_unlike", "group_matches_join",
+            "group_matches_leave", "group_matches_group_delete"]
+
+
+def timed(function, runs: int) -> float:
+    """Average duration of function() in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(runs):
+        function()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+async def migrate_file(db_file: str):
+    async with connect(db_file) as db:
+        await migrate(db)
+
+
+def group_liked(db: sqlite3.Connection, query: str, user_id: int) -> list:
+    """The /group_liked rows of a user, sorted (names can have the same spelling)."""
+    return sorted(db.execute(query, (user_id,)).fetchall())
+
+
+def check_users(db: sqlite3.Connection, users: int):
+    """Both queries have to give every user the same names."""
+    for user_id in range(1, users + 1):
+        old = group_liked(db, queries.GROUP_LIKED_NAMES, user_id)
+        new = group_liked(db, queries.GROUP_MATCHES_QUERY, user_id)
+        assert old == new, f"user {user_id}: {len(old)} names with GROUP_LIKED_NAMES, {len(new)} with group_matches"
+
+
+def change_at_random(db: sqlite3.Connection, rng: random.Random, users: int, names: int):
+    """One like, unlike, join, leave or group delete, the way the endpoints do it."""
+    user_id = rng.randint(1, users)
+    groups = [row[0] for row in db.execute(
+        "SELECT g.group_code FROM link_users lu JOIN groups g ON g.group_id = lu.group_id WHERE lu.user_id = ?",
+        (user_id,))]
+    action = rng.choice(["like", "like", "like", "unlike", "join", "leave", "delete"])
+
+    if action == "like":
+        # Mostly names the partner liked, so new matches come up.
+        partner_likes = [row[0] for row in db.execute(
+            "SELECT ul.name_id FROM link_users me JOIN link_users lu ON lu.group_id = me.group_id "
+            "JOIN user_liked ul ON ul.user_id = lu.user_id WHERE me.user_id = ? AND lu.user_id <> ?",
+            (user_id, user_id))]
+        picked = rng.sample(partner_likes, min(len(partner_likes), rng.randint(1, 10)))
+        picked += [rng.randint(1, names) for _ in range(rng.randint(0, 3))]
+        if picked:
+            db.execute(queries.INSERT_LIKED_SET, (user_id, json.dumps(picked), user_id))
+    elif action == "unlike":
+        liked = [row[0] for row in db.execute("SELECT name_id FROM user_liked WHERE user_id = ?", (user_id,))]
+        picked = rng.sample(liked, min(len(liked), rng.randint(1, 5)))
+        if picked:
+            db.execute(queries.UNLIKE_QUERY(len(picked)), [user_id] + picked).fetchall()
+    elif action == "join" and len(groups) < 2:
+        # A group with one member left.
+        row = db.execute("SELECT g.group_code FROM groups g JOIN link_users lu ON lu.group_id = g.group_id "
+                         "GROUP BY g.group_id HAVING COUNT(*) = 1 AND MAX(lu.user_id) <> ? LIMIT 1",
+                         (user_id,)).fetchone()
+        if row:
+            db.execute(queries.ADD_TO_GROUP, (user_id, row[0]))
+    elif action == "leave" and groups:
+        db.execute(queries.DELETE_2LINKS_GROUPS, (groups[0], user_id))
+    elif action == "delete" and groups:
+        db.execute(queries.DELETE_LINK_GROUPS, (groups[-1],))
+        db.execute(queries.DELETE_GROUP, (groups[-1],))
+    db.commit()
+
+
+def preferences_ms(db_file: str, users: int, names: int, runs: int, size: int) -> float:
+    """Average time of a /preferences write of size liked names, with a commit."""
+    rng = random.Random(size)
+    batches = [(rng.randint(1, users), [rng.randint(1, names) for _ in range(size)]) for _ in range(runs)]
+    db = sqlite3.connect(db_file)
+    db.execute("PRAGMA journal_mode = WAL;")
+    start = time.perf_counter()
+    for user_id, liked in batches:
+        db.execute(queries.INSERT_LIKED_SET, (user_id, json.dumps(liked), user_id))
+        db.commit()
+    taken = time.perf_counter() - start
+    db.close()
+    return taken / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=45000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--likes", type=int, default=300, help="average likes per user")
+    parser.add_argument("--name-skew", type=float, default=1.0, help="higher makes common likes more likely")
+    parser.add_argument("--changes", type=int, default=2000, help="random changes before the check")
+    parser.add_argument("--runs", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = path.join(tmp, "names.db")
+        generate_database(db_file, names=args.names, users=args.users, likes=args.likes,
+                          name_skew=args.name_skew)
+        start = time.perf_counter()
+        asyncio.run(migrate_file(db_file))
+        logger.info("group_matches filled in %.1f ms", (time.perf_counter() - start) * 1000)
+
+        db = sqlite3.connect(db_file)
+        check_users(db, args.users)
+        rng = random.Random(1)
+        for _ in range(args.changes):
+            change_at_random(db, rng, args.users, args.names)
+        check_users(db, args.users)
+        matches = db.execute("SELECT COUNT(*) FROM group_matches").fetchone()[0]
+        logger.info("%d random changes, all %d users get the same names (%d matches)",
+                    args.changes, args.users, matches)
+
+        user_ids = [rng.randint(1, args.users) for _ in range(args.runs)]
+        for label, query in (("GROUP_LIKED_NAMES", queries.GROUP_LIKED_NAMES),
+                             ("GROUP_MATCHES_QUERY", queries.GROUP_MATCHES_QUERY)):
+            users = iter(user_ids)
+            logger.info("%-20s %8.3f ms per /group_liked", label,
+                        timed(lambda query=query, users=users: group_liked(db, query, next(users)), args.runs))
+        db.close()
+
+        # The same writes on a copy without the triggers.
+        plain_file = path.join(tmp, "no_triggers.db")
+        shutil.copy(db_file, plain_file)
+        plain = sqlite3.connect(plain_file)
+        for trigger in TRIGGERS:
+            plain.execute(f"DROP TRIGGER {trigger}")
+        plain.commit()
+        plain.close()
+        for size in (1, 50):
+            without = preferences_ms(plain_file, args.users, args.names, args.runs, size)
+            with_triggers = preferences_ms(db_file, args.users, args.names, args.runs, size)
+            logger.info("/preferences of %2d names | without triggers %7.3f ms | with triggers %7.3f ms",
+                        size, without, with_triggers)
+
+
+if __name__ == "__main__":
+    main()
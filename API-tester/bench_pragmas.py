@@ -0,0 +1,109 @@
+"""
+Benchmark of mixed read/write throughput with and without the PRAGMA profile of db_pool.py.
+Readers run the like list and seen names queries through a read pool while writers
+add likes (like /preferences does) through a write pool, for --seconds per profile.
+Each profile gets its own copy of a generated database, the journal mode is stored in the file.
+
+how_to_run = "python bench_pragmas.py --readers 8 --writers 2 --seconds 10"
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import shutil
+import sys
+import tempfile
+import time
+from os import path
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from aiosqlite import Error  # noqa: E402 pylint: disable=wrong-import-position
+from db_pool import ConnectionPool, pragma_profile  # noqa: E402 pylint: disable=wrong-import-position
+from generate_db import generate_database  # noqa: E402 pylint: disable=wrong-import-position
+from queries import queries  # noqa: E402 pylint: disable=wrong-import-position
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+# SQLite's own defaults, what every connection used before the profile.
+DEFAULT_PROFILE = {}
+
+
+async def reader(pool: ConnectionPool, users: int, deadline: float, counts: dict, seed: int):
+    rng = random.Random(seed)
+    statements = [queries.LIKE_LIST, queries.SEEN_NAMES_QUERY]
+    while time.perf_counter() < deadline:
+        user_id = rng.randint(1, users)
+        query = rng.choice(statements)
+        params = (user_id,) * query.count("?")
+        try:
+            async with pool.connection() as db:
+                async with db.execute(query, params) as cursor:
+                    await cursor.fetchall()
+            counts["reads"] += 1
+        except Error:
+            counts["read_errors"] += 1
+
+
+async def writer(pool: ConnectionPool, users: int, names: int, deadline: float, counts: dict, seed: int):
+    rng = random.Random(seed)
+    query = queries.INSERT_LIKED_NAMES
+    while time.perf_counter() < deadline:
+        user_id = rng.randint(1, users)
+        rows = [(rng.randint(1, names), user_id) for _ in range(5)]
+        try:
+            async with pool.connection() as db:
+                await db.executemany(query, rows)
+                await db.commit()
+            counts["writes"] += 1
+        except Error:
+            counts["write_errors"] += 1
+
+
+async def run_profile(db_file: str, profile: dict, args) -> dict:
+    """Runs the readers and writers against one database, returns the operations per second."""
+    read_pool = ConnectionPool(db_file, name="read", size=args.readers, pragmas=profile)
+    # More than one writer connection, so the writers also compete for the write lock.
+    write_pool = ConnectionPool(db_file, name="write", size=args.writers, pragmas=profile)
+    counts = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+
+    deadline = time.perf_counter() + args.seconds
+    await asyncio.gather(
+        *(reader(read_pool, args.users, deadline, counts, seed) for seed in range(args.readers)),
+        *(writer(write_pool, args.users, args.names, deadline, counts, 100 + seed)
+          for seed in range(args.writers)))
+
+    await read_pool.close()
+    await write_pool.close()
+    return {key: value / args.seconds if not key.endswith("errors") else value
+            for key, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=45000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--likes", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=8, help="concurrent readers")
+    parser.add_argument("--writers", type=int, default=2, help="concurrent writers")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = path.join(tmp, "template.db")
+        generate_database(template, names=args.names, users=args.users, likes=args.likes)
+
+        for label, profile in [("sqlite defaults", DEFAULT_PROFILE), ("pragma profile", pragma_profile())]:
+            db_file = path.join(tmp, label.replace(" ", "_") + ".db")
+            shutil.copy(template, db_file)
+            result = asyncio.run(run_profile(db_file, profile, args))
+            logger.info("%-16s | %8.1f reads/s | %7.1f writes/s | %d read errors | %d write errors | %s",
+                        label, result["reads"], result["writes"], result["read_errors"],
+                        result["write_errors"], profile or "-")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark of the /preferences write path, for batches of 1, 50 and 1000 names.
+Compares the old path (a FIND_DISLIKED/FIND_LIKED lookup, an executemany insert and a commit per list),
+the set-based one (one INSERT ... SELECT FROM json_each per list and a single commit)
+and the write-behind swipe buffer (SWIPE_BUFFER=1, many calls per commit).
+All run on their own copy of a generate_db.py database, with the PRAGMA profile of db_pool.py,
+and afterwards all copies must have the same likes and dislikes.
+
+how_to_run = "python bench_preferences.py --batches 1 50 1000 --seconds 5"
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from os import path
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from aiosqlite import connect, Connection  # noqa: E402 pylint: disable=wrong-import-position
+from db_pool import ConnectionPool, apply_pragmas, pragma_profile  # noqa: E402 pylint: disable=wrong-import-position
+from generate_db import generate_database  # noqa: E402 pylint: disable=wrong-import-position
+from queries import queries  # noqa: E402 pylint: disable=wrong-import-position
+from swipe_buffer import SwipeBuffer  # noqa: E402 pylint: disable=wrong-import-position
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+
+async def old_preferences(db: Connection, user_id: int, liked: list, disliked: list):
+    """What /preferences did before, two lookups, two inserts and two commits."""
+    if liked:
+        async with db.execute(queries.FIND_DISLIKED(len(liked)), (user_id, *liked)) as cursor:
+            disliked_ids = {row[0] for row in await cursor.fetchall()}
+        await db.executemany(queries.INSERT_LIKED_NAMES,
+                             [(name_id, user_id) for name_id in liked if name_id not in disliked_ids])
+        await db.commit()
+    if disliked:
+        async with db.execute(queries.FIND_LIKED(len(disliked)), (user_id, *disliked)) as cursor:
+            liked_ids = {row[0] for row in await cursor.fetchall()}
+        await db.executemany(queries.INSERT_DISLIKED_NAMES,
+                             [(name_id, user_id) for name_id in disliked if name_id not in liked_ids])
+        await db.commit()
+
+
+async def set_preferences(db: Connection, user_id: int, liked: list, disliked: list):
+    """What /preferences does now, one statement per list in a single transaction."""
+    if liked:
+        await db.execute(queries.INSERT_LIKED_SET, (user_id, json.dumps(liked), user_id))
+    if disliked:
+        await db.execute(queries.INSERT_DISLIKED_SET, (user_id, json.dumps(disliked), user_id))
+    await db.commit()
+
+
+def make_batches(args, size: int) -> list:
+    """The same random (user, liked, disliked) batches for both paths.
+    The halves overlap a bit, and names come back, like with a real swipe session."""
+    rng = random.Random(size)
+    batches = []
+    for _ in range(args.max_batches):
+        picked = [rng.randint(1, args.names) for _ in range(size * 2)]
+        batches.append((rng.randint(1, args.users), picked[:size], picked[size - size // 10:]))
+    return batches
+
+
+async def run_path(db_file: str, write, batches: list, seconds: float) -> tuple:
+    """Writes batches for `seconds` (or until they run out), returns (batches, seconds taken)."""
+    async with connect(db_file) as db:
+        await apply_pragmas(db, pragma_profile())
+        done = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        for user_id, liked, disliked in batches:
+            await write(db, user_id, liked, disliked)
+            done += 1
+            if time.perf_counter() > deadline:
+                break
+        return done, time.perf_counter() - start
+
+
+async def run_buffered(db_file: str, batches: list, seconds: float) -> tuple:
+    """Queues batches in a swipe buffer for `seconds`, the time includes writing the last ones."""
+    pool = ConnectionPool(db_file, name="bench", size=1, pragmas=pragma_profile())
+    buffer = SwipeBuffer(enabled=True)
+    buffer.start(pool)
+    done = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    for user_id, liked, disliked in batches:
+        buffer.add(user_id, liked, disliked)
+        done += 1
+        # Like a request handler returning, so the flush task can run.
+        await asyncio.sleep(0)
+        if time.perf_counter() > deadline:
+            break
+    await buffer.stop()
+    taken = time.perf_counter() - start
+    await pool.close()
+    return done, taken
+
+
+PATHS = {
+    "old": lambda db_file, batches, seconds: run_path(db_file, old_preferences, batches, seconds),
+    "set-based": lambda db_file, batches, seconds: run_path(db_file, set_preferences, batches, seconds),
+    "buffered": run_buffered,
+}
+
+
+def preferences_of(db_file: str) -> tuple:
+    db = sqlite3.connect(db_file)
+    liked = db.execute("SELECT user_id, name_id FROM user_liked ORDER BY 1, 2").fetchall()
+    disliked = db.execute("SELECT user_id, name_id FROM user_disliked ORDER BY 1, 2").fetchall()
+    db.close()
+    return liked, disliked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=45000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--likes", type=int, default=100, help="likes (and dislikes) per user to start with")
+    parser.add_argument("--batches", type=int, nargs="*", default=[1, 50, 1000], help="names per list")
+    parser.add_argument("--seconds", type=float, default=5, help="time per path and batch size")
+    parser.add_argument("--max-batches", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = path.join(tmp, "template.db")
+        generate_database(template, names=args.names, users=args.users, likes=args.likes)
+
+        for size in args.batches:
+            batches = make_batches(args, size)
+            results = {}
+            for label, run in PATHS.items():
+                db_file = path.join(tmp, f"{label}_{size}.db")
+                shutil.copy(template, db_file)
+                done, taken = asyncio.run(run(db_file, batches, args.seconds))
+                results[label] = (done, taken, db_file)
+
+            # Same batches on every copy, so the slowest path decides how many are compared.
+            done = min(result[0] for result in results.values())
+            for label, run in PATHS.items():
+                db_file = path.join(tmp, f"{label}_{size}_check.db")
+                shutil.copy(template, db_file)
+                asyncio.run(run(db_file, batches[:done], float("inf")))
+                results[label] = results[label][:2] + (db_file,)
+            expected = preferences_of(results["old"][2])
+            for label, (_, _, db_file) in results.items():
+                assert preferences_of(db_file) == expected, f"{label} stored different preferences"
+
+            for label, (count, taken, _) in results.items():
+                names = sum(len(liked) + len(disliked) for _, liked, disliked in batches[:count])
+                logger.info("batch %4d | %-9s | %8.1f batches/s | %10.0f names/s", size, label,
+                            count / taken, names / taken)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark of the /search letter lookups.
+Compares the SQL path (STARTING_QUERY + LETTER_QUERY) with the in-memory catalogue
+on a database from generate_db.py, so it runs without the real names.db.
+Both the starting letter (prefix index) and the anywhere in the name (trigram index) searches are timed,
+as well as the SEARCH_ENGINE=fts5 path (MATCH on the names_fts table from migrations.py).
+
+how_to_run = "python bench_search.py --names 500000 --runs 20"
+"""
+
+import argparse
+import asyncio
+import logging
+import sqlite3
+import sys
+import tempfile
+import time
+from os import path
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from aiosqlite import connect  # noqa: E402 pylint: disable=wrong-import-position
+from catalogue import NameCatalogue  # noqa: E402 pylint: disable=wrong-import-position
+from migrations import migrate, ensure_fts  # noqa: E402 pylint: disable=wrong-import-position
+from generate_db import generate_database  # noqa: E402 pylint: disable=wrong-import-position
+from queries import queries  # noqa: E402 pylint: disable=wrong-import-position
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+
+def timed(function, runs: int) -> float:
+    """Average duration of function() in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(runs):
+        function()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def sql_letters(db: sqlite3.Connection, query: str, params: tuple):
+    """Runs a /search SQL query, including the grouping of the rows per name."""
+    grouped = {}
+    for row in db.execute(query, params):
+        grouped.setdefault(row[0], []).append(row[3])
+    return len(grouped)
+
+
+def sql_prefix(db: sqlite3.Connection, prefix: str):
+    """The /search SQL path for a starting letter query."""
+    query = queries.STARTING_QUERY + queries.LETTER_QUERY
+    return sql_letters(db, query, (prefix.title() + '%',))
+
+
+def sql_substring(db: sqlite3.Connection, letters: str):
+    """The /search SQL path for a start=0 query."""
+    query = queries.STARTING_QUERY + queries.LETTER_QUERY
+    return sql_letters(db, query, ('%' + letters.title() + '%',))
+
+
+def fts_prefix(db: sqlite3.Connection, prefix: str):
+    """The /search fts5 path for a starting letter query (3+ letters)."""
+    query = queries.STARTING_QUERY + queries.FTS_LETTER_QUERY + queries.LETTER_QUERY
+    return sql_letters(db, query, ('"' + prefix + '"', prefix.title() + '%'))
+
+
+def fts_substring(db: sqlite3.Connection, letters: str):
+    """The /search fts5 path for a start=0 query (3+ letters)."""
+    query = queries.STARTING_QUERY + queries.FTS_LETTER_QUERY
+    return sql_letters(db, query, ('"' + letters + '"',))
+
+
+def linear_substring(catalogue: NameCatalogue, letters: str):
+    """Substring match by scanning every name."""
+    letters = letters.lower()
+    return [i for i, name in enumerate(catalogue.lower_names) if letters in name]
+
+
+def linear_prefix(catalogue: NameCatalogue, prefix: str):
+    """Prefix match by scanning every name, what the catalogue did before the prefix index."""
+    prefix = prefix.lower()
+    return [i for i, name in enumerate(catalogue.lower_names) if name.startswith(prefix)]
+
+
+async def load_catalogue(db_file: str) -> NameCatalogue:
+    async with connect(db_file) as db:
+        await migrate(db)
+        await ensure_fts(db)
+        return await NameCatalogue.load(db)
+
+
+def fts_or_sql(fts_function, sql_function, db: sqlite3.Connection, letters: str):
+    """The trigram tokenizer needs 3 letters, the fts5 path uses LIKE below that."""
+    if len(letters) >= 3:
+        return fts_function(db, letters)
+    return sql_function(db, letters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--names", type=int, default=45331, help="size of the synthetic catalogue")
+    parser.add_argument("--runs", type=int, default=20, help="runs per prefix")
+    parser.add_argument("--prefixes", nargs="*", default=["a", "ma", "mar", "kla", "zyx"])
+    parser.add_argument("--substrings", nargs="*", default=["an", "ann", "lia", "anne", "xqz"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = path.join(tmp, "names.db")
+        generate_database(db_file, names=args.names, users=0)
+
+        start = time.perf_counter()
+        catalogue = asyncio.run(load_catalogue(db_file))
+        logger.info("names_fts built and catalogue of %d names loaded in %.1f ms",
+                    len(catalogue), (time.perf_counter() - start) * 1000)
+
+        db = sqlite3.connect(db_file)
+        for prefix in args.prefixes:
+            matches = len(catalogue.prefix_range(prefix))
+            sql_ms = timed(lambda: sql_prefix(db, prefix), args.runs)
+            fts_ms = timed(lambda: fts_or_sql(fts_prefix, sql_prefix, db, prefix), args.runs)
+            linear_ms = timed(lambda: linear_prefix(catalogue, prefix), args.runs)
+            index_ms = timed(lambda: catalogue.prefix_range(prefix), args.runs)
+            search_ms = timed(lambda: catalogue.search(letter=prefix), args.runs)
+            logger.info("prefix %-5r %6d matches | sql %8.3f ms | fts5 %8.3f ms | linear scan %8.3f ms | "
+                        "prefix index %8.3f ms | catalogue search %8.3f ms",
+                        prefix, matches, sql_ms, fts_ms, linear_ms, index_ms, search_ms)
+
+        for letters in args.substrings:
+            matches = len(list(catalogue.substring_range(letters)))
+            sql_ms = timed(lambda: sql_substring(db, letters), args.runs)
+            fts_ms = timed(lambda: fts_or_sql(fts_substring, sql_substring, db, letters), args.runs)
+            linear_ms = timed(lambda: linear_substring(catalogue, letters), args.runs)
+            index_ms = timed(lambda: list(catalogue.substring_range(letters)), args.runs)
+            search_ms = timed(lambda: catalogue.search(letter=letters, start=0), args.runs)
+            logger.info("substring %-5r %6d matches | sql %8.3f ms | fts5 %8.3f ms | linear scan %8.3f ms | "
+                        "trigram index %8.3f ms | catalogue search %8.3f ms",
+                        letters, matches, sql_ms, fts_ms, linear_ms, index_ms, search_ms)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
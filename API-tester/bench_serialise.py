@@ -0,0 +1,79 @@
+"""
+Benchmark of the JSON encoding of the list endpoints, per 10.000 names.
+Encodes catalogue search results (from a generate_db.py database) the way the API used to,
+pydantic validation of SuccessResponse and the standard library JSONResponse,
+and the way it does now, FastJSONResponse with orjson (or the standard library without it).
+Also checks that every encoder gives exactly the same bytes.
+
+how_to_run = "python bench_serialise.py --names 10000 --runs 20"
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from os import path
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from aiosqlite import connect  # noqa: E402 pylint: disable=wrong-import-position
+from fastapi.responses import JSONResponse  # noqa: E402 pylint: disable=wrong-import-position
+from catalogue import NameCatalogue  # noqa: E402 pylint: disable=wrong-import-position
+from generate_db import generate_database  # noqa: E402 pylint: disable=wrong-import-position
+from imports import SuccessResponse  # noqa: E402 pylint: disable=wrong-import-position
+from serialiser import ENCODERS, JSON_ENCODER, FastJSONResponse, dumps_line  # noqa: E402 pylint: disable=wrong-import-position
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+
+def timed(function, runs: int) -> float:
+    """Average duration of function() in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(runs):
+        function()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+async def load_catalogue(db_file: str) -> NameCatalogue:
+    async with connect(db_file) as db:
+        return await NameCatalogue.load(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=10000, help="names in the encoded list")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = path.join(tmp, "names.db")
+        generate_database(db_file, names=args.names, users=0)
+        records = asyncio.run(load_catalogue(db_file)).search()
+
+    # Every encoder has to give the bytes JSONResponse gives.
+    expected = JSONResponse(content=records).body
+    for name, encoder in ENCODERS.items():
+        assert encoder(records) == expected, f"{name} encodes differently"
+
+    per_10k = 10000 / len(records)
+    results = {
+        "pydantic validation + JSONResponse": timed(
+            lambda: JSONResponse(content=SuccessResponse.model_validate(records).model_dump()), args.runs),
+        "JSONResponse (stdlib json)": timed(lambda: JSONResponse(content=records), args.runs),
+        f"FastJSONResponse ({JSON_ENCODER})": timed(lambda: FastJSONResponse(content=records), args.runs),
+        f"NDJSON lines ({JSON_ENCODER})": timed(lambda: [dumps_line(record) for record in records], args.runs),
+    }
+    for name, encoder in ENCODERS.items():
+        results[f"encoder {name}"] = timed(lambda encoder=encoder: encoder(records), args.runs)
+
+    logger.info("%d names, %d bytes of JSON", len(records), len(expected))
+    for label, ms in results.items():
+        logger.info("%-38s %8.2f ms per 10k names", label, ms * per_10k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark of /similar, before and after the similar groups in the catalogue.
+Compares FIND_SIMILAR_NAMES (the group lookup, the joins and splitting the concatenated columns)
+with the adjacency structure of catalogue.py (a group lookup and the JSON of the names
+encoded when the catalogue was loaded), for anonymous users and for logged in users
+whose seen names are left out. Also checks that both give exactly the same names.
+
+how_to_run = "python bench_similar.py --db ../API-Backend/static/names.db --runs 2000"
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import sys
+import time
+from os import path
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from aiosqlite import connect  # noqa: E402 pylint: disable=wrong-import-position
+from catalogue import NameCatalogue  # noqa: E402 pylint: disable=wrong-import-position
+from queries import queries  # noqa: E402 pylint: disable=wrong-import-position
+from seen_cache import SeenBitmap  # noqa: E402 pylint: disable=wrong-import-position
+from serialiser import dumps, join_array  # noqa: E402 pylint: disable=wrong-import-position
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+
+async def load_catalogue(db_file: str) -> NameCatalogue:
+    async with connect(db_file) as db:
+        return await NameCatalogue.load(db)
+
+
+def sql_similar(db: sqlite3.Connection, name_id: int, seen: SeenBitmap = None) -> bytes:
+    """What /similar did before, FIND_SIMILAR_NAMES and splitting the concatenated columns."""
+    rows = db.execute(queries.FIND_SIMILAR_NAMES, (name_id, name_id)).fetchall()
+    return dumps([{"id": row[0], "name": row[1], "gender": row[2],
+                   "country": row[3].split(', '),
+                   "population": [int(pop) for pop in row[4].split(', ')]}
+                  for row in rows if seen is None or not seen.has_id(row[0])])
+
+
+def catalogue_similar(catalogue: NameCatalogue, name_id: int, seen: SeenBitmap = None) -> bytes:
+    """What /similar does now."""
+    positions = catalogue.similar_positions(name_id)
+    if seen is not None:
+        positions = [position for position in positions if position not in seen]
+    return join_array(catalogue.similar_payloads[position] for position in positions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=path.join(BACKEND_DIR, "static", "names.db"))
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--seen", type=int, default=1000, help="seen names of the logged in user")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    catalogue = asyncio.run(load_catalogue(args.db))
+    logger.info("catalogue with %d similar groups loaded in %.1f ms",
+                len(catalogue.similar_offsets) - 1, (time.perf_counter() - start) * 1000)
+
+    db = sqlite3.connect(args.db)
+    name_ids = [row[0] for row in db.execute("SELECT DISTINCT name_id FROM similar")]
+    rng = random.Random(1)
+    seen = SeenBitmap(catalogue, rng.sample(list(catalogue.ids), min(args.seen, len(catalogue.ids))))
+
+    # Every name of a group, and a few that aren't in one.
+    for name_id in name_ids + [0, -1, max(catalogue.ids) + 1]:
+        for user_seen in (None, seen):
+            assert json.loads(sql_similar(db, name_id, user_seen)) == \
+                json.loads(catalogue_similar(catalogue, name_id, user_seen)), f"name {name_id} differs"
+    logger.info("%d names give the same similar names", len(name_ids))
+
+    picked = [rng.choice(name_ids) for _ in range(args.runs)]
+    for label, user_seen in (("anonymous", None), ("logged in", seen)):
+        start = time.perf_counter()
+        for name_id in picked:
+            sql_similar(db, name_id, user_seen)
+        sql_ms = (time.perf_counter() - start) / args.runs * 1000
+
+        start = time.perf_counter()
+        for name_id in picked:
+            catalogue_similar(catalogue, name_id, user_seen)
+        catalogue_ms = (time.perf_counter() - start) / args.runs * 1000
+        logger.info("%-9s | sql %7.3f ms | catalogue %7.3f ms per /similar", label, sql_ms, catalogue_ms)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
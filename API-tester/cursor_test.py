@@ -0,0 +1,41 @@
+import sys
+from base64 import urlsafe_b64encode
+from os import path
+
+import pytest
+from fastapi import HTTPException
+
+how_to_run = "pytest cursor_test.py"
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from imports import MAX_CURSOR_ID, decode_cursor, encode_cursor  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def raw_cursor(text: str) -> str:
+    return urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("name_id", [0, 1, 45331, MAX_CURSOR_ID])
+def test_cursor_round_trip(name_id):
+    assert decode_cursor(encode_cursor(name_id)) == name_id
+
+
+@pytest.mark.parametrize("cursor", [
+    # n followed by 24 nines, too big for an SQLite integer.
+    "bjk5OTk5OTk5OTk5OTk5OTk5OTk5OTk5",
+    raw_cursor(f"n{MAX_CURSOR_ID + 1}"),
+    raw_cursor("n-5"),
+    raw_cursor("n+5"),
+    raw_cursor("n 5"),
+    raw_cursor("n1_000"),
+    raw_cursor("n"),
+    raw_cursor("x5"),
+    raw_cursor("n٥"),  # an Arabic-Indic digit
+    "not base64!",
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
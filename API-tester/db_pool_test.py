@@ -0,0 +1,106 @@
+import asyncio
+import sqlite3
+import sys
+from os import path
+
+import pytest
+
+how_to_run = "pytest db_pool_test.py"
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from db_pool import ConnectionPool, PoolTimeout, pragma_profile  # noqa: E402 pylint: disable=wrong-import-position
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    db_file = str(tmp_path / "pool.db")
+    db = sqlite3.connect(db_file)
+    db.execute("CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)")
+    db.execute("INSERT INTO counter VALUES (1, 0)")
+    db.commit()
+    db.close()
+    return db_file
+
+
+@pytest.mark.asyncio
+async def test_waits_for_a_released_connection(db_file):
+    pool = ConnectionPool(db_file, name="test", size=1, timeout=5)
+    first = await pool.acquire()
+
+    waiting = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+    assert pool.stats()["waiting"] == 1
+
+    await pool.release(first)
+    # The connection goes straight to the request that was waiting.
+    assert await waiting is first
+    assert pool.stats()["waits"] == 1
+
+    await pool.release(first)
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_acquire_times_out(db_file):
+    pool = ConnectionPool(db_file, name="test", size=1, timeout=0.05)
+    db = await pool.acquire()
+
+    with pytest.raises(PoolTimeout):
+        await pool.acquire()
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["waiting"] == 0
+
+    # The timed out request doesn't keep a place in the queue.
+    await pool.release(db)
+    assert pool.stats()["idle"] == 1
+    await pool.release(await pool.acquire())
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_release_after_an_exception_rolls_back(db_file):
+    pool = ConnectionPool(db_file, name="test", size=1, timeout=0.5)
+
+    with pytest.raises(ValueError):
+        async with pool.connection() as db:
+            await db.execute("UPDATE counter SET value = 100")
+            raise ValueError("the request failed before its commit")
+
+    assert pool.stats()["in_use"] == 0
+    async with pool.connection() as db:
+        assert not db.in_transaction
+        async with db.execute("SELECT value FROM counter") as cursor:
+            assert (await cursor.fetchone())[0] == 0
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_write_connection_serialises_writers(db_file):
+    pool = ConnectionPool(db_file, name="write", size=1, timeout=5, pragmas=pragma_profile())
+    inside = 0
+    most_inside = 0
+
+    async def increment():
+        nonlocal inside, most_inside
+        async with pool.connection() as db:
+            inside += 1
+            most_inside = max(most_inside, inside)
+            async with db.execute("SELECT value FROM counter") as cursor:
+                value = (await cursor.fetchone())[0]
+            # Another writer would read the same value here if it got a connection too.
+            await asyncio.sleep(0.001)
+            await db.execute("UPDATE counter SET value = ?", (value + 1,))
+            await db.commit()
+            inside -= 1
+
+    await asyncio.gather(*[increment() for _ in range(20)])
+
+    assert most_inside == 1
+    assert pool.stats()["peak_in_use"] == 1
+    db = sqlite3.connect(db_file)
+    assert db.execute("SELECT value FROM counter").fetchone()[0] == 20
+    db.close()
+    await pool.close()
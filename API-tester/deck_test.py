@@ -0,0 +1,68 @@
+import random
+import sys
+from array import array
+from os import path
+
+import pytest
+
+how_to_run = "pytest deck_test.py"
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from catalogue import NameCatalogue  # noqa: E402 pylint: disable=wrong-import-position
+from deck import SeededPermutation, deal  # noqa: E402 pylint: disable=wrong-import-position
+from seen_cache import SeenBitmap  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def make_catalogue(size: int) -> NameCatalogue:
+    """A catalogue of `size` names, genders alternating and every third name in a second country."""
+    offsets, pop_countries = array('q', [0]), array('l')
+    for position in range(size):
+        pop_countries.extend([0, 1] if position % 3 == 0 else [0])
+        offsets.append(len(pop_countries))
+    return NameCatalogue(array('q', range(1, size + 1)), [f"name{i}" for i in range(size)],
+                         array('b', [i % 2 for i in range(size)]), ["F", "M"], ["nl", "be"],
+                         offsets, pop_countries, array('q', [1] * len(pop_countries)))
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 5, 17, 64, 100, 1000, 4097])
+def test_permutation_is_a_bijection(size):
+    for seed in (0, 1, 2 ** 61 + 7):
+        order = SeededPermutation(size, seed)
+        assert sorted(order[step] for step in range(size)) == list(range(size))
+
+
+def test_permutation_depends_on_the_seed():
+    assert [SeededPermutation(1000, 1)[step] for step in range(20)] != \
+        [SeededPermutation(1000, 2)[step] for step in range(20)]
+
+
+@pytest.mark.parametrize("page_size", [1, 7, 100])
+def test_deck_pages_never_repeat(page_size):
+    catalogue = make_catalogue(500)
+    rng = random.Random(page_size)
+    gender_codes, country_filter = {1}, {1}
+    positions = catalogue.filtered_list(None, None, gender_codes, country_filter)
+    expected = {catalogue.ids[position] for position in range(500) if position % 2 == 1 and position % 3 == 0}
+    assert {catalogue.ids[position] for position in positions} == expected
+
+    # Between the calls the user likes some of the names, and some that are further in the deck.
+    seen = SeenBitmap(catalogue)
+    order = SeededPermutation(len(positions), rng.getrandbits(62))
+    step, sent = 0, []
+    while True:
+        names, step = deal(catalogue, positions, order, step, page_size, country_filter, seen)
+        if not names:
+            break
+        assert len(names) <= page_size
+        # Only the population rows of the country filter are in a record.
+        assert all(name["country"] == ["be"] for name in names)
+        sent += [name["id"] for name in names]
+        seen.add_ids(rng.sample(sent, len(sent) // 2) + [rng.randint(1, 500)])
+
+    assert len(sent) == len(set(sent))
+    # Everything was either sent or already seen.
+    assert set(sent) <= expected
+    assert expected - set(sent) <= {catalogue.ids[position] for position in seen}
+    assert step == len(positions)
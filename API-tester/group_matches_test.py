@@ -0,0 +1,111 @@
+import sys
+from os import path
+
+import pytest
+import pytest_asyncio
+from aiosqlite import connect
+from httpx import ASGITransport, AsyncClient
+
+how_to_run = "pytest group_matches_test.py"
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import catalogue  # noqa: E402 pylint: disable=wrong-import-position
+import imports  # noqa: E402 pylint: disable=wrong-import-position
+from generate_db import generate_database  # noqa: E402 pylint: disable=wrong-import-position
+from main import app  # noqa: E402 pylint: disable=wrong-import-position
+from migrations import migrate  # noqa: E402 pylint: disable=wrong-import-position
+from response_cache import response_cache  # noqa: E402 pylint: disable=wrong-import-position
+from seen_cache import seen_cache, liked_cache  # noqa: E402 pylint: disable=wrong-import-position
+from session_cache import session_cache  # noqa: E402 pylint: disable=wrong-import-position
+
+POOLS = (imports.read_pool, imports.write_pool, imports.swipe_pool, imports.stream_pool)
+
+
+def clear_caches():
+    for cache in (seen_cache, liked_cache, session_cache, response_cache):
+        cache.clear()
+
+
+async def logged_in(username: str) -> AsyncClient:
+    api = AsyncClient(transport=ASGITransport(app=app), base_url="http://127.0.0.1:5000")
+    await api.post("/new_user", json={"username": username, "password": "password123"})
+    response = await api.post("/login", json={"username": username, "password": "password123"})
+    api.cookies.set("session_token", response.cookies.get("session_token"))
+    return api
+
+
+@pytest_asyncio.fixture
+async def partners(tmp_path, monkeypatch):
+    """Two logged in users in one group, on a small generated database with the migrations (and triggers)."""
+    db_file = str(tmp_path / "names.db")
+    generate_database(db_file, names=500, users=0)
+    async with connect(db_file) as db:
+        await migrate(db)
+
+    for pool in POOLS:
+        monkeypatch.setattr(pool, "database", db_file)
+    monkeypatch.setattr(catalogue, "_catalogue", None)
+    monkeypatch.setattr(app.state.limiter, "enabled", False)
+    clear_caches()
+
+    first, second = await logged_in("partner1"), await logged_in("partner2")
+    group_code = (await first.post("/new_group")).json()["group_code"]
+    response = await second.post("/add_to_group", json={"group_code": group_code})
+    assert response.status_code == 200
+    yield first, second, group_code
+
+    await first.aclose()
+    await second.aclose()
+    for pool in POOLS:
+        await pool.close()
+    clear_caches()
+
+
+async def group_liked(api: AsyncClient) -> list:
+    response = await api.get("/group_liked")
+    assert response.status_code == 200
+    body = response.json()
+    # No matches is a message instead of a list.
+    return [] if isinstance(body, dict) else [(row["group code"], row["name id"]) for row in body]
+
+
+@pytest.mark.asyncio
+async def test_matches_follow_likes_and_unlikes(partners):
+    first, second, group_code = partners
+
+    await first.post("/preferences", json={"liked": [3, 5, 8]})
+    # Only liked by one of them.
+    assert await group_liked(first) == []
+
+    await second.post("/preferences", json={"liked": [5, 8, 13], "disliked": [3]})
+    assert await group_liked(first) == [(group_code, 5), (group_code, 8)]
+    assert await group_liked(second) == [(group_code, 5), (group_code, 8)]
+
+    response = await second.delete("/unlike", params={"name_ids": [5]})
+    assert response.status_code == 200
+    assert await group_liked(first) == [(group_code, 8)]
+    assert await group_liked(second) == [(group_code, 8)]
+
+    # Liked again, the match comes back.
+    await second.post("/preferences", json={"liked": [5]})
+    assert await group_liked(first) == [(group_code, 5), (group_code, 8)]
+
+
+@pytest.mark.asyncio
+async def test_matches_before_the_partner_joined(partners):
+    first, _, group_code = partners
+    await first.post("/preferences", json={"liked": [21, 34]})
+
+    # A third user who liked the names before joining a group of their own with the first user.
+    third = await logged_in("partner3")
+    await third.post("/preferences", json={"liked": [34, 55]})
+    assert await group_liked(third) == []
+
+    code = (await third.post("/new_group")).json()["group_code"]
+    response = await first.post("/add_to_group", json={"group_code": code})
+    assert response.status_code == 200
+    assert await group_liked(third) == [(code, 34)]
+    assert (group_code, 34) not in await group_liked(first)
+    await third.aclose()
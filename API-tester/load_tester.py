@@ -0,0 +1,248 @@
+"""
+Load test of the API-Backend routers, driven through the ASGI app (no server or network needed).
+A database is generated (with generate_db.py) in a temporary directory, the API is pointed at it with NAMES_DB,
+and every scenario is run by --concurrency clients at the same time.
+For every scenario the p50/p95/p99 latency, the throughput and the errors are logged,
+and all results are written to a JSON file, so two commits can be compared with --baseline.
+
+how_to_run = "python load_tester.py --concurrency 20 --requests 500 --output results.json"
+compare = "python load_tester.py --output new.json --baseline results.json"
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from os import path
+
+from httpx import AsyncClient, ASGITransport
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from generate_db import generate_database, COUNTRIES  # noqa: E402 pylint: disable=wrong-import-position
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+# httpx logs every request at INFO.
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Login needs one of the allowed origins to set the cookie.
+URL = "http://127.0.0.1:5000"
+PASSWORD = "loadtestpassword"
+
+LETTERS = ["a", "b", "ka", "ma", "jo", "an", "el"]
+
+
+def cookie(account) -> dict:
+    """The session_token cookie the login endpoint would have set for the account."""
+    group_codes = {account.group_code: ""} if account.group_code else {}
+    return {"session_token": json.dumps({"id": account.user_id, "session_token": account.session_token,
+                                         "username": account.username, "group_codes": group_codes})}
+
+
+# Every scenario gets a client, a random account and the random generator,
+# and sends one request. Only 200 counts as a success.
+async def search(client, account, rng, names):
+    return await client.get("/search", params={"letter": rng.choice(LETTERS)})
+
+async def search_filtered(client, account, rng, names):
+    return await client.get("/search", params={"letter": rng.choice(LETTERS), "gender": "f",
+                                               "country": rng.sample(COUNTRIES, 2)})
+
+async def search_logged_in(client, account, rng, names):
+    return await client.get("/search", params={"letter": rng.choice(LETTERS)}, cookies=cookie(account))
+
+async def search_page(client, account, rng, names):
+    return await client.get("/search", params={"gender": "m", "limit": 50})
+
+async def similar(client, account, rng, names):
+    return await client.get("/similar", params={"name_id": rng.randint(1, names)})
+
+async def like_list(client, account, rng, names):
+    return await client.get("/like_list", cookies=cookie(account))
+
+async def preferences(client, account, rng, names):
+    picked = rng.sample(range(1, names + 1), 10)
+    return await client.post("/preferences", json={"liked": picked[:5], "disliked": picked[5:]},
+                             cookies=cookie(account))
+
+async def compare_likes(client, account, rng, names):
+    return await client.get("/compare_likes", params={"group_code": account.group_code}, cookies=cookie(account))
+
+async def group_liked(client, account, rng, names):
+    return await client.get("/group_liked", cookies=cookie(account))
+
+async def deck(client, account, rng, names):
+    return await client.get("/deck", params={"letter": rng.choice(LETTERS)}, cookies=cookie(account))
+
+async def login(client, account, rng, names):
+    return await client.post("/login", json={"username": account.username, "password": PASSWORD})
+
+
+SCENARIOS = {
+    "search": search,
+    "search_filtered": search_filtered,
+    "search_logged_in": search_logged_in,
+    "search_page": search_page,
+    "similar": similar,
+    "like_list": like_list,
+    "preferences": preferences,
+    "compare_likes": compare_likes,
+    "group_liked": group_liked,
+    "deck": deck,
+    "login": login,
+}
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, scenario, accounts, names: int, requests: int, concurrency: int, seed: int) -> dict:
+    """Sends `requests` requests from `concurrency` workers at once and summarises the latencies."""
+    latencies = []
+    errors = {}
+    remaining = iter(range(requests))
+
+    async def worker(number: int):
+        rng = random.Random(seed * 1000 + number)
+        for _ in remaining:
+            account = rng.choice(accounts)
+            start = time.perf_counter()
+            try:
+                response = await scenario(client, account, rng, names)
+                status = str(response.status_code)
+            except Exception as e: # pylint: disable=broad-exception-caught
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status != "200":
+                errors[status] = errors.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors.values()),
+        "error_codes": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "max_ms": round(latencies[-1], 3),
+    }
+
+
+def git_commit() -> str:
+    """The commit the benchmark ran on, to tell result files apart."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare_with_baseline(results: dict, baseline_file: str):
+    """Logs the change in p50/p95 latency and throughput against an earlier result file."""
+    with open(baseline_file, encoding="utf-8") as file:
+        baseline = json.load(file)
+
+    for name, result in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms", "throughput_rps"):
+            if before[key]:
+                changes.append(f"{key} {(result[key] - before[key]) / before[key] * 100:+.1f}%")
+        logger.info("%-17s vs %s: %s", name, baseline.get("commit", "baseline"), ", ".join(changes))
+
+
+async def run(args, accounts):
+    # The app is imported after NAMES_DB is set, so it opens the generated database.
+    from main import app  # pylint: disable=import-outside-toplevel
+
+    # The limits are per ip, and every simulated user comes from the same one.
+    app.state.limiter.enabled = False
+
+    results = {"commit": git_commit(), "date": datetime.now().isoformat(timespec="seconds"),
+               "config": {"names": args.names, "users": args.users, "likes": args.likes,
+                          "name_skew": args.name_skew, "user_skew": args.user_skew,
+                          "concurrency": args.concurrency, "requests": args.requests},
+               "scenarios": {}}
+
+    # Runs the startup (migrations and the catalogue) before anything is timed.
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url=URL,
+                               headers={"origin": URL}) as client:
+            for name in args.scenarios:
+                # A few untimed requests first, so lazy loading is not measured.
+                await run_scenario(client, SCENARIOS[name], accounts, args.names,
+                                   args.concurrency, args.concurrency, args.seed)
+                requests = args.login_requests if name == "login" else args.requests
+                result = await run_scenario(client, SCENARIOS[name], accounts, args.names,
+                                            requests, args.concurrency, args.seed)
+                results["scenarios"][name] = result
+                logger.info("%-17s %5d req | %3d errors | %8.1f req/s | p50 %8.2f ms | p95 %8.2f ms | "
+                            "p99 %8.2f ms", name, result["requests"], result["errors"],
+                            result["throughput_rps"], result["p50_ms"], result["p95_ms"], result["p99_ms"])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=20000, help="names in the generated database")
+    parser.add_argument("--users", type=int, default=200, help="users in the generated database")
+    parser.add_argument("--likes", type=int, default=50, help="likes (and dislikes) per user")
+    parser.add_argument("--name-skew", type=float, default=0.0, help="see generate_db.py")
+    parser.add_argument("--user-skew", type=float, default=0.0, help="see generate_db.py")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight at the same time")
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50,
+                        help="requests for the login scenario, argon2 makes those slow on purpose")
+    parser.add_argument("--scenarios", nargs="*", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="load_results.json", help="file the results are written to")
+    parser.add_argument("--baseline", help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = path.join(tmp, "names.db")
+        os.environ["NAMES_DB"] = db_file
+
+        start = time.perf_counter()
+        accounts = generate_database(db_file, names=args.names, users=args.users, likes=args.likes,
+                                     name_skew=args.name_skew, user_skew=args.user_skew,
+                                     password=PASSWORD, seed=args.seed)
+        # With an odd number of users one has no group, which the group scenarios need.
+        accounts = [account for account in accounts if account.group_code]
+        logger.info("database with %d names and %d users generated in %.1f s",
+                    args.names, args.users, time.perf_counter() - start)
+
+        results = asyncio.run(run(args, accounts))
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    logger.info("results written to %s", args.output)
+
+    if args.baseline:
+        compare_with_baseline(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
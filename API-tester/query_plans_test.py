@@ -0,0 +1,25 @@
+import subprocess
+import sys
+from os import path
+
+how_to_run = "pytest query_plans_test.py"
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+
+
+def run_backend_script(*args):
+    """Runs one of the API-Backend command line tools, from its own directory."""
+    return subprocess.run([sys.executable, *args], cwd=BACKEND_DIR,
+                          capture_output=True, text=True, check=False)
+
+
+def test_queries_use_indexes(tmp_path):
+    db_file = str(tmp_path / "names.db")
+
+    # Enough users and groups that SQLite prefers the indexes over scanning.
+    generated = run_backend_script("generate_db.py", "--out", db_file,
+                                   "--names", "2000", "--users", "20000", "--likes", "2")
+    assert generated.returncode == 0, generated.stderr
+
+    checked = run_backend_script("migrations.py", "--db", db_file, "--check-plans")
+    assert checked.returncode == 0, checked.stdout + checked.stderr
@@ -0,0 +1,136 @@
+import random
+import sys
+from array import array
+from os import path
+
+import pytest
+
+how_to_run = "pytest seen_cache_test.py"
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import seen_cache  # noqa: E402 pylint: disable=wrong-import-position
+from catalogue import NameCatalogue  # noqa: E402 pylint: disable=wrong-import-position
+from seen_cache import SeenBitmap, SeenCache, record_swipes  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def make_catalogue(size: int) -> NameCatalogue:
+    """A catalogue of `size` names with ids 10, 20, 30, ... and one population row each."""
+    return NameCatalogue(array('q', range(10, 10 * size + 1, 10)), [f"name{i}" for i in range(size)],
+                         array('b', [0] * size), ["F"], ["nl"], array('q', range(size + 1)),
+                         array('l', [0] * size), array('q', [1] * size))
+
+
+def ids_of(catalogue: NameCatalogue, positions) -> list:
+    return [catalogue.ids[position] for position in positions]
+
+
+@pytest.mark.parametrize("size", [1, 63, 64, 65, 200])
+def test_bitmap_set_operations_match_sets(size):
+    catalogue = make_catalogue(size)
+    rng = random.Random(size)
+    sets = [set(rng.sample(range(size), rng.randint(0, size))) for _ in range(3)]
+    bitmaps = [SeenBitmap(catalogue, ids_of(catalogue, positions)) for positions in sets]
+
+    union = bitmaps[0].union(*bitmaps[1:])
+    difference = bitmaps[0].difference(*bitmaps[1:])
+
+    assert union.positions() == sorted(sets[0] | sets[1] | sets[2])
+    assert len(union) == len(sets[0] | sets[1] | sets[2])
+    assert difference.positions() == sorted(sets[0] - sets[1] - sets[2])
+    assert len(difference) == len(sets[0] - sets[1] - sets[2])
+    # The operations return new bitmaps.
+    assert bitmaps[0].positions() == sorted(sets[0])
+    assert SeenBitmap.from_int(catalogue, union.to_int()).positions() == union.positions()
+
+
+def test_bitmap_add_discard_and_unknown_ids():
+    catalogue = make_catalogue(100)
+    bitmap = SeenBitmap(catalogue, [10, 20, 20, 999, 15])
+
+    assert bitmap.positions() == [0, 1]
+    assert len(bitmap) == 2
+    assert bitmap.has_id(20) and not bitmap.has_id(30) and not bitmap.has_id(999)
+
+    bitmap.add_ids([1000, 30])
+    bitmap.discard_ids([10, 10, 40])
+    assert bitmap.positions() == [1, 2, 99]
+    assert len(bitmap) == 3
+    assert 99 in bitmap and 0 not in bitmap
+
+
+def test_cache_put_is_refused_after_a_change():
+    catalogue = make_catalogue(10)
+    cache = SeenCache(ttl=60)
+
+    # A load that started before a swipe would cache the bitmap without it.
+    version = cache.version(1)
+    cache.add(1, [10])
+    cache.put(1, SeenBitmap(catalogue), version)
+    assert cache.get(1) is None
+
+    # The same for invalidate() and clear().
+    version = cache.version(1)
+    cache.invalidate(1)
+    cache.put(1, SeenBitmap(catalogue), version)
+    assert cache.get(1) is None
+
+    version = cache.version(1)
+    cache.clear()
+    cache.put(1, SeenBitmap(catalogue), version)
+    assert cache.get(1) is None
+
+    cache.put(1, SeenBitmap(catalogue, [10]), cache.version(1))
+    cache.add(1, [20])
+    assert cache.get(1).positions() == [0, 1]
+
+
+def test_cache_drops_least_recently_used():
+    catalogue = make_catalogue(10)
+    cache = SeenCache(ttl=60, max_users=2)
+    for user_id in (1, 2):
+        cache.put(user_id, SeenBitmap(catalogue), cache.version(user_id))
+    cache.get(1)
+    cache.put(3, SeenBitmap(catalogue), cache.version(3))
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    """Empty seen and liked caches for record_swipes."""
+    monkeypatch.setattr(seen_cache, "seen_cache", SeenCache(ttl=60))
+    monkeypatch.setattr(seen_cache, "liked_cache", SeenCache(ttl=60))
+    return seen_cache.seen_cache, seen_cache.liked_cache
+
+
+def test_record_swipes_updates_cached_bitmaps(caches):
+    seen, liked = caches
+    catalogue = make_catalogue(10)
+    # 20 was disliked before, 10 liked.
+    seen.put(1, SeenBitmap(catalogue, [10, 20]), seen.version(1))
+    liked.put(1, SeenBitmap(catalogue, [10]), liked.version(1))
+
+    record_swipes(1, [20, 30], [40])
+
+    # /preferences leaves out names that are already disliked, so 20 isn't liked now.
+    assert ids_of(catalogue, liked.get(1)) == [10, 30]
+    assert ids_of(catalogue, seen.get(1)) == [10, 20, 30, 40]
+
+
+def test_record_swipes_during_a_load(caches):
+    seen, liked = caches
+    catalogue = make_catalogue(10)
+    liked.put(1, SeenBitmap(catalogue, [10]), liked.version(1))
+
+    # Bitmaps read from the database before the swipe mustn't be cached after it.
+    seen_version, liked_version = seen.version(1), liked.version(1)
+    record_swipes(1, [30], None)
+    seen.put(1, SeenBitmap(catalogue, [10]), seen_version)
+    liked.put(1, SeenBitmap(catalogue, [10]), liked_version)
+
+    assert seen.get(1) is None
+    # Without the seen bitmap the liked one can't be updated, so it's dropped.
+    assert liked.get(1) is None
@@ -0,0 +1,72 @@
+import json
+import sqlite3
+import sys
+from os import path
+
+import pytest
+from fastapi import HTTPException
+
+how_to_run = "pytest streaming_test.py"
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from db_pool import ConnectionPool  # noqa: E402 pylint: disable=wrong-import-position
+from streaming import stream_grouped_records  # noqa: E402 pylint: disable=wrong-import-position
+
+QUERY = "SELECT id, name, gender, country, pop FROM rows ORDER BY id, country"
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    db_file = str(tmp_path / "stream.db")
+    db = sqlite3.connect(db_file)
+    db.execute("CREATE TABLE rows (id INTEGER, name TEXT, gender TEXT, country TEXT, pop INTEGER)")
+    # 1200 names with 2 countries each, more than two fetchmany chunks.
+    db.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?)",
+                   [(i, f"Name{i}", "f", country, i) for i in range(1, 1201) for country in ("BE", "NL")])
+    db.commit()
+    db.close()
+    return db_file
+
+
+@pytest.mark.asyncio
+async def test_streams_one_line_per_name(db_file):
+    pool = ConnectionPool(db_file, name="test", size=1, timeout=1)
+    lines = await stream_grouped_records(pool, QUERY, ())
+    records = [json.loads(line) async for line in lines]
+
+    assert len(records) == 1200
+    assert records[0] == {"id": 1, "name": "Name1", "gender": "f",
+                          "country": ["BE", "NL"], "population": [1, 1]}
+    assert [record["id"] for record in records] == list(range(1, 1201))
+    assert pool.stats()["in_use"] == 0
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_holds_the_connection_until_the_stream_ends(db_file):
+    pool = ConnectionPool(db_file, name="test", size=1, timeout=0.1)
+    lines = await stream_grouped_records(pool, QUERY, ())
+    assert json.loads(await anext(lines))["id"] == 1
+    assert pool.stats()["in_use"] == 1
+
+    # A second stream can't get a connection while the first is read.
+    with pytest.raises(HTTPException) as error:
+        await stream_grouped_records(pool, QUERY, ())
+    assert error.value.status_code == 503
+
+    # A client that goes away closes the stream, which releases the connection.
+    await lines.aclose()
+    assert pool.stats()["in_use"] == 0
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_bad_query_is_a_400_and_releases(db_file):
+    pool = ConnectionPool(db_file, name="test", size=1, timeout=0.1)
+    with pytest.raises(HTTPException) as error:
+        await stream_grouped_records(pool, "SELECT * FROM missing", ())
+    assert error.value.status_code == 400
+    assert pool.stats()["in_use"] == 0
+    await pool.close()
@@ -0,0 +1,143 @@
+import sqlite3
+import sys
+from array import array
+from os import path
+
+import pytest
+
+how_to_run = "pytest swipe_buffer_test.py"
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import imports  # noqa: E402 pylint: disable=wrong-import-position
+from catalogue import NameCatalogue  # noqa: E402 pylint: disable=wrong-import-position
+from db_pool import ConnectionPool  # noqa: E402 pylint: disable=wrong-import-position
+from seen_cache import SeenCache  # noqa: E402 pylint: disable=wrong-import-position
+from swipe_buffer import SwipeBuffer, merge_swipes  # noqa: E402 pylint: disable=wrong-import-position
+
+# A user whose writes fail, like a user that was removed while their swipes waited.
+FAILING_USER = 666
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    db_file = str(tmp_path / "names.db")
+    db = sqlite3.connect(db_file)
+    db.executescript(f"""
+        CREATE TABLE user_liked (name_id INT NOT NULL, user_id INTEGER NOT NULL, PRIMARY KEY (name_id, user_id));
+        CREATE TABLE user_disliked (name_id INT NOT NULL, user_id INTEGER NOT NULL, PRIMARY KEY (name_id, user_id));
+        CREATE TRIGGER fail_user BEFORE INSERT ON user_liked WHEN NEW.user_id = {FAILING_USER}
+        BEGIN SELECT RAISE(ABORT, 'user removed'); END;
+    """)
+    db.close()
+    return db_file
+
+
+def stored(db_file: str, table: str, user_id: int) -> list:
+    db = sqlite3.connect(db_file)
+    rows = [row[0] for row in db.execute(f"SELECT name_id FROM {table} WHERE user_id = ? ORDER BY 1", (user_id,))]
+    db.close()
+    return rows
+
+
+def test_merge_first_swipe_wins():
+    merged = merge_swipes([(1, [1, 2], [3, 1]),
+                           (2, [1], []),
+                           (1, [3, 4], [2, 5, 5])])
+    # 1 was liked before it was disliked in the same call, 3 was disliked before it was liked.
+    assert merged == {1: ([1, 2, 4], [3, 5]), 2: ([1], [])}
+
+
+@pytest.mark.asyncio
+async def test_sync_writes_the_users_swipes(db_file):
+    pool = ConnectionPool(db_file, name="test", size=1)
+    # The flush task waits a minute, only sync() writes.
+    buffer = SwipeBuffer(enabled=True, interval=60, max_events=1000)
+    buffer.start(pool)
+
+    buffer.add(1, [10, 20], [30])
+    buffer.add(1, [30], [40])
+    assert buffer.pending(1) and not buffer.pending(2)
+    assert stored(db_file, "user_liked", 1) == []
+
+    # Nothing waits for user 2, so nothing is written.
+    await buffer.sync(2)
+    assert stored(db_file, "user_liked", 1) == []
+
+    await buffer.sync(1)
+    assert not buffer.pending(1)
+    assert stored(db_file, "user_liked", 1) == [10, 20]
+    assert stored(db_file, "user_disliked", 1) == [30, 40]
+
+    await buffer.stop()
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_sync_all_writes_the_other_users_swipes(db_file):
+    pool = ConnectionPool(db_file, name="test", size=1)
+    buffer = SwipeBuffer(enabled=True, interval=60, max_events=1000)
+    buffer.start(pool)
+
+    # /group_liked of user 1 also needs the likes of partner 2.
+    buffer.add(2, [10, 20], [])
+    await buffer.sync(1)
+    assert stored(db_file, "user_liked", 2) == []
+
+    await buffer.sync_all()
+    assert not buffer.pending(2)
+    assert stored(db_file, "user_liked", 2) == [10, 20]
+
+    await buffer.stop()
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_reads_sync_first(db_file, monkeypatch):
+    pool = ConnectionPool(db_file, name="test", size=2)
+    buffer = SwipeBuffer(enabled=True, interval=60, max_events=1000)
+    buffer.start(pool)
+    catalogue = NameCatalogue(array('q', [10, 20, 30]), ["a", "b", "c"], array('b', [0, 0, 0]), ["F"], ["nl"],
+                              array('q', [0, 1, 2, 3]), array('l', [0, 0, 0]), array('q', [1, 1, 1]))
+
+    async def get_catalogue(_db):
+        return catalogue
+
+    monkeypatch.setattr(imports, "swipe_buffer", buffer)
+    monkeypatch.setattr(imports, "get_catalogue", get_catalogue)
+
+    buffer.add(1, [20], None)
+    async with pool.connection() as db:
+        liked = await imports.cached_bitmap(SeenCache(), "SELECT name_id FROM user_liked WHERE user_id = ?",
+                                            (1,), 1, db)
+    assert not buffer.pending(1)
+    assert [catalogue.ids[position] for position in liked] == [20]
+
+    await buffer.stop()
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_failing_user_doesnt_lose_the_other_swipes(db_file):
+    pool = ConnectionPool(db_file, name="test", size=1)
+    buffer = SwipeBuffer(enabled=True, interval=60, max_events=1000)
+    buffer.start(pool)
+
+    buffer.add(1, [10], [11])
+    buffer.add(FAILING_USER, [10, 20], None)
+    buffer.add(2, [10, 30], [31])
+    await buffer.flush()
+
+    # The batch failed on one user, so every user was written on their own.
+    assert stored(db_file, "user_liked", 1) == [10]
+    assert stored(db_file, "user_disliked", 1) == [11]
+    assert stored(db_file, "user_liked", 2) == [10, 30]
+    assert stored(db_file, "user_disliked", 2) == [31]
+    assert stored(db_file, "user_liked", FAILING_USER) == []
+    stats = buffer.stats()
+    assert stats["dropped"] == 2 and stats["errors"] == 1
+    assert not buffer.pending(FAILING_USER)
+
+    await buffer.stop()
+    await pool.close()
@@ -0,0 +1,101 @@
+import json
+import sqlite3
+import sys
+from os import path
+
+import pytest
+import pytest_asyncio
+from aiosqlite import connect
+from httpx import ASGITransport, AsyncClient
+
+how_to_run = "pytest unswipe_test.py"
+
+BACKEND_DIR = path.join(path.dirname(path.abspath(__file__)), '..', 'API-Backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import catalogue  # noqa: E402 pylint: disable=wrong-import-position
+import imports  # noqa: E402 pylint: disable=wrong-import-position
+from generate_db import generate_database  # noqa: E402 pylint: disable=wrong-import-position
+from main import app  # noqa: E402 pylint: disable=wrong-import-position
+from migrations import migrate  # noqa: E402 pylint: disable=wrong-import-position
+from response_cache import response_cache  # noqa: E402 pylint: disable=wrong-import-position
+from seen_cache import seen_cache, liked_cache  # noqa: E402 pylint: disable=wrong-import-position
+from session_cache import session_cache  # noqa: E402 pylint: disable=wrong-import-position
+
+POOLS = (imports.read_pool, imports.write_pool, imports.swipe_pool, imports.stream_pool)
+
+
+def clear_caches():
+    for cache in (seen_cache, liked_cache, session_cache, response_cache):
+        cache.clear()
+
+
+@pytest_asyncio.fixture
+async def client(tmp_path, monkeypatch):
+    """The API on a small generated database, with one logged in user."""
+    db_file = str(tmp_path / "names.db")
+    generate_database(db_file, names=500, users=0)
+    async with connect(db_file) as db:
+        await migrate(db)
+
+    for pool in POOLS:
+        monkeypatch.setattr(pool, "database", db_file)
+    monkeypatch.setattr(catalogue, "_catalogue", None)
+    monkeypatch.setattr(app.state.limiter, "enabled", False)
+    clear_caches()
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://127.0.0.1:5000") as api:
+        await api.post("/new_user", json={"username": "unswiper", "password": "password123"})
+        response = await api.post("/login", json={"username": "unswiper", "password": "password123"})
+        api.cookies.set("session_token", response.cookies.get("session_token"))
+        api.db_file = db_file
+        yield api
+
+    for pool in POOLS:
+        await pool.close()
+    clear_caches()
+
+
+def name_of(db_file: str, name_id: int) -> str:
+    db = sqlite3.connect(db_file)
+    name = db.execute("SELECT name FROM names WHERE id = ?", (name_id,)).fetchone()[0]
+    db.close()
+    return name
+
+
+async def search_ids(api: AsyncClient, letter: str) -> list:
+    response = await api.get("/search", params={"letter": letter[:10]})
+    assert response.status_code == 200
+    return [record["id"] for record in response.json()]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("swiped, undo", [("disliked", "/unlike"), ("liked", "/undislike")])
+async def test_undo_of_the_other_list_keeps_the_name_seen(client, swiped, undo):
+    name_id = 7
+    letter = name_of(client.db_file, name_id)
+    assert name_id in await search_ids(client, letter)
+
+    response = await client.post("/preferences", json={swiped: [name_id]})
+    assert response.status_code == 200
+    # The search loads the seen bitmap the undo would change.
+    assert name_id not in await search_ids(client, letter)
+
+    # The name was never in this list, so nothing is deleted and it stays hidden.
+    response = await client.delete(undo, params={"name_ids": [name_id]})
+    assert response.status_code == 200
+    assert name_id not in await search_ids(client, letter)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("swiped, undo", [("liked", "/unlike"), ("disliked", "/undislike")])
+async def test_undo_shows_the_name_again(client, swiped, undo):
+    name_id = 7
+    letter = name_of(client.db_file, name_id)
+
+    await client.post("/preferences", json={swiped: [name_id]})
+    assert name_id not in await search_ids(client, letter)
+
+    response = await client.delete(undo, params={"name_ids": [name_id]})
+    assert response.status_code == 200
+    assert name_id in await search_ids(client, letter)